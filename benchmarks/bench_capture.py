@@ -0,0 +1,53 @@
+"""Compare screen capture paths on a connected device.
+
+Usage:
+    python -m benchmarks.bench_capture <serial_no> [--count 20]
+
+Prints one JSON object per capture path with captures/sec and the host CPU
+time spent per capture.
+"""
+import argparse
+import json
+import time
+
+import uiautomator2 as u2
+
+from src.utils.capture_util import RawScreencap
+
+
+def bench(name, capture, count):
+    capture()  # warm up
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    for _ in range(count):
+        capture()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    return {
+        "path": name,
+        "count": count,
+        "captures_per_sec": round(count / wall, 2),
+        "wall_ms_per_capture": round(wall / count * 1000, 2),
+        "cpu_ms_per_capture": round(cpu / count * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("serial_no")
+    parser.add_argument("--count", type=int, default=20)
+    args = parser.parse_args()
+
+    device_ui = u2.connect_usb(args.serial_no)
+    raw_screencap = RawScreencap(device_ui.adb_device)
+    paths = {
+        "screenshot_opencv": lambda: device_ui.screenshot(format="opencv"),
+        "raw_screencap_bgr": lambda: raw_screencap.capture(),
+        "raw_screencap_gray": lambda: raw_screencap.capture(gray=True),
+    }
+    for name, capture in paths.items():
+        print(json.dumps(bench(name, capture, args.count)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""Offline benchmark of the vision pipeline, no device needed.
+
+Usage:
+    python -m benchmarks.bench_vision [--scenes 5] [--repeat 3]
+        [--templates blum_claim,hamster_profit] [--output result.json]
+
+Templates from resources/image/ are pasted at known positions into synthetic
+device-sized screenshots, then found with `BaseTeleGroupService.find_items`
+in every matching mode. The region-of-interest modes use scenes where the
+element always shows up near one place, as dialog buttons do.
+
+Prints (or writes) one JSON document with, per mode, template and threshold:
+ops/sec, p50/p99 latency, peak traced memory, precision and recall (null
+when nothing was found or pasted), and for the region-of-interest modes
+whether a search region was available.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from src.model.config_device import ConfigDevice
+from src.services import tele_service
+from src.services.tele_service import BaseTeleGroupService
+from src.utils.debug_util import debug_writer
+from src.utils import roi_util
+from src.utils.roi_util import RoiStore
+from src.utils.template_util import template_registry
+from src.utils.vision_pool_util import vision_pool
+
+SCREEN_SIZE = (2400, 1080)
+THRESHOLDS = [0.8, 0.9, 0.95, 0.98]
+MODES = {
+    "full": {"pyramid": False, "roi": False},
+    "pyramid": {"pyramid": True, "roi": False},
+    "roi": {"pyramid": False, "roi": True},
+    "roi_pyramid": {"pyramid": True, "roi": True},
+}
+# a found position counts as a hit when it is this close to a pasted one
+POSITION_TOLERANCE = 4
+
+
+class NoRoiStore:
+    def get_roi(self, template_id, frame_shape):
+        return None
+
+    def record(self, template_id, frame_shape, boxes):
+        pass
+
+
+class FakeDevice:
+    def __init__(self):
+        self.frame = None
+
+    def screenshot(self, format="opencv"):
+        return self.frame
+
+
+def make_background(rng: np.random.Generator) -> np.ndarray:
+    """Flat panels and text, roughly what a bot web app looks like"""
+    (height, width) = SCREEN_SIZE
+    frame = np.empty((height, width, 3), np.uint8)
+    frame[:] = rng.integers(0, 80, 3)
+    for _ in range(30):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        w, h = (int(i) for i in rng.integers(40, 500, 2))
+        color = [int(c) for c in rng.integers(0, 256, 3)]
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, -1)
+    for index in range(40):
+        cv2.putText(
+            frame,
+            f"Task {index}",
+            (int(rng.integers(0, width - 200)), int(rng.integers(30, height))),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            1.2,
+            (255, 255, 255),
+            2,
+        )
+    return frame
+
+
+def make_scene(
+    rng: np.random.Generator,
+    template: np.ndarray,
+    count: int,
+    anchor: Optional[Tuple[int, int]] = None,
+) -> Tuple[np.ndarray, List[Tuple[int, int]]]:
+    """Paste `count` templates at random positions, or near `anchor` for
+    elements that always show up at the same place (dialog buttons)"""
+    frame = make_background(rng)
+    (height, width) = template.shape[:2]
+    positions: List[Tuple[int, int]] = []
+    while len(positions) < count:
+        if anchor:
+            x = min(
+                max(0, anchor[0] + int(rng.integers(-8, 9))), SCREEN_SIZE[1] - width
+            )
+            y = min(
+                max(0, anchor[1] + int(rng.integers(-8, 9))), SCREEN_SIZE[0] - height
+            )
+        else:
+            x = int(rng.integers(0, SCREEN_SIZE[1] - width + 1))
+            y = int(rng.integers(0, SCREEN_SIZE[0] - height + 1))
+        if all(abs(y - py) >= height or abs(x - px) >= width for px, py in positions):
+            positions.append((x, y))
+            frame[y : y + height, x : x + width] = template
+    return frame, positions
+
+
+def score(found, expected) -> Tuple[int, int, int]:
+    """true positives, false positives, false negatives"""
+    expected = list(expected)
+    true_positive = 0
+    for (x, y) in found:
+        for index, (ex, ey) in enumerate(expected):
+            if abs(x - ex) <= POSITION_TOLERANCE and abs(y - ey) <= POSITION_TOLERANCE:
+                true_positive += 1
+                expected.pop(index)
+                break
+    return true_positive, len(found) - true_positive, len(expected)
+
+
+def ratio(count: int, total: int) -> Optional[float]:
+    """None when there is nothing to score, rather than a misleading 0.0"""
+    return round(count / total, 4) if total else None
+
+
+def percentile(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)) * 1000, 3)
+
+
+def bench_template(
+    service: BaseTeleGroupService,
+    device: FakeDevice,
+    template_id: str,
+    scenes,
+    mode: Dict[str, bool],
+    threshold: float,
+    repeat: int,
+    tmp_dir: str,
+) -> Dict:
+    item_path = template_registry.get(template_id).path
+    tele_service.roi_store = NoRoiStore()
+    roi_learned = None
+    if mode["roi"]:
+        roi_store = RoiStore(file_path=f"{tmp_dir}/roi_history.json")
+        tele_service.roi_store = roi_store
+        # learn the search regions first, as a device does over past runs
+        for frame, _ in scenes:
+            device.frame = frame
+            service._match_cache.clear()
+            service.find_items(item_path, threshold=threshold)
+        # without a region the mode matches the full frame, as `full` does
+        roi_learned = roi_store.get_roi(template_id, scenes[0][0].shape) is not None
+
+    latencies: List[float] = []
+    totals = [0, 0, 0]
+    tracemalloc.start()
+    for _ in range(repeat):
+        for frame, positions in scenes:
+            device.frame = frame
+            # measure the matching, not the per-frame result cache
+            service._match_cache.clear()
+            started_at = time.perf_counter()
+            found = service.find_items(
+                item_path, threshold=threshold, pyramid=mode["pyramid"]
+            )
+            latencies.append(time.perf_counter() - started_at)
+            for index, value in enumerate(score(found, positions)):
+                totals[index] += value
+    (_, peak_memory) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    (true_positive, false_positive, false_negative) = totals
+    return {
+        "template": template_id,
+        "threshold": threshold,
+        "ops": len(latencies),
+        "ops_per_sec": round(len(latencies) / sum(latencies), 2),
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "peak_memory_kb": peak_memory // 1024,
+        "precision": ratio(true_positive, true_positive + false_positive),
+        "recall": ratio(true_positive, true_positive + false_negative),
+        "roi_learned": roi_learned,
+    }
+
+
+def get_commit() -> str:
+    try:
+        return (
+            subprocess.check_output(["git", "rev-parse", "--short", "HEAD"])
+            .decode("utf-8")
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scenes", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--templates", default="")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--thresholds", default=",".join(map(str, THRESHOLDS)))
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+    if (
+        any(MODES[mode]["roi"] for mode in args.modes.split(","))
+        and args.scenes < roi_util.MIN_LEARNED_SAMPLES
+    ):
+        parser.error(
+            f"the roi modes learn their regions from the scenes, "
+            f"--scenes must be at least {roi_util.MIN_LEARNED_SAMPLES}"
+        )
+
+    debug_writer.mode = "off"
+    vision_pool.workers = args.workers
+    template_registry.load_all()
+    template_ids = (
+        args.templates.split(",") if args.templates else template_registry.ids()
+    )
+    thresholds = [float(i) for i in args.thresholds.split(",")]
+
+    device = FakeDevice()
+    service = BaseTeleGroupService(device, "bench", ConfigDevice(device_name="bench"))
+    service.raw_screencap_enabled = False
+
+    results = []
+    tmp_dir = tempfile.mkdtemp()
+    for template_id in template_ids:
+        rng = np.random.default_rng(args.seed)
+        template = template_registry.get(template_id).image
+        scattered_scenes = [
+            make_scene(rng, template, int(rng.integers(0, 4)))
+            for _ in range(args.scenes)
+        ]
+        anchor = (
+            int(rng.integers(0, SCREEN_SIZE[1] - template.shape[1] + 1)),
+            int(rng.integers(SCREEN_SIZE[0] // 2, SCREEN_SIZE[0] - template.shape[0])),
+        )
+        anchored_scenes = [
+            make_scene(rng, template, int(rng.integers(0, 2)), anchor)
+            for _ in range(args.scenes)
+        ]
+        for mode_name in args.modes.split(","):
+            mode = MODES[mode_name]
+            for threshold in thresholds:
+                result = bench_template(
+                    service,
+                    device,
+                    template_id,
+                    anchored_scenes if mode["roi"] else scattered_scenes,
+                    mode,
+                    threshold,
+                    args.repeat,
+                    tmp_dir,
+                )
+                layout = "anchored" if mode["roi"] else "scattered"
+                results.append({"mode": mode_name, "layout": layout, **result})
+                print(json.dumps(results[-1]), file=sys.stderr)
+
+    report = {
+        "commit": get_commit(),
+        "screen_size": list(SCREEN_SIZE),
+        "scenes": args.scenes,
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "workers": args.workers,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
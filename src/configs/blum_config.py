@@ -1,3 +1,5 @@
+GROUP_NAME = "Blum"
+
 TASK_TO_VERIFY_DICT = {
     "Crypto Terms. Part 1": "BLUMEXPLORER",
     "Bitcoin Rainbow Chart?": "SOBLUM",
@@ -24,3 +26,10 @@ START_WEEKLY_ITEM_PATH = "resources/image/blum_weekly_start.png"
 CLAIM_ITEM_PATH = "resources/image/blum_claim.png"
 KEYWORD_ITEM_PATH = "resources/image/blum_keyword.png"
 VERIFY_ITEM_PATH = "resources/image/blum_verifycation.png"
+
+# search regions (x1, y1, x2, y2 as fractions of the screen) tried before
+# the full frame, the verification dialog always opens in the lower half
+ITEM_ROI_HINTS = {
+    KEYWORD_ITEM_PATH: (0.0, 0.4, 1.0, 1.0),
+    VERIFY_ITEM_PATH: (0.0, 0.4, 1.0, 1.0),
+}
@@ -0,0 +1 @@
+GROUP_NAME = "Binance Moonbix bot"
@@ -13,6 +13,24 @@ ADB_HOST = os.getenv("ADB_HOST", "localhost")
 ADB_PORT = int(os.getenv("ADB_PORT", 5037))
 
 GENYMOTION_PATH = os.getenv("GENYMOTION_PATH", "")
+# seconds to wait for a started VM to come online on adb
+DEVICE_ATTACH_TIMEOUT = float(os.getenv("DEVICE_ATTACH_TIMEOUT", "300"))
+# seconds between two lookups of the serial of a booting VM
+DEVICE_RESOLVE_INTERVAL = float(os.getenv("DEVICE_RESOLVE_INTERVAL", "2"))
+# seconds for an attached device to be usable, see `readiness_util`
+READINESS_TIMEOUT = float(os.getenv("READINESS_TIMEOUT", "180"))
+READINESS_POLL_INTERVAL = float(os.getenv("READINESS_POLL_INTERVAL", "1"))
+
+# booted VMs kept between jobs, see `vm_pool_util`; -1 sizes the pool from
+# the host memory: (host - reserve) / memory of one VM
+VM_POOL_SIZE = int(os.getenv("VM_POOL_SIZE", "-1"))
+VM_POOL_VM_MEMORY_MB = int(os.getenv("VM_POOL_VM_MEMORY_MB", "4096"))
+VM_POOL_HOST_RESERVE_MB = int(os.getenv("VM_POOL_HOST_RESERVE_MB", "4096"))
+# idle VMs are stopped after this long, or right away when their next job is
+# further away
+VM_POOL_IDLE_TIMEOUT = int(os.getenv("VM_POOL_IDLE_TIMEOUT", str(2 * 60 * 60)))
+# save the state of stopped VMs instead of powering them off
+VM_POOL_SAVE_STATE = os.getenv("VM_POOL_SAVE_STATE", "false").lower() == "true"
 
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
@@ -22,10 +40,103 @@ LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 10))
 
 
 IGNORE_HOUR_RUN_LIST = [
-    int(i) for i in os.getenv("IGNORE_HOUR_RUN_LIST", "").split(",")
+    int(i) for i in os.getenv("IGNORE_HOUR_RUN_LIST", "").split(",") if i.strip()
 ]
 
 UI_TIMEOUT = int(os.getenv("UI_TIMEOUT", "10"))
 
 
 IMAGE_FOLDER_PATH = os.getenv("IMAGE_FOLDER_PATH", "images/")
+
+
+TEMPLATE_FOLDER_PATH = os.getenv("TEMPLATE_FOLDER_PATH", "resources/image/")
+
+
+CACHE_FOLDER_PATH = os.getenv("CACHE_FOLDER_PATH", "resources/cache/")
+ROI_HISTORY_FILE = os.path.join(CACHE_FOLDER_PATH, "roi_history.json")
+
+
+# matched screenshots: always | on_miss | every_n | off
+DEBUG_ARTIFACT_MODE = os.getenv("DEBUG_ARTIFACT_MODE", "on_miss")
+DEBUG_ARTIFACT_EVERY_N = int(os.getenv("DEBUG_ARTIFACT_EVERY_N", "10"))
+DEBUG_ARTIFACT_QUEUE_SIZE = int(os.getenv("DEBUG_ARTIFACT_QUEUE_SIZE", "8"))
+DEBUG_RING_SIZE = int(os.getenv("DEBUG_RING_SIZE", "5"))
+DEBUG_FOLDER_PATH = os.getenv("DEBUG_FOLDER_PATH", "resources/image/tmp/")
+
+
+# capture frames with raw `screencap` instead of the uiautomator2 screenshot
+RAW_SCREENCAP_ENABLED = os.getenv("RAW_SCREENCAP_ENABLED", "true").lower() == "true"
+
+
+# long-lived frame source per device: screencap_stream | screencap | none, off
+# by default as it captures full frames nonstop for the whole job
+FRAME_SOURCE_BACKEND = os.getenv("FRAME_SOURCE_BACKEND", "none")
+FRAME_SOURCE_INTERVAL = float(os.getenv("FRAME_SOURCE_INTERVAL", "0.05"))
+FRAME_SOURCE_TIMEOUT = float(os.getenv("FRAME_SOURCE_TIMEOUT", "3"))
+
+
+# match results kept per service for frames that are seen again unchanged
+FRAME_MATCH_CACHE_SIZE = int(os.getenv("FRAME_MATCH_CACHE_SIZE", "16"))
+
+
+# processes matching frames for all devices, 0 matches in the device thread
+VISION_WORKERS = int(os.getenv("VISION_WORKERS", "0"))
+VISION_TIMEOUT = float(os.getenv("VISION_TIMEOUT", "10"))
+
+
+# seconds between two hierarchy dumps while waiting for a screen
+UI_POLL_INTERVAL = float(os.getenv("UI_POLL_INTERVAL", "0.5"))
+
+# the screen is settled once its frames stay the same for this long
+SETTLE_STABLE_TIME = float(os.getenv("SETTLE_STABLE_TIME", "0.6"))
+SETTLE_POLL_INTERVAL = float(os.getenv("SETTLE_POLL_INTERVAL", "0.2"))
+
+
+# cached tap positions of UI controls, per device, resolution and app version
+COORDINATE_CACHE_FILE = os.path.join(CACHE_FOLDER_PATH, "coordinates.json")
+COORDINATE_VERIFY_TIMEOUT = float(os.getenv("COORDINATE_VERIFY_TIMEOUT", "3"))
+
+
+# declarative step flows of the bot services, see `flow_util`
+FLOW_FOLDER_PATH = os.getenv("FLOW_FOLDER_PATH", "resources/flows/")
+# iterations of a flow `repeat` without `times`
+FLOW_REPEAT_TIMES = int(os.getenv("FLOW_REPEAT_TIMES", "20"))
+
+
+# waits for UI elements learned from how long they took to appear
+ADAPTIVE_TIMEOUT_ENABLED = (
+    os.getenv("ADAPTIVE_TIMEOUT_ENABLED", "true").lower() == "true"
+)
+TIMEOUT_HISTORY_FILE = os.path.join(CACHE_FOLDER_PATH, "timeouts.json")
+# fixed waits by key, used instead of the learned ones
+TIMEOUT_OVERRIDES_FILE = os.getenv(
+    "TIMEOUT_OVERRIDES_FILE", "resources/yaml/timeouts.yaml"
+)
+TIMEOUT_PERCENTILE = float(os.getenv("TIMEOUT_PERCENTILE", "95"))
+TIMEOUT_MARGIN = float(os.getenv("TIMEOUT_MARGIN", "1"))
+TIMEOUT_MIN = float(os.getenv("TIMEOUT_MIN", "1"))
+# misses in a row after which a wait gets its full timeout again
+TIMEOUT_MISS_BACKOFF = int(os.getenv("TIMEOUT_MISS_BACKOFF", "2"))
+
+
+# time device calls, waits and matching per service run, see `instrument_util`
+INSTRUMENT_ENABLED = os.getenv("INSTRUMENT_ENABLED", "true").lower() == "true"
+# finished runs kept for `instrumentation.get_runs`
+INSTRUMENT_HISTORY_SIZE = int(os.getenv("INSTRUMENT_HISTORY_SIZE", "100"))
+
+
+# last run times and run outcomes, kept across restarts, see `state_util`
+RUN_STATE_FILE = os.getenv(
+    "RUN_STATE_FILE", os.path.join(CACHE_FOLDER_PATH, "run_state.db")
+)
+# seconds to wait for a write lock held by another thread or process
+RUN_STATE_BUSY_TIMEOUT = float(os.getenv("RUN_STATE_BUSY_TIMEOUT", "30"))
+
+
+# devices boot when a service is due, see `schedule_util`; services due within
+# this window share the boot
+SCHEDULE_GROUP_WINDOW = int(os.getenv("SCHEDULE_GROUP_WINDOW", str(30 * 60)))
+# delay before booting again for a service whose run failed
+SCHEDULE_RETRY_INTERVAL = int(os.getenv("SCHEDULE_RETRY_INTERVAL", str(60 * 60)))
+# longest sleep between two checks of the schedule
+SCHEDULE_MAX_SLEEP = int(os.getenv("SCHEDULE_MAX_SLEEP", str(10 * 60)))
@@ -1,2 +1,10 @@
+GROUP_NAME = "Hamster Kombat"
+
 PROFIT_PER_HOUR_ITEM_PATH = "resources/image/hamster_profit.png"
 GO_AHEAD_ITEM_PATH = "resources/image/hamster_go_ahead.png"
+
+# search regions (x1, y1, x2, y2 as fractions of the screen) tried before
+# the full frame, the card popup always opens in the lower half
+ITEM_ROI_HINTS = {
+    GO_AHEAD_ITEM_PATH: (0.0, 0.5, 1.0, 1.0),
+}
@@ -1 +1,3 @@
+GROUP_NAME = "SideFans (By SideKick)"
+
 UNCHECK_ITEM_PATH = "resources/image/side_fans_un_checked.png"
@@ -15,8 +15,14 @@ from services.tele_service import BaseTeleService
 from src.configs.device_config import NAME_TO_CONFIG_DEVICE_MAP
 from src.services.bnb_moonbix_service import BnbMoonBixService
 from src.services.side_fans_service import SideFansService
-from src.utils import adb_util, common_util, device_util, notify_util
+from src.utils import adb_util, common_util, device_util, frame_source_util, notify_util
 from src.utils.log_util import logger
+from src.utils.readiness_util import ReadinessProbe
+from src.utils.schedule_util import DeviceScheduler
+from src.utils.state_util import run_state_store
+from src.utils.template_util import template_registry
+from src.utils.vision_pool_util import vision_pool
+from src.utils.vm_pool_util import VmPool
 
 
 # TODO: CHECK time run on app after run device
@@ -58,9 +64,9 @@ def run_on_devce(device_ui, device_size, device_name, config_device: ConfigDevic
 
     if tele_service_instance:
         tele_service_instance.device_ui.app_stop_all()
-        time.sleep(10)
+        tele_service_instance.wait_settled(10)
         tele_service_instance.close_tele_app()
-    time.sleep(10)
+        tele_service_instance.wait_settled(10)
     logger.info(
         f"[{device_name}] FINISH on device: {config_device.last_running_ts_by_group_id}"
     )
@@ -68,121 +74,150 @@ def run_on_devce(device_ui, device_size, device_name, config_device: ConfigDevic
     return flag
 
 
-def worker_function(
-    vm,
-    start_index,
-    running_serial_no_set: set,
-) -> bool:
+def worker_function(vm, vm_pool: VmPool) -> bool:
     vm_name, vm_uid = vm
-    serial_no = vm_name
+    serial_no = None
+    healthy = False
     try:
         config_device = NAME_TO_CONFIG_DEVICE_MAP.get(vm_name, None)
         if config_device is None:
             logger.error(f"[{vm_name}] Can't find config device name {vm_name}")
-            running_serial_no_set.add(vm_name)
             return (vm_name, None)
 
-        flag, select_device_info = start_vm_and_waiting_get_new_device_info(
-            start_index, vm_name, vm_uid, running_serial_no_set
-        )
-        if not flag:
+        select_device_info = vm_pool.acquire(vm_name, vm_uid)
+        if select_device_info is None:
             logger.error(f"[{vm_name}] Failed to find new device")
-            running_serial_no_set.add(vm_name)
             return (vm_name, False)
 
         logger.info("================================================================")
         (device_ui, device_size, serial_no) = select_device_info
-        logger.info(f"[{vm_name}] Start new device: {serial_no}.")
-        logger.info(f"{running_serial_no_set}=================")
+        logger.info(f"[{vm_name}] Start device: {serial_no}.")
 
+        frame_source_util.open_frame_source(vm_name, device_ui.adb_device)
         result = run_on_devce(device_ui, device_size, vm_name, config_device)
+        healthy = True
         return (vm_name, result)
     except Exception as e:
         logger.error(f"[{vm_name}] Error running device: {serial_no}:", e)
-        running_serial_no_set.add(vm_name)
         return (vm_name, False)
 
     finally:
-        device_util.stop_vm(vm_name, vm_uid)
+        frame_source_util.close_frame_source(vm_name)
+        # kept booted for the next job, stopped after an error
+        vm_pool.release(vm_name, healthy)
         logger.info(f"[{vm_name}] Finish device: {serial_no}")
         logger.info("================================================================")
 
 
-def start_vm_and_waiting_get_new_device_info(
-    start_index, vm_name, vm_uid, running_serial_no_set: set, wait_ts=30, retry=10
-) -> Tuple[bool, Optional[Tuple[Device, WindowSize, str]]]:
-    count = 0
-    while len(running_serial_no_set) < start_index:
-        logger.info(
-            f"[{vm_name}] waiting in {wait_ts} seconds] retry: {count}"
-            f" with index: {start_index} and set: {running_serial_no_set}"
+def start_device(vm_name, vm_uid) -> Optional[Tuple[Device, WindowSize, str]]:
+    try:
+        flag, select_device_info = start_vm_and_waiting_get_new_device_info(
+            vm_name, vm_uid
         )
-        time.sleep(30)
-        count += 1
-        if count > retry:
-            logger.error(f"[{vm_name}] Failed to find new device after {retry} retries")
-            return (False, None)
+    except Exception as e:
+        logger.error(f"[{vm_name}] Error starting device:", e)
+        flag = False
+    if not flag:
+        device_util.stop_vm(vm_name, vm_uid)
+        return None
+    return select_device_info
+
+
+def stop_device(vm_name, vm_uid, select_device_info: Tuple[Device, WindowSize, str]):
+    device_util.stop_vm(vm_name, vm_uid, save_state=common_config.VM_POOL_SAVE_STATE)
+    adb_util.device_watcher.release(select_device_info[2])
 
+
+def is_device_alive(select_device_info: Tuple[Device, WindowSize, str]) -> bool:
+    return select_device_info[2] in adb_util.device_watcher.get_serials()
+
+
+def start_vm_and_waiting_get_new_device_info(
+    vm_name, vm_uid, timeout=common_config.DEVICE_ATTACH_TIMEOUT
+) -> Tuple[bool, Optional[Tuple[Device, WindowSize, str]]]:
+    adb_util.device_watcher.start()
     device_util.start_vm(vm_name, vm_uid)
-    count = 0
-    while True:
-        time.sleep(wait_ts)
-        count += 1
-        if count > retry:
-            logger.error(f"[{vm_name}] Timeout waiting for device: {vm_name} to start")
-            break
-        current_devices = adb_util.get_devices()
-        logger.info(f"[{vm_name}] Current devices: {len(current_devices)}")
-        for device in current_devices:
-            serial_no = device.get_serialno()
-            if serial_no not in running_serial_no_set:
-                running_serial_no_set.add(serial_no)
-                device_size = device.window_size()
-                device_ui: Device = u2.connect_usb(serial_no)
-                time.sleep(20)
-                return (True, (device_ui, device_size, serial_no))
-    return (False, None)
+    serial_no = adb_util.device_watcher.claim(
+        vm_name, lambda: device_util.get_vm_serial(vm_uid), timeout
+    )
+    if serial_no is None:
+        logger.error(f"[{vm_name}] Timeout waiting for device: {vm_name} to start")
+        return (False, None)
+    logger.info(f"[{vm_name}] Device online: {serial_no}")
+    try:
+        adb_device = adb_util.get_device(serial_no)
+        device_ui: Device = u2.connect_usb(serial_no)
+        if not ReadinessProbe(vm_name, adb_device, device_ui).wait_ready():
+            adb_util.device_watcher.release(serial_no)
+            return (False, None)
+        device_size = adb_device.window_size()
+    except Exception:
+        adb_util.device_watcher.release(serial_no)
+        raise
+    return (True, (device_ui, device_size, serial_no))
 
 
 def main():
+    template_registry.load_all()
+    vision_pool.start()
     mvs = device_util.get_vms()
-    mvs = [mv for mv in mvs if mv[0] in NAME_TO_CONFIG_DEVICE_MAP]
-    waiting_times_seconds = 3600
+    mvs = {mv[0]: mv for mv in mvs if mv[0] in NAME_TO_CONFIG_DEVICE_MAP}
+    for name in mvs:
+        # run times saved before a restart
+        NAME_TO_CONFIG_DEVICE_MAP[name].last_running_ts_by_group_id.update(
+            run_state_store.get_last_runs(name)
+        )
+    scheduler = DeviceScheduler([NAME_TO_CONFIG_DEVICE_MAP[name] for name in mvs])
+    vm_pool = VmPool(start_device, stop_device, is_alive=is_device_alive)
+    logger.info(f"Keeping up to {vm_pool.size} VMs booted between jobs")
     while True:
-        # daily tasks
-        start_time = datetime.now()
-        running_device_name_set = set()
+        vm_pool.evict_idle()
+        device_names = scheduler.pop_due()
+        if not device_names:
+            next_boot_at = scheduler.next_boot_at()
+            if next_boot_at is None:
+                logger.info("No service enabled on any device")
+                vm_pool.close()
+                return
+            wake_at = min(next_boot_at, vm_pool.next_expire_at() or next_boot_at)
+            sleep_times = min(
+                max(0, int(wake_at - time.time())),
+                common_config.SCHEDULE_MAX_SLEEP,
+            )
+            logger.info(
+                f"No device due, next boot at {datetime.fromtimestamp(next_boot_at)},"
+                f" waiting for {sleep_times // 60} minutes..."
+            )
+            time.sleep(sleep_times)
+            continue
+
+        start_time = time.time()
+        logger.info(f"Run due devices: {device_names}")
         results = []
         with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
             futures = [
-                executor.submit(worker_function, mvs[i], i, running_device_name_set)
-                for i in range(len(mvs))
+                executor.submit(worker_function, mvs[name], vm_pool)
+                for name in device_names
             ]
 
             for future in concurrent.futures.as_completed(futures):
                 result = future.result()
                 results.append(result)
+        for name in device_names:
+            scheduler.finish_boot(name, start_time)
+        # warm VMs are only worth keeping for a job coming soon
+        for name in vm_pool.get_idle_names():
+            boot_at = scheduler.get_device_boot_at(name)
+            if boot_at is None or boot_at - time.time() > vm_pool.idle_timeout:
+                vm_pool.discard(name)
 
         msgs = [f'"{item[0]}": {item[1]}\n' for item in results]
         notify_util.send_telegram_log("".join(msgs))
 
-        duration_seconds = (datetime.now() - start_time).seconds
-        if duration_seconds < waiting_times_seconds:
-            sleep_times = waiting_times_seconds - duration_seconds
-            logger.info(f"Waiting for {sleep_times // 60} minutes...")
-            time.sleep(sleep_times)
-
         random_sleep_minus = common_util.random_int(1, 5)
         logger.info(f"Waiting for random in {random_sleep_minus} minutes...")
         time.sleep(random_sleep_minus * 60)
 
-        while datetime.now().hour in common_config.IGNORE_HOUR_RUN_LIST:
-            logger.info(
-                "Waiting for 1 HOUR, because current_hour "
-                f"in ignore_run: {common_config.IGNORE_HOUR_RUN_LIST}"
-            )
-            time.sleep(3600)
-
 
 if __name__ == "__main__":
     main()
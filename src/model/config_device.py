@@ -1,28 +1,38 @@
-from typing import Dict, Optional
+from typing import Dict, Optional, Union
 
 from pydantic import BaseModel
 
 
 class ConfigDevice(BaseModel):
+    """`*_bot_link` starts a bot straight from a Telegram link, e.g.
+    `tg://resolve?domain=<bot>` (its chat) or
+    `tg://resolve?domain=<bot>&appname=<app>` (its web app). The chat list
+    position `*_group_id` is the fallback when the link fails."""
+
     device_name: str
 
     is_blum: bool = False
     blum_group_id: Optional[int] = None
+    blum_bot_link: Optional[str] = None
     blum_delay_interval: Optional[int] = 8 * 60 * 60
 
     is_hamster_kombat: bool = False
     hamster_kombat_group_id: Optional[int] = None
+    hamster_kombat_bot_link: Optional[str] = None
     hamster_kombat_delay_interval: Optional[int] = 6 * 60 * 60
 
     is_bnb_moonbix: bool = False
     bnb_moonbix_group_id: Optional[int] = None
+    bnb_moonbix_bot_link: Optional[str] = None
     bnb_moonbix_delay_interval: Optional[int] = 2 * 60 * 60
 
     is_side_fans: bool = False
     side_fans_group_id: Optional[int] = None
+    side_fans_bot_link: Optional[str] = None
     side_fans_delay_interval: Optional[int] = 8 * 60 * 60
 
-    last_running_ts_by_group_id: Optional[Dict[int, int]] = {}
+    # keyed by group id, or by group name for bots opened by link only
+    last_running_ts_by_group_id: Optional[Dict[Union[int, str], int]] = {}
 
     notify_error_tele: bool = False
     notify_info_tele: bool = False
@@ -1,27 +1,188 @@
 import time
-from typing import List, Tuple
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 import cv2
 import numpy as np
 from uiautomator2 import Device
 
-from src.configs.common_config import IMAGE_FOLDER_PATH, UI_TIMEOUT
+from src.configs.common_config import (
+    COORDINATE_VERIFY_TIMEOUT,
+    FRAME_MATCH_CACHE_SIZE,
+    IMAGE_FOLDER_PATH,
+    RAW_SCREENCAP_ENABLED,
+    SETTLE_POLL_INTERVAL,
+    SETTLE_STABLE_TIME,
+    UI_POLL_INTERVAL,
+    UI_TIMEOUT,
+)
 from src.model.config_device import ConfigDevice
-from src.utils import notify_util
+from src.utils import navigation_util, notify_util, vision_pool_util, vision_util
+from src.utils.capture_util import RawScreencap
+from src.utils.coordinate_util import CoordinateStore, Point, coordinate_store
+from src.utils.debug_util import debug_writer
+from src.utils.flow_util import FlowRunner, StepTiming, flow_registry
+from src.utils.frame_source_util import get_frame_source
+from src.utils.hierarchy_util import HierarchySnapshot, Selector, SnapshotSelection
+from src.utils.instrument_util import IO, VISION, WAIT, instrumentation, timed
 from src.utils.log_util import logger
+from src.utils.navigation_util import (
+    BOT_WEB_APP,
+    NAVIGATION_MAX_STEPS,
+    TELE_HOME,
+    WEB_VIEW_CLASS_NAME,
+)
+from src.utils.roi_util import roi_store
+from src.utils.schedule_util import get_run_key
+from src.utils.state_util import RUN_ERROR, RUN_FAILED, RUN_OK, run_state_store
+from src.utils.template_util import template_registry
+from src.utils.timeout_util import TimeoutStore, timeout_store
+from src.utils.vision_pool_util import MatchItem, vision_pool
+from src.utils.vision_util import FrameFingerprint, MatchBox
 
 
 class BaseTeleService:
     def __init__(self, device_ui: Device, device_name: str):
-        self.device_ui: Device = device_ui
+        # every request to the device is timed for the run stats
+        self.device_ui: Device = instrumentation.wrap(device_ui)
         self.device_name = device_name
         self.package_name = "org.telegram.messenger"
         self.app_name = "Telegram"
+        self.raw_screencap: Optional[RawScreencap] = None
+        self.raw_screencap_enabled = RAW_SCREENCAP_ENABLED
+        # chat and web app of this bot are recognized by the screen classifier
+        self.group_name: Optional[str] = None
+        # (resolution, app version) of the cached control positions
+        self._control_scope: Optional[Tuple[str, str]] = None
 
     def _get_current_package_name(self) -> str:
         return self.device_ui.info.get("currentPackageName")
 
-    def is_tele_home_screen(self) -> bool:
+    def snapshot(self) -> HierarchySnapshot:
+        """Dump the UI hierarchy once, to answer several selectors locally"""
+        return HierarchySnapshot(self.device_ui.dump_hierarchy(), self.device_ui)
+
+    @timed(WAIT)
+    def wait_any(
+        self,
+        selectors: List[Selector],
+        timeout: float = UI_TIMEOUT,
+        timeout_key: Optional[str] = None,
+    ) -> Tuple[int, SnapshotSelection]:
+        """Poll one hierarchy dump per tick until one of `selectors` matches.
+
+        Args:
+            timeout_key: name of this wait in the service, its timeout is
+                then learned from how long the selectors took to match (at
+                most `timeout`), see `TimeoutStore`
+
+        Returns:
+            index of the first selector (in list order) matched on the same
+            dump and its selection, or -1 and an empty selection on timeout
+        """
+        key = None
+        if timeout_key:
+            key = TimeoutStore.get_key(type(self).__name__, timeout_key)
+            timeout = timeout_store.get_timeout(key, timeout)
+        start_at = time.time()
+        deadline = start_at + timeout
+        while True:
+            snapshot = self.snapshot()
+            for index, selector in enumerate(selectors):
+                selection = snapshot.select(selector)
+                if selection.exists:
+                    if key:
+                        timeout_store.record(key, time.time() - start_at)
+                    return (index, selection)
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                if key:
+                    timeout_store.record(key, None)
+                return (-1, SnapshotSelection(snapshot, []))
+            instrumentation.sleep(min(UI_POLL_INTERVAL, remaining))
+
+    def click_selector(
+        self, timeout_key: str, selector: Selector, timeout: float = UI_TIMEOUT
+    ) -> bool:
+        """Click the element once it appears, as `click_exists` with a
+        learned timeout"""
+        (index, selection) = self.wait_any([selector], timeout, timeout_key)
+        return index >= 0 and selection.click()
+
+    def _get_control_key(self, control_id: str) -> str:
+        if self._control_scope is None:
+            (width, height) = self.device_ui.window_size()
+            try:
+                app_version = self.device_ui.app_info(self.package_name).get(
+                    "versionName", ""
+                )
+            except Exception as e:
+                logger.error(f"[{self.device_name}] Get app version failed", e)
+                app_version = ""
+            self._control_scope = (f"{width}x{height}", app_version)
+        return CoordinateStore.get_key(
+            self.device_name, *self._control_scope, control_id
+        )
+
+    def locate_control(
+        self,
+        control_id: str,
+        selector: Selector,
+        timeout: float = UI_TIMEOUT,
+        snapshot: Optional[HierarchySnapshot] = None,
+    ) -> Optional[Point]:
+        """Position of a control: cached, or found by `selector` (in
+        `snapshot` when given, otherwise waited for) and cached"""
+        key = self._get_control_key(control_id)
+        point = coordinate_store.get(key)
+        if point is None:
+            if snapshot is not None:
+                selection = snapshot.select(selector)
+            else:
+                (_, selection) = self.wait_any([selector], timeout=timeout)
+            point = selection.center
+            if point is not None:
+                coordinate_store.put(key, point)
+        return point
+
+    def tap_control(
+        self,
+        control_id: str,
+        selector: Selector,
+        verify: Union[List[Selector], Callable[[], bool]],
+        timeout: float = UI_TIMEOUT,
+        snapshot: Optional[HierarchySnapshot] = None,
+    ) -> bool:
+        """Tap a control at its cached position and confirm `verify`.
+
+        On a mismatch the cached position is dropped, the control is found
+        again by `selector` and tapped there.
+        """
+        key = self._get_control_key(control_id)
+        point = coordinate_store.get(key)
+        if point is not None:
+            self.device_ui.click(*point)
+            if self.wait_settled(COORDINATE_VERIFY_TIMEOUT, until=verify):
+                return True
+            logger.info(f"[{self.device_name}] Position of {control_id} is stale")
+            coordinate_store.invalidate(key)
+            snapshot = None
+        point = self.locate_control(control_id, selector, timeout, snapshot)
+        if point is None:
+            return False
+        self.device_ui.click(*point)
+        if self.wait_settled(timeout, until=verify):
+            return True
+        coordinate_store.invalidate(key)
+        return False
+
+    def is_tele_home_screen(self, snapshot: Optional[HierarchySnapshot] = None) -> bool:
+        if snapshot is not None:
+            return snapshot(
+                description="Open navigation menu",
+                clickable=True,
+                packageName=self.package_name,
+            ).exists
         return self.device_ui(
             description="Open navigation menu",
             clickable=True,
@@ -56,42 +217,160 @@ class BaseTeleService:
         return current_page != self.package_name
 
     def back_to_app_home_screen(self) -> bool:
-        count_back = 0
-        while (
-            not self.is_tele_home_screen()
-            and self._get_current_package_name() == self.package_name
-        ):
-            count_back += 1
+        if self.navigate_to(TELE_HOME):
+            logger.info(f"[{self.device_name}] Back to tele home successfully")
+            return True
+        logger.error(f"[{self.device_name}] Back to tele home failed")
+        raise ValueError(f"[{self.device_name}] Back to tele home failed")
+
+    def current_screen(self, snapshot: Optional[HierarchySnapshot] = None) -> str:
+        if snapshot is None:
+            snapshot = self.snapshot()
+        return navigation_util.classify_screen(
+            snapshot, self.package_name, self.group_name
+        )
+
+    def navigate_to(self, target: str, max_steps: int = NAVIGATION_MAX_STEPS) -> bool:
+        """Take the shortest route of the navigation graph to `target`.
+
+        The screen is classified again after every action, so an action
+        that lands somewhere unexpected is routed from where it landed.
+        """
+        for _ in range(max_steps):
+            snapshot = self.snapshot()
+            screen = self.current_screen(snapshot)
+            if screen == target:
+                return True
+            route = navigation_util.find_route(screen, target)
+            if not route:
+                logger.error(f"[{self.device_name}] No route from {screen} to {target}")
+                return False
+            (action, next_screen) = route[0]
             logger.info(
-                f"[{self.device_name}] Press back to tele home...{count_back} times"
+                f"[{self.device_name}] Navigate {screen} -> {next_screen}: {action}"
             )
-            self.back_to_a_screen()
+            if not getattr(self, f"_nav_{action}")(snapshot):
+                logger.error(f"[{self.device_name}] Navigate action {action} failed")
+                return False
+        logger.error(
+            f"[{self.device_name}] Not reached {target} after {max_steps} actions"
+        )
+        return False
 
-        if self._get_current_package_name() != self.package_name:
-            logger.error(
-                f"[{self.device_name}] Back to tele home failed "
-                f"after {count_back} times"
-            )
-            self.close_tele_app()
-            # try to open tele app again
-            self._open_tele_app()
+    def _nav_back(self, snapshot: HierarchySnapshot) -> bool:
+        self.back_to_a_screen()
+        self.wait_settled(UI_TIMEOUT // 2)
+        return True
 
-        result = self.is_tele_home_screen()
-        if result:
-            logger.info(f"[{self.device_name}] Back to tele home successfully")
-            return True
-        else:
-            logger.error(f"[{self.device_name}] Back to tele home failed")
-            raise ValueError(f"[{self.device_name}] Back to tele home failed")
+    def _nav_open_tele_app(self, snapshot: HierarchySnapshot) -> bool:
+        self.device_ui.app_start(self.package_name)
+        return self.wait_settled(
+            UI_TIMEOUT, until=lambda: self.snapshot().has_package(self.package_name)
+        )
 
     def back_to_a_screen(self) -> bool:
         self.device_ui.press("back")
         return True
 
+    @timed(IO)
+    def capture_frame(self, gray: bool = False) -> np.ndarray:
+        """Capture the screen as a BGR (or gray) array.
+
+        Reads the latest frame of the device's frame source when one is
+        open, otherwise captures with raw `screencap` when the device
+        supports it. Callers checking the result of an action poll for it
+        (`wait_settled`), a frame captured just before is only one poll.
+        """
+        frame_source = get_frame_source(self.device_name)
+        if frame_source:
+            frame = frame_source.latest() or frame_source.wait_frame()
+            if frame is not None:
+                if gray:
+                    return cv2.cvtColor(frame.image, cv2.COLOR_BGR2GRAY)
+                return frame.image
+            logger.error(f"[{self.device_name}] No frame from frame source")
+        if self.raw_screencap_enabled:
+            if self.raw_screencap is None:
+                self.raw_screencap = RawScreencap(self.device_ui.adb_device)
+            try:
+                return self.raw_screencap.capture(gray=gray)
+            except Exception as e:
+                logger.error(
+                    f"[{self.device_name}] Raw screencap failed, "
+                    "fallback to screenshot",
+                    e,
+                )
+                self.raw_screencap_enabled = False
+        frame = self.device_ui.screenshot(format="opencv")
+        if gray:
+            return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return frame
+
+    def screen_fingerprint(self) -> FrameFingerprint:
+        return vision_util.frame_fingerprint(self.capture_frame(gray=True))
+
+    def is_screen_changed(
+        self,
+        before: FrameFingerprint,
+        after: Optional[FrameFingerprint] = None,
+    ) -> bool:
+        """Compare with the current screen when `after` is not given, e.g. a
+        scroll that leaves the screen unchanged reached the end of the list"""
+        if after is None:
+            after = self.screen_fingerprint()
+        return not vision_util.is_same_frame(before, after)
+
+    @timed(WAIT)
+    def wait_settled(
+        self,
+        timeout: float,
+        until: Optional[Union[List[Selector], Callable[[], bool]]] = None,
+        before: Optional[FrameFingerprint] = None,
+        stable_time: float = SETTLE_STABLE_TIME,
+    ) -> bool:
+        """Wait for the screen after an action, at most `timeout` seconds.
+
+        Returns as soon as `until` holds (any of its selectors on one dump,
+        or the check returns True). Without `until`, returns once the frames
+        stay the same for `stable_time`, counted only after the screen
+        changed from `before` when it is given.
+
+        Returns:
+            False when the timeout passed first
+        """
+        deadline = time.time() + timeout
+        last: Optional[FrameFingerprint] = None
+        stable_since: Optional[float] = None
+        while True:
+            now = time.time()
+            if until is not None:
+                if callable(until):
+                    if until():
+                        return True
+                elif self.wait_any(until, timeout=0)[0] >= 0:
+                    return True
+            else:
+                fingerprint = self.screen_fingerprint()
+                if (
+                    last is not None
+                    and not self.is_screen_changed(last, fingerprint)
+                    and (before is None or self.is_screen_changed(before, fingerprint))
+                ):
+                    stable_since = stable_since or now
+                    if time.time() - stable_since >= stable_time:
+                        return True
+                else:
+                    stable_since = None
+                last = fingerprint
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            instrumentation.sleep(min(SETTLE_POLL_INTERVAL, remaining))
+
     def take_screenshot(self, item_screen=None, file_name="tmp.png") -> str:
         full_path = IMAGE_FOLDER_PATH + file_name
         if not item_screen:
-            self.device_ui.screenshot(full_path)
+            cv2.imwrite(full_path, self.capture_frame())
         else:
             item_screen.screenshot(full_path)
 
@@ -111,18 +390,37 @@ class BaseTeleGroupService(BaseTeleService):
         self.bot_menu_timeout = 30
         self.waiting_next_run_interval: int = 3600
         self.config_device: ConfigDevice = config_device
-        self.group_index = -1
+        self.group_index: Optional[int] = -1
+        # Telegram link opening the bot, see `ConfigDevice`
+        self.bot_link: Optional[str] = None
+        # any of these shows the bot menu is loaded, e.g. its home tab or a
+        # popup shown over it
+        self.bot_menu_selectors: List[Selector] = []
+        # flow file run in the bot web app, see `flow_util`
+        self.flow_name: Optional[str] = None
+        self.flow_timings: List[StepTiming] = []
+        self._match_cache: OrderedDict = OrderedDict()
+        self.last_fingerprint: Optional[FrameFingerprint] = None
+
+    def _get_run_key(self) -> Union[int, str]:
+        """The group id keeps the run times recorded before bot links"""
+        return get_run_key(self.group_index, self.group_name)
 
     def _get_run_last_at(self) -> int:
-        return self.config_device.last_running_ts_by_group_id.get(
-            self.get_group_index(), 0
-        )
+        run_key = self._get_run_key()
+        last_run_at = run_state_store.get_last_run_at(self.device_name, run_key)
+        if last_run_at is None:
+            return self.config_device.last_running_ts_by_group_id.get(run_key, 0)
+        return last_run_at
 
     def _set_run_last_at(self) -> bool:
         current_time = int(time.time())
         self.config_device.last_running_ts_by_group_id[
-            self.get_group_index()
+            self._get_run_key()
         ] = current_time
+        run_state_store.set_last_run_at(
+            self.device_name, self._get_run_key(), current_time
+        )
         return True
 
     def _check_run_app(self) -> bool:
@@ -130,112 +428,273 @@ class BaseTeleGroupService(BaseTeleService):
         pre_run_at = self._get_run_last_at()
         return (current_time - pre_run_at) >= self.waiting_next_run_interval
 
-    def _open_bot_menu(self) -> bool:
-        result = self.device_ui(description="Bot menu").click_exists(UI_TIMEOUT // 2)
-        if result:
-            logger.info(
-                f"[{self.device_name}] Open bot page {self.group_name} successfully"
-            )
-            self.device_ui(
-                text="Start",
-                clickable=True,
-                packageName=self.package_name,
-            ).click_exists(UI_TIMEOUT // 2)
-            # wait for loading finished
-            self._waiting_bot_menu_loaded()
-        else:
-            logger.error(f"[{self.device_name}] Open bot page {self.group_name} failed")
-        return result
-
-    def _is_group_home_screen(self) -> bool:
-        return self.device_ui(
-            text=self.group_name,
-            packageName=self.package_name,
-        ).exists(UI_TIMEOUT)
-
-    def _open_group_chat(self) -> bool:
-        if not self.is_tele_home_screen():
-            logger.info(f"[{self.device_name}] Try switch to tele home screen")
-            self.back_to_app_home_screen()
-
+    def _nav_open_group_chat(self, snapshot: HierarchySnapshot) -> bool:
         """Open group chat from tele home screen"""
+        if self.bot_link and (self.group_index is None or self.group_index < 0):
+            return self._open_bot_link()
         group_index = self.get_group_index()
-        btn_group_press = (
-            self.device_ui(
+        btn_group_press = self.tap_control(
+            f"group_row_{group_index}",
+            lambda snapshot: snapshot(
                 className="androidx.recyclerview.widget.RecyclerView",
                 packageName=self.package_name,
-            )
-            .child(index=group_index)
-            .click_exists(UI_TIMEOUT)
+            ).child(index=group_index),
+            verify=[{"text": self.group_name, "packageName": self.package_name}],
+            snapshot=snapshot,
         )
-        if btn_group_press:
-            logger.info(
-                f"[{self.device_name}] Open group: {self.group_name} successfully"
-            )
-        else:
+        if not btn_group_press:
             logger.error(f"[{self.device_name}] Open group: {self.group_name} failed")
-        return self._is_group_home_screen()
+            return False
+        logger.info(f"[{self.device_name}] Open group: {self.group_name} successfully")
+        return True
+
+    def _nav_open_bot_menu(self, snapshot: HierarchySnapshot) -> bool:
+        # the first launch asks to press Start
+        opened_selectors = [
+            {"text": "Start", "clickable": True, "packageName": self.package_name},
+            *self.bot_menu_selectors,
+            {"className": WEB_VIEW_CLASS_NAME, "packageName": self.package_name},
+        ]
+        if not self.tap_control(
+            "bot_menu",
+            {"description": "Bot menu", "packageName": self.package_name},
+            verify=opened_selectors,
+            timeout=UI_TIMEOUT // 2,
+            snapshot=snapshot,
+        ):
+            logger.error(f"[{self.device_name}] Open bot page {self.group_name} failed")
+            return False
+        logger.info(
+            f"[{self.device_name}] Open bot page {self.group_name} successfully"
+        )
+        (index, btn_start) = self.wait_any(opened_selectors, timeout=UI_TIMEOUT // 2)
+        if index == 0:
+            btn_start.click()
+        # wait for loading finished
+        self._waiting_bot_menu_loaded()
+        return True
 
-    def _close_bot_menu(self) -> bool:
+    def _nav_close_bot_menu(self, snapshot: HierarchySnapshot) -> bool:
         result = (
-            self.device_ui(
-                text=self.group_name,
-                packageName=self.package_name,
-            )
+            snapshot(text=self.group_name, packageName=self.package_name)
             .sibling(index=0)
-            .click_exists(UI_TIMEOUT // 2)
+            .click()
         )
         if result:
             logger.info(
                 f"[{self.device_name}] Close bot page {self.group_name} successfully"
             )
+            self.wait_settled(UI_TIMEOUT // 2)
         else:
             logger.error(
                 f"[{self.device_name}] Close bot page {self.group_name} failed"
             )
+        return result
 
+    def _nav_confirm_close(self, snapshot: HierarchySnapshot) -> bool:
+        result = snapshot(text="Close anyway", packageName=self.package_name).click()
+        if result:
+            logger.info(
+                f"[{self.device_name}] Close group: {self.group_name} successfully"
+            )
+            self.wait_settled(UI_TIMEOUT // 2)
         return result
 
+    def _open_bot_link(self) -> bool:
+        """Start the bot chat or web app with a VIEW intent on `bot_link`"""
+        response = self.device_ui.shell(
+            [
+                "am",
+                "start",
+                "-a",
+                "android.intent.action.VIEW",
+                "-d",
+                self.bot_link,
+                "-p",
+                self.package_name,
+            ]
+        )
+        if response.exit_code != 0 or "Error" in response.output:
+            logger.error(
+                f"[{self.device_name}] Open link {self.bot_link} failed:"
+                f" {response.output}"
+            )
+            return False
+        # a web app opened by link may ask to confirm the launch first
+        (index, btn_launch) = self.wait_any(
+            [
+                *self.bot_menu_selectors,
+                {"description": "Bot menu", "packageName": self.package_name},
+                {
+                    "textMatches": "(?i)^(open|launch|start)$",
+                    "clickable": True,
+                    "packageName": self.package_name,
+                },
+            ],
+            timeout=self.bot_menu_timeout,
+        )
+        if index < 0:
+            logger.error(f"[{self.device_name}] Open link {self.bot_link} timeout")
+            return False
+        if index == len(self.bot_menu_selectors) + 1:
+            btn_launch.click()
+            self._waiting_bot_menu_loaded()
+        logger.info(f"[{self.device_name}] Open link {self.bot_link} successfully")
+        return True
+
     def start_group(self) -> bool:
-        if not self._open_tele_app():
+        # the link opens the chat or the web app, navigation does the rest
+        opened_by_link = bool(self.bot_link) and self._open_bot_link()
+        if not opened_by_link and not self._open_tele_app():
             logger.error(f"[{self.device_name}] Open {self.app_name} failed")
             return False
-        if not self._open_group_chat():
-            logger.error(f"[{self.device_name}] Open group {self.group_name} failed")
-            return False
-        if not self._open_bot_menu():
+        if not self.navigate_to(BOT_WEB_APP):
             logger.error(f"[{self.device_name}] Open bot page {self.group_name} failed")
             return False
-
         return True
 
     def end_group(self) -> bool:
         """Back to Tele home screen"""
-        if self._close_bot_menu():
-            # BACK TO APP HOME SCREEN
-            return self.back_to_a_screen()
-        else:
-            logger.error(
-                f"[{self.device_name}] Close bot page {self.group_name} failed"
-            )
-            return False
+        return self.navigate_to(TELE_HOME)
 
     def _waiting_bot_menu_loaded(self) -> bool:
-        logger.info(
-            f"[{self.device_name}] Waiting for bot menu loaded"
-            f" in {self.bot_menu_timeout}s..."
+        if not self.bot_menu_selectors:
+            logger.info(
+                f"[{self.device_name}] Waiting for bot menu loaded"
+                f" in {self.bot_menu_timeout}s..."
+            )
+            instrumentation.sleep(self.bot_menu_timeout)
+            return True
+        logger.info(f"[{self.device_name}] Waiting for bot menu loaded")
+        (index, _) = self.wait_any(
+            self.bot_menu_selectors, timeout=self.bot_menu_timeout
         )
-        time.sleep(self.bot_menu_timeout)
-        return True
+        if index < 0:
+            logger.error(
+                f"[{self.device_name}] Bot menu {self.group_name} not loaded"
+                f" in {self.bot_menu_timeout}s"
+            )
+        return index >= 0
 
     def get_group_index(self) -> int:
-        if self.group_index >= 0:
+        if self.group_index is not None and self.group_index >= 0:
             return self.group_index
 
         raise NotImplementedError(
             f"[{self.device_name}] Subclasses must implement this method"
         )
 
+    @timed(VISION)
+    def _match_items(
+        self, frame: np.ndarray, items: List[MatchItem]
+    ) -> List[List[MatchBox]]:
+        """Match every template inside its search region first, falling back
+        to the full frame on a miss; on the vision pool when it is enabled"""
+        item_templates = [template_registry.get(path) for (path, _, _) in items]
+        requests = [
+            (
+                item_path,
+                threshold,
+                pyramid,
+                roi_store.get_roi(item_template.template_id, frame.shape),
+            )
+            for (item_path, threshold, pyramid), item_template in zip(
+                items, item_templates
+            )
+        ]
+        results = None
+        if vision_pool.enabled:
+            try:
+                results = vision_pool.match(self.device_name, frame, requests)
+            except Exception as e:
+                logger.error(
+                    f"[{self.device_name}] Vision pool failed, match inline", e
+                )
+        if results is None:
+            results = vision_pool_util.match_items(frame, requests)
+        for item_template, boxes in zip(item_templates, results):
+            roi_store.record(item_template.template_id, frame.shape, boxes)
+        return results
+
+    def _save_matched_frame(
+        self, frame: np.ndarray, matched: Dict[str, List[MatchBox]]
+    ):
+        debug_writer.submit(self.device_name, str(self.group_index), frame, matched)
+
+    def _dump_debug_frames(self) -> int:
+        """Write the last matched frames of this device, called on failure"""
+        return debug_writer.dump_ring(self.device_name, reason="failed")
+
+    def find_multi_boxes(
+        self,
+        item_thresholds: Dict[str, float],
+        frame: Optional[np.ndarray] = None,
+        pyramid: bool = False,
+    ) -> Dict[str, List[MatchBox]]:
+        """Match several templates against one captured frame.
+
+        Args:
+            item_thresholds: template path (or id) -> matching threshold
+            frame: frame to search, a new one is captured when not given
+            pyramid: match on a downscaled gray frame first, then refine
+                only the candidate windows at full resolution
+
+        Returns:
+            template path (or id) -> one scored box per matched element
+        """
+        items = [
+            (item_path, threshold, pyramid)
+            for item_path, threshold in item_thresholds.items()
+        ]
+        return dict(zip(item_thresholds, self.match_items(items, frame=frame)))
+
+    def match_items(
+        self, items: List[MatchItem], frame: Optional[np.ndarray] = None
+    ) -> List[List[MatchBox]]:
+        """Match templates, each with its own threshold and pyramid mode,
+        against one captured frame, which is hashed and recorded once.
+
+        Returns:
+            one scored box per matched element, for each item in order
+        """
+        if frame is None:
+            frame = self.capture_frame()
+        fingerprint = vision_util.frame_fingerprint(frame)
+        # results of an identical frame are never matched again
+        cached = self._match_cache.pop(fingerprint.digest, {})
+        self._match_cache[fingerprint.digest] = cached
+        while len(self._match_cache) > FRAME_MATCH_CACHE_SIZE:
+            self._match_cache.popitem(last=False)
+        self.last_fingerprint = fingerprint
+
+        pending = list(dict.fromkeys(item for item in items if item not in cached))
+        if pending:
+            for item, boxes in zip(pending, self._match_items(frame, pending)):
+                cached[item] = boxes
+        results = [cached[item] for item in items]
+        self._save_matched_frame(
+            frame,
+            {item_path: boxes for (item_path, _, _), boxes in zip(items, results)},
+        )
+        return results
+
+    def find_multi_items(
+        self,
+        item_thresholds: Dict[str, float],
+        frame: Optional[np.ndarray] = None,
+        num_div: int = 3,
+        add_x=0,
+        add_y=0,
+        pyramid: bool = False,
+    ) -> Dict[str, List[Tuple[int, int]]]:
+        """Same as `find_multi_boxes`, returns the click positions as
+        `find_items` does"""
+        matched = self.find_multi_boxes(item_thresholds, frame=frame, pyramid=pyramid)
+        return {
+            item_path: [box.position(num_div, add_x, add_y) for box in boxes]
+            for item_path, boxes in matched.items()
+        }
+
     def find_items(
         self,
         item_path="",
@@ -243,39 +702,55 @@ class BaseTeleGroupService(BaseTeleService):
         num_div: int = 3,
         add_x=0,
         add_y=0,
+        pyramid: bool = False,
     ) -> List[Tuple[int, int]]:
-        item_template = cv2.imread(item_path)
-        screenshot = self.device_ui.screenshot(format="opencv")
-        # gray_screenshot = cv2.cvtColor(screenshot, cv2.COLOR_BGR2HSV)
-        # gray_item_template = cv2.cvtColor(item_template, cv2.COLOR_BGR2HSV)
-        result = cv2.matchTemplate(
-            screenshot, item_template, cv2.TM_CCOEFF_NORMED
-        )
-        loc = np.where(result >= threshold)
-        (height, width, _) = item_template.shape
-        i = width // num_div
-        j = height // num_div
-        int_tuples = {
-            ((int(x) // i + add_x) * i, (int(y) // j + add_y) * j)
-            for x, y in list(zip(*loc[::-1]))
-        }
-        for (x, y) in int_tuples:
-            cv2.rectangle(
-                screenshot,
-                (x, y),
-                (x + item_template.shape[1], y + item_template.shape[0]),
-                (255, 0, 0),
-                2,
-            )
-        cv2.imwrite(
-            f"resources/image/tmp/matched_{self.device_name}_{self.group_index}.png",
-            screenshot,
-        )
-
-        return list(int_tuples)
+        return self.find_multi_items(
+            {item_path: threshold},
+            num_div=num_div,
+            add_x=add_x,
+            add_y=add_y,
+            pyramid=pyramid,
+        )[item_path]
+
+    def run_flow(self, flow_name: str) -> bool:
+        runner = FlowRunner(self, flow_registry.get(flow_name, self.package_name))
+        try:
+            return runner.run()
+        finally:
+            self.flow_timings = runner.timings
+            timeout_store.save()
+            roi_store.save()
 
     def run_app(self) -> bool:
-        raise NotImplementedError(
-            f"[{self.device_name}] Subclasses must implement"
-            f"this method on {self.group_name}"
-        )
+        if not self.flow_name:
+            raise NotImplementedError(
+                f"[{self.device_name}] Subclasses must implement"
+                f"this method on {self.group_name}"
+            )
+        if not self._check_run_app():
+            logger.info(f"[{self.device_name}] Ignore running app {self.group_name}")
+            return False
+        started_at = time.time()
+        outcome = RUN_ERROR
+        debug_writer.reset(self.device_name)
+        try:
+            with instrumentation.run(self.device_name, type(self).__name__):
+                result = self.start_group() and self.run_flow(self.flow_name)
+                if result:
+                    self._set_run_last_at()
+                    result = self.end_group()
+            outcome = RUN_OK if result else RUN_FAILED
+            return result
+        except Exception as e:
+            logger.error(f"[{self.device_name}] Error running app {self.app_name}:", e)
+            return False
+        finally:
+            if outcome != RUN_OK:
+                self._dump_debug_frames()
+            run_state_store.record_run(
+                self.device_name,
+                type(self).__name__,
+                self._get_run_key(),
+                started_at,
+                outcome,
+            )
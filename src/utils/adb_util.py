@@ -1,10 +1,16 @@
-from typing import List, Tuple
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
-from adbutils import AdbClient
+from adbutils import AdbClient, AdbError
 from adbutils._device import AdbDevice, WindowSize
 
-from src.configs.common_config import ADB_HOST, ADB_PORT
+from src.configs.common_config import ADB_HOST, ADB_PORT, DEVICE_RESOLVE_INTERVAL
 from src.utils.common_util import random_int
+from src.utils.log_util import logger
+
+# adb state of a device ready for commands
+DEVICE_ONLINE = "device"
 
 
 def get_devices() -> List[AdbDevice]:
@@ -13,6 +19,106 @@ def get_devices() -> List[AdbDevice]:
     return devices
 
 
+def get_device(serial_no: str) -> AdbDevice:
+    return AdbClient(host=ADB_HOST, port=ADB_PORT).device(serial_no)
+
+
+class DeviceWatcher:
+    """Devices attached to adb, kept up to date by one `track-devices`
+    connection instead of listing them in a loop.
+
+    A booting VM is handed to exactly one worker by `claim`, by the serial
+    resolved for that VM only, so workers booting at the same time never
+    take each other's device.
+    """
+
+    def __init__(self, host: str = ADB_HOST, port: int = ADB_PORT):
+        self.host = host
+        self.port = port
+        self._condition = threading.Condition()
+        # serial -> adb state
+        self._states: Dict[str, str] = {}
+        # serial -> name of the VM it was claimed for
+        self._claimed: Dict[str, str] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="adb-device-watcher", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                adb = AdbClient(host=self.host, port=self.port)
+                for event in adb.track_devices():
+                    self._on_event(
+                        event.serial, event.status if event.present else None
+                    )
+            except (AdbError, OSError) as e:
+                logger.error("Track adb devices failed, reconnecting", e)
+            with self._condition:
+                self._states.clear()
+            time.sleep(1)
+
+    def _on_event(self, serial: str, status: Optional[str]):
+        with self._condition:
+            if status is None:
+                self._states.pop(serial, None)
+            else:
+                self._states[serial] = status
+            self._condition.notify_all()
+
+    def get_serials(self) -> Set[str]:
+        """Serials of the devices online"""
+        with self._condition:
+            return {
+                serial
+                for serial, status in self._states.items()
+                if status == DEVICE_ONLINE
+            }
+
+    def claim(
+        self,
+        vm_name: str,
+        resolve_serial: Callable[[], Optional[str]],
+        timeout: float,
+    ) -> Optional[str]:
+        """Wait for the device of `vm_name` to come online and claim it, once
+        the watcher is started. None when it isn't online after `timeout`.
+
+        `resolve_serial` gives the serial of the VM, None while it isn't
+        known yet.
+        """
+        deadline = time.time() + timeout
+        while True:
+            serial = resolve_serial()
+            with self._condition:
+                if (
+                    serial is not None
+                    and self._states.get(serial) == DEVICE_ONLINE
+                    and serial not in self._claimed
+                ):
+                    self._claimed[serial] = vm_name
+                    return serial
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                # woken by adb events, the VM serial is resolved again meanwhile
+                self._condition.wait(min(remaining, DEVICE_RESOLVE_INTERVAL))
+
+    def release(self, serial: str):
+        with self._condition:
+            self._claimed.pop(serial, None)
+
+
+device_watcher = DeviceWatcher()
+
+
 def get_random_position_to_click(device_size: WindowSize) -> Tuple[int, int]:
     min_value = -int(device_size.width * 0.2)
     max_value = -min_value
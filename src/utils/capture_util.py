@@ -0,0 +1,93 @@
+import struct
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from adbutils._device import AdbDevice
+
+# screencap pixel formats with 4 bytes per pixel -> conversion to BGR / gray
+PIXEL_FORMAT_TO_CONVERSION = {
+    1: (cv2.COLOR_RGBA2BGR, cv2.COLOR_RGBA2GRAY),  # RGBA_8888
+    2: (cv2.COLOR_RGBA2BGR, cv2.COLOR_RGBA2GRAY),  # RGBX_8888
+    5: (cv2.COLOR_BGRA2BGR, cv2.COLOR_BGRA2GRAY),  # BGRA_8888
+}
+# width, height, format and, since Android 9, a color space
+SCREENCAP_HEADER = struct.Struct("<3I")
+MAX_HEADER_SIZE = 16
+
+
+def parse_raw_screencap(data) -> Tuple[np.ndarray, int]:
+    """Wrap raw `screencap` output as a (height, width, 4) array, no copy.
+
+    Returns:
+        the pixel array (a view on `data`) and the pixel format
+    """
+    (width, height, pixel_format) = SCREENCAP_HEADER.unpack_from(data)
+    if pixel_format not in PIXEL_FORMAT_TO_CONVERSION:
+        raise ValueError(f"Unsupported screencap pixel format: {pixel_format}")
+    size = width * height * 4
+    header_size = len(data) - size
+    if header_size not in (SCREENCAP_HEADER.size, MAX_HEADER_SIZE):
+        raise ValueError(
+            f"Invalid screencap size {len(data)} for {width}x{height} frame"
+        )
+    pixels = np.frombuffer(data, dtype=np.uint8, count=size, offset=header_size)
+    return (pixels.reshape(height, width, 4), pixel_format)
+
+
+def convert_raw_frame(
+    pixels: np.ndarray,
+    pixel_format: int,
+    gray: bool = False,
+    dst: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    (to_bgr, to_gray) = PIXEL_FORMAT_TO_CONVERSION[pixel_format]
+    return cv2.cvtColor(pixels, to_gray if gray else to_bgr, dst=dst)
+
+
+class RawScreencap:
+    """Captures the framebuffer with `screencap` (no PNG encode / decode).
+
+    The output is streamed over the adb connection straight into one
+    preallocated buffer, wrapped with `np.frombuffer` and converted once to
+    BGR (or gray) by OpenCV.
+    """
+
+    def __init__(self, adb_device: AdbDevice):
+        self.adb_device = adb_device
+        self._buffer: Optional[bytearray] = None
+
+    def capture_raw(self) -> memoryview:
+        conn = self.adb_device.open_transport()
+        try:
+            conn.send_command("exec:screencap")
+            conn.check_okay()
+            sock = conn.conn
+            header = bytearray(SCREENCAP_HEADER.size)
+            view = memoryview(header)
+            received = 0
+            while received < len(header):
+                size = sock.recv_into(view[received:])
+                if not size:
+                    raise ConnectionError("screencap closed before header")
+                received += size
+            (width, height, _) = SCREENCAP_HEADER.unpack_from(header)
+            # the buffer is reused between captures, frames returned before
+            # are converted copies so they are never overwritten
+            total = MAX_HEADER_SIZE + width * height * 4
+            if self._buffer is None or len(self._buffer) != total:
+                self._buffer = bytearray(total)
+            view = memoryview(self._buffer)
+            view[: len(header)] = header
+            while received < total:
+                size = sock.recv_into(view[received:])
+                if not size:
+                    break
+                received += size
+            return view[:received]
+        finally:
+            conn.close()
+
+    def capture(self, gray: bool = False) -> np.ndarray:
+        (pixels, pixel_format) = parse_raw_screencap(self.capture_raw())
+        return convert_raw_frame(pixels, pixel_format, gray=gray)
@@ -0,0 +1,75 @@
+import json
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from src.configs.common_config import COORDINATE_CACHE_FILE
+from src.utils.log_util import logger
+
+Point = Tuple[int, int]
+
+
+class CoordinateStore:
+    """Tap positions of UI controls, persisted to `COORDINATE_CACHE_FILE`.
+
+    Positions are keyed by device, resolution, app version and control id,
+    so a new app version or screen size never reuses an old position.
+    Callers confirm the result of every cached tap and `invalidate` the
+    position on a mismatch.
+    """
+
+    def __init__(self, file_path: str = COORDINATE_CACHE_FILE):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._points: Dict[str, list] = self._load()
+
+    @staticmethod
+    def get_key(
+        device_name: str, resolution: str, app_version: str, control_id: str
+    ) -> str:
+        return "|".join((device_name, resolution, app_version, control_id))
+
+    def _load(self) -> Dict[str, list]:
+        if not os.path.exists(self.file_path):
+            return {}
+        try:
+            with open(self.file_path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            logger.error(f"Load coordinate cache {self.file_path} failed", e)
+            return {}
+
+    def save(self):
+        # one save at a time, so an older snapshot never replaces a newer one
+        with self._save_lock:
+            with self._lock:
+                data = json.dumps(self._points, indent=1, sort_keys=True)
+            temp_path = f"{self.file_path}.tmp"
+            try:
+                os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+                with open(temp_path, "w") as file:
+                    file.write(data)
+                os.replace(temp_path, self.file_path)
+            except OSError as e:
+                logger.error(f"Save coordinate cache {self.file_path} failed", e)
+
+    def get(self, key: str) -> Optional[Point]:
+        point = self._points.get(key)
+        return (point[0], point[1]) if point else None
+
+    def put(self, key: str, point: Point):
+        with self._lock:
+            changed = self._points.get(key) != list(point)
+            self._points[key] = list(point)
+        if changed:
+            self.save()
+
+    def invalidate(self, key: str):
+        with self._lock:
+            removed = self._points.pop(key, None)
+        if removed is not None:
+            self.save()
+
+
+coordinate_store = CoordinateStore()
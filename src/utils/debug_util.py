@@ -0,0 +1,140 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from src.configs.common_config import (
+    DEBUG_ARTIFACT_EVERY_N,
+    DEBUG_ARTIFACT_MODE,
+    DEBUG_ARTIFACT_QUEUE_SIZE,
+    DEBUG_FOLDER_PATH,
+    DEBUG_RING_SIZE,
+)
+from src.utils import vision_util
+from src.utils.log_util import logger
+from src.utils.vision_util import MatchBox
+
+DEBUG_ARTIFACT_MODES = ("always", "on_miss", "every_n", "off")
+
+# (timestamp, frame, matched boxes by template)
+MatchedFrame = Tuple[float, np.ndarray, Dict[str, List[MatchBox]]]
+
+
+class DebugArtifactWriter:
+    """Writes matched screenshots from a background thread.
+
+    Every matched frame is kept in a per-device ring buffer of the last
+    `ring_size` frames of the current run, which is only written by
+    `dump_ring` when the run fails. Besides that, frames are sampled into a
+    bounded queue according to `mode`; when the queue is full the frame is
+    dropped instead of blocking the caller.
+    """
+
+    def __init__(
+        self,
+        mode: str = DEBUG_ARTIFACT_MODE,
+        every_n: int = DEBUG_ARTIFACT_EVERY_N,
+        queue_size: int = DEBUG_ARTIFACT_QUEUE_SIZE,
+        ring_size: int = DEBUG_RING_SIZE,
+        folder_path: str = DEBUG_FOLDER_PATH,
+    ):
+        if mode not in DEBUG_ARTIFACT_MODES:
+            raise ValueError(f"Invalid debug artifact mode: {mode}")
+        self.mode = mode
+        self.every_n = max(1, every_n)
+        self.ring_size = ring_size
+        self.folder_path = folder_path
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._rings: Dict[str, Deque[MatchedFrame]] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _should_write(self, device_name: str, matched) -> bool:
+        if self.mode == "always":
+            return True
+        if self.mode == "on_miss":
+            return not all(matched.values())
+        if self.mode == "every_n":
+            return self._counts[device_name] % self.every_n == 0
+        return False
+
+    def submit(
+        self,
+        device_name: str,
+        file_name: str,
+        frame: np.ndarray,
+        matched: Dict[str, List[MatchBox]],
+    ):
+        """Record a matched frame, the frame must not be modified afterwards"""
+        with self._lock:
+            ring = self._rings.get(device_name)
+            if ring is None:
+                ring = deque(maxlen=self.ring_size)
+                self._rings[device_name] = ring
+            ring.append((time.time(), frame, matched))
+            self._counts[device_name] = self._counts.get(device_name, 0) + 1
+            write = self._should_write(device_name, matched)
+        if write:
+            self._put(f"matched_{device_name}_{file_name}.png", frame, matched)
+
+    def reset(self, device_name: str):
+        """Forget the frames of a previous run of the device"""
+        with self._lock:
+            self._rings.pop(device_name, None)
+
+    def dump_ring(self, device_name: str, reason: str = "failed") -> int:
+        with self._lock:
+            frames = list(self._rings.pop(device_name, ()))
+        for index, (ts, frame, matched) in enumerate(frames):
+            file_name = f"{reason}_{device_name}_{int(ts)}_{index}.png"
+            self._put(file_name, frame, matched, block=True)
+        if frames:
+            logger.info(
+                f"[{device_name}] Dumped {len(frames)} debug frames to "
+                f"{self.folder_path}"
+            )
+        return len(frames)
+
+    def _put(self, file_name: str, frame, matched, block: bool = False):
+        self._start()
+        try:
+            self._queue.put((file_name, frame, matched), block=block, timeout=1)
+        except queue.Full:
+            logger.debug(f"Debug artifact queue full, drop {file_name}")
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                os.makedirs(self.folder_path, exist_ok=True)
+                self._thread = threading.Thread(
+                    target=self._run, name="debug-artifact-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            (file_name, frame, matched) = self._queue.get()
+            try:
+                image = frame.copy()
+                for boxes in matched.values():
+                    vision_util.draw_boxes(image, boxes)
+                cv2.imwrite(os.path.join(self.folder_path, file_name), image)
+            except Exception as e:
+                logger.error(f"Write debug artifact {file_name} failed", e)
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        if self._thread is not None:
+            self._queue.join()
+
+
+debug_writer = DebugArtifactWriter()
@@ -1,10 +1,16 @@
 import re
 import subprocess
 import time
+from typing import Optional
 
 from src.configs.common_config import GENYMOTION_PATH
 from src.utils.log_util import logger
 
+# guest property set by Genymotion to the IP of a booted VM, adb connects to
+# it on `GENYMOTION_ADB_PORT`
+GENYMOTION_IP_PROPERTY = "androvm_ip_management"
+GENYMOTION_ADB_PORT = 5555
+
 
 def get_vms():
     """
@@ -25,6 +31,20 @@ def get_vms():
         return []
 
 
+def get_vm_serial(vn_id) -> Optional[str]:
+    """adb serial of a running VM, None while it doesn't have an IP yet"""
+    try:
+        output = subprocess.check_output(
+            ["VBoxManage", "guestproperty", "get", vn_id, GENYMOTION_IP_PROPERTY],
+            stderr=subprocess.DEVNULL,
+        ).decode("utf-8")
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.error(f"Get serial of vm: {vn_id}", e)
+        return None
+    match = re.search(r"Value:\s*(\S+)", output)
+    return f"{match.group(1)}:{GENYMOTION_ADB_PORT}" if match else None
+
+
 def start_vm(vm_name, vn_id, wait_seconds=60):
     """
     player Options:
@@ -62,7 +82,28 @@ def start_vm(vm_name, vn_id, wait_seconds=60):
         logger.error(f"An error occurred when start vm: {vm_name}", e)
 
 
-def stop_vm(vm_name, vn_id, wait_seconds=60):
+def is_vm_running(vn_id) -> bool:
+    try:
+        output = subprocess.check_output(["VBoxManage", "list", "runningvms"]).decode(
+            "utf-8"
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.error("Get running vms", e)
+        return False
+    return f"{{{vn_id}}}" in output
+
+
+def wait_vm_stopped(vm_name, vn_id, wait_seconds=60, interval=1) -> bool:
+    deadline = time.time() + wait_seconds
+    while is_vm_running(vn_id):
+        if time.time() >= deadline:
+            logger.error(f"VM still running after {wait_seconds}s: {vm_name}")
+            return False
+        time.sleep(interval)
+    return True
+
+
+def stop_vm(vm_name, vn_id, wait_seconds=60, save_state=False):
     """
     player Options:
         -h, --help                       Displays help on commandline options.
@@ -79,19 +120,26 @@ def stop_vm(vm_name, vn_id, wait_seconds=60):
         -z, --stopadb                    Disconnect ADB.
         --log-filter-rules <rules>       Log filter rules.
         --resume                         Resume latest snapshot.
+
+    `save_state` saves the running state with VirtualBox instead, the next
+    start resumes it rather than booting Android again.
     """
     try:
         logger.info(f"Stopping vm: {vm_name}")
-        subprocess.run(
-            [
-                f"{GENYMOTION_PATH}/player",
-                "--vm-name",
-                vn_id,
-                "-x",
-            ],
-        )
-        time.sleep(wait_seconds)  # wait for VM to fully stop
-        logger.info(f"Successfully stopped the VM: {vm_name}")
+        if save_state:
+            subprocess.run(["VBoxManage", "controlvm", vn_id, "savestate"])
+        else:
+            subprocess.run(
+                [
+                    f"{GENYMOTION_PATH}/player",
+                    "--vm-name",
+                    vn_id,
+                    "-x",
+                ],
+            )
+        # wait for VM to fully stop
+        if wait_vm_stopped(vm_name, vn_id, wait_seconds):
+            logger.info(f"Successfully stopped the VM: {vm_name}")
     except subprocess.CalledProcessError as e:
         logger.error(f"Failed to start the VM: {vm_name}", e)
     except Exception as e:
@@ -0,0 +1,655 @@
+import os
+import re
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import yaml
+
+from src.configs.common_config import (
+    FLOW_FOLDER_PATH,
+    FLOW_REPEAT_TIMES,
+    UI_POLL_INTERVAL,
+    UI_TIMEOUT,
+)
+from src.utils.coordinate_util import Point
+from src.utils.hierarchy_util import HierarchySnapshot, Selector, SnapshotSelection
+from src.utils.instrument_util import instrumentation
+from src.utils.log_util import logger
+from src.utils.timeout_util import TimeoutStore, timeout_store
+
+if TYPE_CHECKING:
+    from src.services.tele_service import BaseTeleGroupService
+
+# step keys that name what the step does, exactly one per step
+ACTIONS = (
+    "click",
+    "tap",
+    "scroll",
+    "check",
+    "wait",
+    "settle",
+    "back",
+    "navigate",
+    "call",
+    "if",
+    "repeat",
+    "each",
+    "steps",
+)
+# keys of a selector spec chaining to other nodes, as `UiObject.child`/`sibling`
+CHAIN_KEYS = ("child", "sibling")
+# actions changing the screen, their `settle` waits after every change
+TAP_ACTIONS = ("click", "tap", "scroll")
+# scroll directions -> `UiObject.scroll` actions
+SCROLL_ACTIONS = {"down": "forward", "up": "backward"}
+# loop iterations in a step path, `repeat`/`each` run `<path>/#<index>/<step>`
+ITERATION_PATTERN = re.compile(r"/#\d+/")
+
+
+class TemplateSpec(NamedTuple):
+    item_path: str
+    threshold: float
+    pyramid: bool
+    num_div: int
+    add_x: int
+    add_y: int
+
+
+class Condition(NamedTuple):
+    """Exactly one of a selector to find or a template to match"""
+
+    selector: Optional[Selector]
+    template: Optional[TemplateSpec]
+
+
+# the node found by an `exists` condition, or the positions matched by a
+# `matched` one
+CheckResult = Union[SnapshotSelection, List[Point]]
+
+
+class Settle(NamedTuple):
+    timeout: float
+    until: Optional[List[Selector]]
+    # wait for the screen to change from the one before the action first
+    changed: bool
+
+
+class Step:
+    """One compiled step, run by `FlowRunner._run_<action>`; a `steps`
+    block compiles to the `block` action"""
+
+    def __init__(
+        self,
+        name: str,
+        action: str,
+        args: dict,
+        optional: bool = False,
+        retry: int = 0,
+        settle: Optional[Settle] = None,
+    ):
+        self.name = name
+        self.action = action
+        self.args = args
+        self.optional = optional
+        self.retry = retry
+        self.settle = settle
+
+    def __repr__(self) -> str:
+        return f"Step({self.name!r}, {self.action!r})"
+
+
+class FlowPlan(NamedTuple):
+    name: str
+    steps: List[Step]
+
+
+class StepTiming(NamedTuple):
+    # step names from the top of the flow, e.g. `earn/earn tab`, with the
+    # loop iterations, e.g. `earn tasks/#1/new tab`
+    path: str
+    action: str
+    seconds: float
+    ok: bool
+
+
+def compile_selector(spec: dict, package_name: str) -> Selector:
+    """Selector spec of a flow file -> `Selector`.
+
+    `packageName` defaults to the app of the service, `packageName: null`
+    matches any app. `child`/`sibling` chain to other nodes.
+    """
+    selector = {key: value for key, value in spec.items() if key not in CHAIN_KEYS}
+    selector.setdefault("packageName", package_name)
+    if selector["packageName"] is None:
+        del selector["packageName"]
+    chain = [(key, dict(spec[key])) for key in CHAIN_KEYS if key in spec]
+    if not chain:
+        return selector
+
+    def select(snapshot: HierarchySnapshot):
+        selection = snapshot(**selector)
+        for key, chained in chain:
+            selection = getattr(selection, key)(**chained)
+        return selection
+
+    return select
+
+
+def compile_template(spec) -> TemplateSpec:
+    if isinstance(spec, str):
+        spec = {"template": spec}
+    return TemplateSpec(
+        item_path=spec["template"],
+        threshold=float(spec.get("threshold", 0.95)),
+        pyramid=bool(spec.get("pyramid", False)),
+        num_div=int(spec.get("num_div", 3)),
+        add_x=int(spec.get("add_x", 0)),
+        add_y=int(spec.get("add_y", 0)),
+    )
+
+
+class FlowCompiler:
+    """Flow file data -> `FlowPlan`.
+
+    A flow file has a list of `steps`, each with one action:
+        click: selector (or `any: [selectors]`), waited for up to `timeout`,
+            less once learned by `TimeoutStore` under `<flow>/<step path>`
+        tap: template spec, or `check: name` for the positions it matched;
+            `all` taps every position, in `order` asc or desc
+        scroll: selector of a scrollable node, in `direction` down or up,
+            `swipe_steps` slow; fails once the screen stays the same (the end)
+        check: {name: {exists: selector} or {matched: template spec}}
+        wait: selector or selectors, up to `timeout`
+        settle: seconds or {timeout, until: [selectors]}, as `wait_settled`
+        back: times to press back
+        navigate: screen of `navigation_util`
+        call: service method, with `args`/`kwargs` (`$name` is a check result)
+        if: check name, `not name` or inline condition, with `then`/`else`
+        repeat: steps, at most `times`, `while` a condition holds
+        each: check name, runs the `do` steps for each of its positions (in
+            `order`, the first `skip` left out) as the check `item`
+        steps: a block of steps
+    and the options `name`, `optional`, `retry` and `settle` (the wait after
+    the action, `changed: true` waits for the screen to change first).
+
+    Checks with no action between them and no timeout are independent, so
+    they are merged into one check step answered by one hierarchy dump and
+    one frame. Conditions written inline in `if`/`repeat` become such checks.
+    """
+
+    def __init__(self, flow_name: str, package_name: str):
+        self.flow_name = flow_name
+        self.package_name = package_name
+        self._condition_ids = 0
+
+    def compile(self, data: dict) -> FlowPlan:
+        return FlowPlan(self.flow_name, self.compile_steps(data["steps"], ""))
+
+    def _error(self, path: str, message: str) -> ValueError:
+        return ValueError(f"Flow {self.flow_name} step {path}: {message}")
+
+    def compile_steps(self, specs: List[dict], prefix: str) -> List[Step]:
+        steps: List[Step] = []
+        for index, spec in enumerate(specs):
+            for step in self.compile_step(spec, f"{prefix}{index}"):
+                previous = steps[-1] if steps else None
+                if previous is not None and self._can_merge(previous, step):
+                    previous.args["conditions"].update(step.args["conditions"])
+                    previous.name = f"{previous.name}+{step.name}"
+                else:
+                    steps.append(step)
+        return steps
+
+    @staticmethod
+    def _can_merge(previous: Step, step: Step) -> bool:
+        """Checks answered at once: a check waiting for its conditions, or
+        settling or retried after them, must see the screen of its turn"""
+        return all(
+            item.action == "check"
+            and item.args["timeout"] == 0
+            and item.settle is None
+            and not item.retry
+            and item.optional
+            for item in (previous, step)
+        ) and not (previous.args["conditions"].keys() & step.args["conditions"])
+
+    def compile_step(self, spec: dict, path: str) -> List[Step]:
+        """One step spec -> its step, preceded by the check of an inline
+        condition"""
+        actions = [key for key in ACTIONS if key in spec]
+        if len(actions) > 1 and "settle" in actions:
+            # the wait after another action
+            actions.remove("settle")
+        if len(actions) != 1:
+            raise self._error(path, f"needs exactly one of {ACTIONS}, got {actions}")
+        action = "block" if actions[0] == "steps" else actions[0]
+        name = str(spec.get("name", f"{path.rsplit('/', 1)[-1]}:{action}"))
+        args = getattr(self, f"_compile_{action}")(spec[actions[0]], spec, path)
+        before: Optional[Step] = args.pop("before", None)
+        settle = spec.get("settle")
+        step = Step(
+            name=name,
+            action=action,
+            args=args,
+            optional=bool(spec.get("optional", action == "check")),
+            retry=int(spec.get("retry", 0)),
+            settle=self.settle(settle) if settle and action != "settle" else None,
+        )
+        return [before, step] if before else [step]
+
+    def _compile_click(self, value: dict, spec: dict, path: str) -> dict:
+        selectors = value["any"] if "any" in value else [value]
+        return {
+            "selectors": [self.selector(item) for item in selectors],
+            "timeout": float(spec.get("timeout", UI_TIMEOUT)),
+        }
+
+    def _compile_tap(self, value: dict, spec: dict, path: str) -> dict:
+        args: dict = {
+            "all": bool(value.get("all", False)),
+            "order": value.get("order"),
+        }
+        if "check" in value:
+            args["check"] = value["check"]
+        else:
+            args["template"] = compile_template(value)
+        return args
+
+    def _compile_scroll(self, value: dict, spec: dict, path: str) -> dict:
+        direction = spec.get("direction", "down")
+        if direction not in SCROLL_ACTIONS:
+            raise self._error(path, f"unknown scroll direction {direction}")
+        selector = {key: val for key, val in value.items() if key not in CHAIN_KEYS}
+        selector.setdefault("packageName", self.package_name)
+        if selector["packageName"] is None:
+            del selector["packageName"]
+        return {
+            # scrolled by uiautomator, so the selector is kept as `device_ui`
+            # kwargs and `UiObject.child`/`sibling` chain
+            "selector": selector,
+            "chain": [(key, dict(value[key])) for key in CHAIN_KEYS if key in value],
+            "action": SCROLL_ACTIONS[direction],
+            "swipe_steps": int(spec.get("swipe_steps", 20)),
+        }
+
+    def _compile_check(self, value: dict, spec: dict, path: str) -> dict:
+        return {
+            "conditions": {
+                key: self.condition(condition, path) for key, condition in value.items()
+            },
+            "timeout": float(spec.get("timeout", 0)),
+        }
+
+    def _compile_wait(self, value, spec: dict, path: str) -> dict:
+        selectors = value if isinstance(value, list) else [value]
+        return {
+            "selectors": [self.selector(item) for item in selectors],
+            "timeout": float(spec.get("timeout", UI_TIMEOUT)),
+        }
+
+    def _compile_settle(self, value, spec: dict, path: str) -> dict:
+        return {"settle": self.settle(value)}
+
+    def _compile_back(self, value, spec: dict, path: str) -> dict:
+        return {"times": int(value)}
+
+    def _compile_navigate(self, value, spec: dict, path: str) -> dict:
+        return {"screen": str(value)}
+
+    def _compile_call(self, value, spec: dict, path: str) -> dict:
+        return {
+            "method": str(value),
+            "args": list(spec.get("args", [])),
+            "kwargs": dict(spec.get("kwargs", {})),
+        }
+
+    def _compile_if(self, value, spec: dict, path: str) -> dict:
+        (check, condition, negate) = self.inline_condition(value, path)
+        return {
+            "before": check,
+            "condition": condition,
+            "negate": negate,
+            "then": self.compile_steps(spec.get("then", []), f"{path}/then/"),
+            "else": self.compile_steps(spec.get("else", []), f"{path}/else/"),
+        }
+
+    def _compile_repeat(self, value: list, spec: dict, path: str) -> dict:
+        return {
+            "steps": self.compile_steps(value, f"{path}/"),
+            "times": int(spec.get("times", FLOW_REPEAT_TIMES)),
+            "while": (
+                self.inline_condition(spec["while"], path) if "while" in spec else None
+            ),
+        }
+
+    def _compile_each(self, value, spec: dict, path: str) -> dict:
+        return {
+            "check": str(value),
+            "as": str(spec.get("as", "item")),
+            "order": spec.get("order"),
+            "skip": int(spec.get("skip", 0)),
+            "steps": self.compile_steps(spec.get("do", []), f"{path}/"),
+        }
+
+    def _compile_block(self, value: list, spec: dict, path: str) -> dict:
+        return {"steps": self.compile_steps(value, f"{path}/")}
+
+    def selector(self, spec: dict) -> Selector:
+        return compile_selector(spec, self.package_name)
+
+    def settle(self, spec) -> Settle:
+        if not isinstance(spec, dict):
+            spec = {"timeout": spec}
+        until = spec.get("until")
+        return Settle(
+            timeout=float(spec["timeout"]),
+            until=[self.selector(item) for item in until] if until else None,
+            changed=bool(spec.get("changed", False)),
+        )
+
+    def condition(self, spec: dict, path: str) -> Condition:
+        if "exists" in spec:
+            return Condition(selector=self.selector(spec["exists"]), template=None)
+        if "matched" in spec:
+            return Condition(selector=None, template=compile_template(spec["matched"]))
+        raise self._error(path, f"condition needs `exists` or `matched`: {spec}")
+
+    def inline_condition(self, spec, path: str) -> Tuple[Optional[Step], str, bool]:
+        """`name`, `not name` or an inline condition -> (check step to run
+        first, check result name, negate)"""
+        if isinstance(spec, str):
+            negate = spec.startswith("not ")
+            return (None, spec[4:] if negate else spec, negate)
+        spec = dict(spec)
+        negate = bool(spec.pop("not", False))
+        timeout = float(spec.pop("timeout", 0))
+        self._condition_ids += 1
+        name = f"_condition_{self._condition_ids}"
+        check = Step(
+            name=f"{path}:check",
+            action="check",
+            args={
+                "conditions": {name: self.condition(spec, path)},
+                "timeout": timeout,
+            },
+            optional=True,
+        )
+        return (check, name, negate)
+
+
+class FlowRegistry:
+    """Flow files of `FLOW_FOLDER_PATH`, compiled once per app package"""
+
+    def __init__(self, folder_path: str = FLOW_FOLDER_PATH):
+        self.folder_path = folder_path
+        self._plans: Dict[Tuple[str, str], FlowPlan] = {}
+        self._lock = threading.Lock()
+
+    def get(self, flow_name: str, package_name: str) -> FlowPlan:
+        plan = self._plans.get((flow_name, package_name))
+        if plan is None:
+            with self._lock:
+                plan = self._plans.get((flow_name, package_name))
+                if plan is None:
+                    plan = self.load(flow_name, package_name)
+                    self._plans[(flow_name, package_name)] = plan
+        return plan
+
+    def load(self, flow_name: str, package_name: str) -> FlowPlan:
+        file_path = os.path.join(self.folder_path, f"{flow_name}.yaml")
+        with open(file_path, "r") as file:
+            data = yaml.safe_load(file)
+        return FlowCompiler(flow_name, package_name).compile(data)
+
+    def reload(self):
+        """Compile the flow files again on their next use"""
+        with self._lock:
+            self._plans.clear()
+
+
+class FlowRunner:
+    """Run a `FlowPlan` on a service, timing every step.
+
+    A failed step stops the steps around it unless it is `optional` (errors
+    of an optional step count as a failure); in a `repeat` it ends the loop
+    instead. Results of checks are kept by name
+    for later `if`, `tap` and `$name` call arguments.
+    """
+
+    def __init__(self, service: "BaseTeleGroupService", plan: FlowPlan):
+        self.service = service
+        self.plan = plan
+        self.device_name = service.device_name
+        self.results: Dict[str, CheckResult] = {}
+        self.timings: List[StepTiming] = []
+
+    def run(self) -> bool:
+        start_at = time.time()
+        ok = self._run_steps(self.plan.steps, "")
+        top_timings = [timing for timing in self.timings if "/" not in timing.path]
+        logger.info(
+            f"[{self.device_name}] Flow {self.plan.name} "
+            f"{'finished' if ok else 'failed'} in {time.time() - start_at:.1f}s: "
+            + ", ".join(
+                f"{timing.path} {timing.seconds:.1f}s"
+                + ("" if timing.ok else " (failed)")
+                for timing in top_timings
+            )
+        )
+        return ok
+
+    def _run_steps(self, steps: List[Step], prefix: str) -> bool:
+        for step in steps:
+            if not self._run_step(step, f"{prefix}{step.name}") and not step.optional:
+                return False
+        return True
+
+    def _run_step(self, step: Step, path: str) -> bool:
+        start_at = time.time()
+        ok = False
+        for _ in range(step.retry + 1):
+            try:
+                with instrumentation.scope(self._step_key(path)):
+                    ok = bool(getattr(self, f"_run_{step.action}")(step, path))
+            except Exception as e:
+                if not step.optional:
+                    raise
+                logger.error(f"[{self.device_name}] Error in {path}:", e)
+                ok = False
+            if ok:
+                break
+        if ok and step.settle is not None and step.action not in TAP_ACTIONS:
+            self.service.wait_settled(step.settle.timeout, until=step.settle.until)
+        seconds = time.time() - start_at
+        self.timings.append(StepTiming(path, step.action, seconds, ok))
+        if ok:
+            logger.info(f"[{self.device_name}] {path} done in {seconds:.1f}s")
+        elif step.optional:
+            logger.info(f"[{self.device_name}] {path} skipped")
+        else:
+            logger.error(f"[{self.device_name}] {path} failed")
+        return ok
+
+    def _tap(self, step: Step, point: Tuple[int, int]):
+        before = None
+        if step.settle is not None and step.settle.changed:
+            before = self.service.screen_fingerprint()
+        self.service.device_ui.click(*point)
+        if step.settle is not None:
+            self.service.wait_settled(
+                step.settle.timeout, until=step.settle.until, before=before
+            )
+
+    def _step_key(self, path: str) -> str:
+        """Timeout and instrumentation key of a step, the same in every loop
+        iteration"""
+        return f"{self.plan.name}/{ITERATION_PATTERN.sub('/', path)}"
+
+    def _run_click(self, step: Step, path: str) -> bool:
+        (index, selection) = self.service.wait_any(
+            step.args["selectors"], step.args["timeout"], self._step_key(path)
+        )
+        if index < 0 or selection.center is None:
+            return False
+        self._tap(step, selection.center)
+        return True
+
+    def _positions(self, check: str, order: Optional[str]) -> List[Point]:
+        """Positions of a check result: the nodes found or the matches"""
+        result = self.results.get(check)
+        if isinstance(result, SnapshotSelection):
+            positions = [result.center] if result.center else []
+        else:
+            positions = list(result or [])
+        if order:
+            positions.sort(reverse=order == "desc")
+        return positions
+
+    def _run_tap(self, step: Step, path: str) -> bool:
+        if "check" in step.args:
+            positions = self._positions(step.args["check"], step.args["order"])
+        else:
+            positions = self._match({"tap": step.args["template"]})["tap"]
+            if step.args["order"]:
+                positions.sort(reverse=step.args["order"] == "desc")
+        if not step.args["all"]:
+            positions = positions[:1]
+        for point in positions:
+            self._tap(step, point)
+        return bool(positions)
+
+    def _run_scroll(self, step: Step, path: str) -> bool:
+        before = self.service.screen_fingerprint()
+        node = self.service.device_ui(**step.args["selector"])
+        for key, chained in step.args["chain"]:
+            node = getattr(node, key)(**chained)
+        getattr(node.scroll, step.args["action"])(steps=step.args["swipe_steps"])
+        settle = step.settle or Settle(
+            timeout=UI_TIMEOUT // 2, until=None, changed=True
+        )
+        self.service.wait_settled(settle.timeout, until=settle.until, before=before)
+        return self.service.is_screen_changed(before)
+
+    def _match(self, templates: Dict[str, TemplateSpec]) -> Dict[str, List[Point]]:
+        """Match every template on one captured frame"""
+        matched = self.service.match_items(
+            [
+                (spec.item_path, spec.threshold, spec.pyramid)
+                for spec in templates.values()
+            ]
+        )
+        return {
+            key: [box.position(spec.num_div, spec.add_x, spec.add_y) for box in boxes]
+            for (key, spec), boxes in zip(templates.items(), matched)
+        }
+
+    def _run_check(self, step: Step, path: str) -> bool:
+        """Evaluate all conditions on one dump and one frame per poll, until
+        any of them holds or the timeout passes"""
+        conditions: Dict[str, Condition] = step.args["conditions"]
+        selectors = {
+            key: condition.selector
+            for key, condition in conditions.items()
+            if condition.selector is not None
+        }
+        templates = {
+            key: condition.template
+            for key, condition in conditions.items()
+            if condition.template is not None
+        }
+        timeout = step.args["timeout"]
+        timeout_key = None
+        if timeout > 0:
+            timeout_key = TimeoutStore.get_key(
+                type(self.service).__name__, self._step_key(path)
+            )
+            timeout = timeout_store.get_timeout(timeout_key, timeout)
+        start_at = time.time()
+        deadline = start_at + timeout
+        while True:
+            results: Dict[str, CheckResult] = {}
+            if selectors:
+                snapshot = self.service.snapshot()
+                for key, selector in selectors.items():
+                    results[key] = snapshot.select(selector)
+            if templates:
+                results.update(self._match(templates))
+            self.results.update(results)
+            if any(results.values()):
+                if timeout_key:
+                    timeout_store.record(timeout_key, time.time() - start_at)
+                return True
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                if timeout_key:
+                    timeout_store.record(timeout_key, None)
+                return False
+            instrumentation.sleep(min(UI_POLL_INTERVAL, remaining))
+
+    def _holds(self, condition: str, negate: bool) -> bool:
+        return bool(self.results.get(condition)) != negate
+
+    def _run_if(self, step: Step, path: str) -> bool:
+        if self._holds(step.args["condition"], step.args["negate"]):
+            return self._run_steps(step.args["then"], f"{path}/")
+        return self._run_steps(step.args["else"], f"{path}/")
+
+    def _run_repeat(self, step: Step, path: str) -> bool:
+        while_condition = step.args["while"]
+        for index in range(step.args["times"]):
+            if while_condition is not None:
+                (check, condition, negate) = while_condition
+                if check is not None:
+                    self._run_check(check, path)
+                if not self._holds(condition, negate):
+                    break
+            if not self._run_steps(step.args["steps"], f"{path}/#{index}/"):
+                break
+        return True
+
+    def _run_each(self, step: Step, path: str) -> bool:
+        """A failed step moves on to the next position"""
+        positions = self._positions(step.args["check"], step.args["order"])
+        for index, point in enumerate(positions[step.args["skip"] :]):
+            self.results[step.args["as"]] = [point]
+            self._run_steps(step.args["steps"], f"{path}/#{index}/")
+        return True
+
+    def _run_block(self, step: Step, path: str) -> bool:
+        return self._run_steps(step.args["steps"], f"{path}/")
+
+    def _run_wait(self, step: Step, path: str) -> bool:
+        (index, _) = self.service.wait_any(
+            step.args["selectors"], step.args["timeout"], self._step_key(path)
+        )
+        return index >= 0
+
+    def _run_settle(self, step: Step, path: str) -> bool:
+        settle: Settle = step.args["settle"]
+        self.service.wait_settled(settle.timeout, until=settle.until)
+        return True
+
+    def _run_back(self, step: Step, path: str) -> bool:
+        for _ in range(step.args["times"]):
+            self.service.back_to_a_screen()
+        return True
+
+    def _run_navigate(self, step: Step, path: str) -> bool:
+        return self.service.navigate_to(step.args["screen"])
+
+    def _run_call(self, step: Step, path: str) -> bool:
+        args = [self._resolve(arg) for arg in step.args["args"]]
+        kwargs = {key: self._resolve(arg) for key, arg in step.args["kwargs"].items()}
+        result = getattr(self.service, step.args["method"])(*args, **kwargs)
+        # methods returning nothing succeeded
+        return result is not False
+
+    def _resolve(self, arg):
+        """`$name` is the result of the check `name`"""
+        if isinstance(arg, str) and arg.startswith("$"):
+            return self.results.get(arg[1:])
+        return arg
+
+
+flow_registry = FlowRegistry()
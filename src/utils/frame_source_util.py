@@ -0,0 +1,301 @@
+import glob
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Union
+
+import cv2
+import numpy as np
+from adbutils import AdbConnection
+from adbutils._device import AdbDevice
+
+from src.configs.common_config import (
+    FRAME_SOURCE_BACKEND,
+    FRAME_SOURCE_INTERVAL,
+    FRAME_SOURCE_TIMEOUT,
+)
+from src.utils.capture_util import (
+    MAX_HEADER_SIZE,
+    SCREENCAP_HEADER,
+    RawScreencap,
+    convert_raw_frame,
+    parse_raw_screencap,
+)
+from src.utils.log_util import logger
+
+
+class Frame(NamedTuple):
+    image: np.ndarray
+    # the frame was captured at or after this time
+    timestamp: float
+
+
+class FrameSource:
+    """Keeps the latest frame of a device, read by a background thread.
+
+    Subclasses implement `_read_frame`, which blocks until the next frame is
+    read and passes it to `_publish` with the earliest time it may have been
+    captured at. Frames can be published as a conversion callback that only
+    runs when the frame is actually requested. `latest()` costs no capture,
+    `wait_frame(newer_than=...)` waits for a frame captured after a given
+    time.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._condition = threading.Condition()
+        self._latest: Optional[Frame] = None
+        self._convert: Optional[Callable[[], np.ndarray]] = None
+        self._timestamp: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self.error: Optional[Exception] = None
+
+    def _open(self):
+        pass
+
+    def _close(self):
+        pass
+
+    def _read_frame(self) -> bool:
+        """Read and publish the next frame, False when there is none left"""
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def start(self) -> "FrameSource":
+        if self._running:
+            return self
+        self.error = None
+        self._open()
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name=f"frame-source-{self.name}", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._close()
+        if self._thread is not None:
+            self._thread.join(timeout=FRAME_SOURCE_TIMEOUT)
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def _run(self):
+        try:
+            while self._running and self._read_frame():
+                pass
+        except Exception as e:
+            if self._running:
+                logger.error(f"[{self.name}] Frame source stopped", e)
+                self.error = e
+        finally:
+            self._running = False
+            with self._condition:
+                self._condition.notify_all()
+
+    def _publish(
+        self,
+        timestamp: float,
+        image: Optional[np.ndarray] = None,
+        convert: Optional[Callable[[], np.ndarray]] = None,
+    ):
+        with self._condition:
+            self._latest = None if image is None else Frame(image, timestamp)
+            self._convert = convert
+            self._timestamp = timestamp
+            self._condition.notify_all()
+
+    def latest(self) -> Optional[Frame]:
+        with self._condition:
+            if self._latest is None and self._convert is not None:
+                self._latest = Frame(self._convert(), self._timestamp or 0)
+                self._convert = None
+            return self._latest
+
+    def wait_frame(
+        self, newer_than: float = 0, timeout: float = FRAME_SOURCE_TIMEOUT
+    ) -> Optional[Frame]:
+        deadline = time.time() + timeout
+        with self._condition:
+            while self._timestamp is None or self._timestamp < newer_than:
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self._running:
+                    return None
+                self._condition.wait(remaining)
+            return self.latest()
+
+
+class ScreencapStreamSource(FrameSource):
+    """One long-lived `screencap` loop on the device, frames are parsed from
+    the stream one after another and converted only when requested."""
+
+    def __init__(
+        self,
+        name: str,
+        adb_device: AdbDevice,
+        interval: float = FRAME_SOURCE_INTERVAL,
+    ):
+        super().__init__(name)
+        self.adb_device = adb_device
+        self.interval = interval
+        self._conn: Optional[AdbConnection] = None
+        self._header_size = SCREENCAP_HEADER.size
+        # one raw buffer is filled while the other one is published
+        self._buffers: List[bytearray] = []
+        self._last_header_at = 0.0
+
+    def _open(self):
+        sdk = self.adb_device.getprop("ro.build.version.sdk")
+        # Android 9+ appends a color space to the screencap header
+        self._header_size = MAX_HEADER_SIZE if int(sdk or 0) >= 28 else 12
+        self._conn = self.adb_device.open_transport(timeout=None)
+        self._conn.send_command(
+            f"exec:sh -c 'while true; do screencap; sleep {self.interval}; done'"
+        )
+        self._conn.check_okay()
+        self._last_header_at = time.time()
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _recv_into(self, view: memoryview):
+        if self._conn is None:
+            raise ConnectionError("screencap stream not open")
+        sock = self._conn.conn
+        received = 0
+        while received < len(view):
+            size = sock.recv_into(view[received:])
+            if not size:
+                raise ConnectionError("screencap stream closed")
+            received += size
+
+    def _read_frame(self) -> bool:
+        header = bytearray(self._header_size)
+        self._recv_into(memoryview(header))
+        header_at = time.time()
+        (width, height, _) = SCREENCAP_HEADER.unpack_from(header)
+        total = self._header_size + width * height * 4
+        if not self._buffers or len(self._buffers[0]) != total:
+            self._buffers = [bytearray(total), bytearray(total)]
+        buffer = self._buffers[0]
+        buffer[: self._header_size] = header
+        self._recv_into(memoryview(buffer)[self._header_size :])
+        # this screencap only started after the previous one was written out
+        (timestamp, self._last_header_at) = (self._last_header_at, header_at)
+        # conversion runs under the condition lock, so the published buffer
+        # is never refilled while it is converted
+        self._publish(
+            timestamp, convert=lambda: convert_raw_frame(*parse_raw_screencap(buffer))
+        )
+        self._buffers.reverse()
+        return True
+
+
+class ScreencapPollSource(FrameSource):
+    """Repeated one-shot raw captures, for devices where the stream fails."""
+
+    def __init__(
+        self,
+        name: str,
+        adb_device: AdbDevice,
+        interval: float = FRAME_SOURCE_INTERVAL,
+    ):
+        super().__init__(name)
+        self.raw_screencap = RawScreencap(adb_device)
+        self.interval = interval
+
+    def _read_frame(self) -> bool:
+        started_at = time.time()
+        self._publish(started_at, image=self.raw_screencap.capture())
+        time.sleep(self.interval)
+        return True
+
+
+class PngSequenceSource(FrameSource):
+    """Plays back PNG files, a local stand-in for a device.
+
+    Args:
+        paths: file paths or a glob pattern, played in sorted order
+        interval: seconds between frames
+        loop: restart from the first file after the last one
+    """
+
+    def __init__(
+        self,
+        name: str,
+        paths: Union[str, List[str]],
+        interval: float = FRAME_SOURCE_INTERVAL,
+        loop: bool = True,
+    ):
+        super().__init__(name)
+        if isinstance(paths, str):
+            paths = sorted(glob.glob(paths))
+        if not paths:
+            raise ValueError(f"[{name}] No frames to play back")
+        self.images = [cv2.imread(path) for path in paths]
+        self.interval = interval
+        self.loop = loop
+        self._index = 0
+
+    def _read_frame(self) -> bool:
+        if self._index >= len(self.images):
+            if not self.loop:
+                return False
+            self._index = 0
+        if self._timestamp is not None:
+            time.sleep(self.interval)
+        self._publish(time.time(), image=self.images[self._index])
+        self._index += 1
+        return True
+
+
+FRAME_SOURCE_BACKENDS: Dict[str, Callable[..., FrameSource]] = {
+    "screencap_stream": ScreencapStreamSource,
+    "screencap": ScreencapPollSource,
+    "png_sequence": PngSequenceSource,
+}
+
+_frame_sources: Dict[str, FrameSource] = {}
+_frame_sources_lock = threading.Lock()
+
+
+def register_frame_source_backend(name: str, factory: Callable[..., FrameSource]):
+    FRAME_SOURCE_BACKENDS[name] = factory
+
+
+def open_frame_source(
+    device_name: str, *args, backend: str = FRAME_SOURCE_BACKEND, **kwargs
+) -> Optional[FrameSource]:
+    """Start the frame source of a device, e.g.
+    `open_frame_source(device_name, device_ui.adb_device)`"""
+    if backend == "none":
+        return None
+    close_frame_source(device_name)
+    try:
+        source = FRAME_SOURCE_BACKENDS[backend](device_name, *args, **kwargs).start()
+    except Exception as e:
+        logger.error(f"[{device_name}] Open frame source {backend} failed", e)
+        return None
+    with _frame_sources_lock:
+        _frame_sources[device_name] = source
+    logger.info(f"[{device_name}] Opened frame source {backend}")
+    return source
+
+
+def get_frame_source(device_name: str) -> Optional[FrameSource]:
+    source = _frame_sources.get(device_name)
+    if source is not None and source.running:
+        return source
+    return None
+
+
+def close_frame_source(device_name: str):
+    with _frame_sources_lock:
+        source = _frame_sources.pop(device_name, None)
+    if source is not None:
+        source.stop()
@@ -0,0 +1,246 @@
+import re
+import xml.etree.ElementTree as ElementTree
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from uiautomator2 import Device
+
+# (x1, y1, x2, y2)
+Bounds = Tuple[int, int, int, int]
+
+BOUNDS_PATTERN = re.compile(r"\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]")
+
+# uiautomator2 selector keys -> dump attribute and how it is compared, `*Matches`
+# patterns match the whole value as in uiautomator
+SELECTOR_FIELDS: Dict[str, Tuple[str, Callable[[str, Any], bool]]] = {
+    "text": ("text", lambda value, expected: value == expected),
+    "textContains": ("text", lambda value, expected: str(expected) in value),
+    "textStartsWith": ("text", lambda value, expected: value.startswith(expected)),
+    "textMatches": (
+        "text",
+        lambda value, expected: re.fullmatch(expected, value) is not None,
+    ),
+    "description": ("content-desc", lambda value, expected: value == expected),
+    "descriptionContains": (
+        "content-desc",
+        lambda value, expected: str(expected) in value,
+    ),
+    "descriptionStartsWith": (
+        "content-desc",
+        lambda value, expected: value.startswith(expected),
+    ),
+    "descriptionMatches": (
+        "content-desc",
+        lambda value, expected: re.fullmatch(expected, value) is not None,
+    ),
+    "className": ("class", lambda value, expected: value == expected),
+    "classNameMatches": (
+        "class",
+        lambda value, expected: re.fullmatch(expected, value) is not None,
+    ),
+    "resourceId": ("resource-id", lambda value, expected: value == expected),
+    "resourceIdMatches": (
+        "resource-id",
+        lambda value, expected: re.fullmatch(expected, value) is not None,
+    ),
+    "packageName": ("package", lambda value, expected: value == expected),
+    "packageNameMatches": (
+        "package",
+        lambda value, expected: re.fullmatch(expected, value) is not None,
+    ),
+    "index": ("index", lambda value, expected: value == str(expected)),
+}
+for _flag, _attribute in (
+    ("checkable", "checkable"),
+    ("checked", "checked"),
+    ("clickable", "clickable"),
+    ("longClickable", "long-clickable"),
+    ("scrollable", "scrollable"),
+    ("enabled", "enabled"),
+    ("focusable", "focusable"),
+    ("focused", "focused"),
+    ("selected", "selected"),
+):
+    SELECTOR_FIELDS[_flag] = (
+        _attribute,
+        lambda value, expected: (value == "true") == bool(expected),
+    )
+
+# exact selector keys answered from an index instead of a scan
+INDEXED_FIELDS = {
+    "text": "text",
+    "description": "content-desc",
+    "className": "class",
+    "resourceId": "resource-id",
+    "packageName": "package",
+}
+
+
+def parse_bounds(value: str) -> Optional[Bounds]:
+    """`[0,72][1080,200]` -> (0, 72, 1080, 200)"""
+    found = BOUNDS_PATTERN.fullmatch(value or "")
+    if not found:
+        return None
+    (x1, y1, x2, y2) = (int(i) for i in found.groups())
+    return (x1, y1, x2, y2)
+
+
+class Node:
+    __slots__ = ("attrib", "parent", "children", "order")
+
+    def __init__(self, attrib: Dict[str, str], parent: Optional["Node"], order: int):
+        self.attrib = attrib
+        self.parent = parent
+        self.children: List["Node"] = []
+        self.order = order
+
+    @property
+    def text(self) -> str:
+        return self.attrib.get("text", "")
+
+    @property
+    def description(self) -> str:
+        return self.attrib.get("content-desc", "")
+
+    @property
+    def bounds(self) -> Optional[Bounds]:
+        return parse_bounds(self.attrib.get("bounds", ""))
+
+    @property
+    def center(self) -> Optional[Tuple[int, int]]:
+        bounds = self.bounds
+        if bounds is None:
+            return None
+        (x1, y1, x2, y2) = bounds
+        return ((x1 + x2) // 2, (y1 + y2) // 2)
+
+    def matches(self, selector: Dict[str, object]) -> bool:
+        for key, expected in selector.items():
+            (attribute, compare) = SELECTOR_FIELDS[key]
+            if not compare(self.attrib.get(attribute, ""), expected):
+                return False
+        return True
+
+    def descendants(self) -> Iterable["Node"]:
+        for child in self.children:
+            yield child
+            yield from child.descendants()
+
+
+class HierarchySnapshot:
+    """One `dump_hierarchy` parsed once and queried locally.
+
+    Selectors take the same keys as `device_ui(...)`, e.g.
+    `snapshot(text="Verify", instance=1).sibling(className=...).get_text()`,
+    and clicks go to the center of the bounds captured in the dump. The
+    snapshot does not follow the screen, take a new one after an action.
+    """
+
+    def __init__(self, xml: str, device_ui: Optional[Device] = None):
+        self.device_ui = device_ui
+        self.nodes: List[Node] = []
+        self._indexes: Dict[str, Dict[str, List[Node]]] = {
+            attribute: {} for attribute in INDEXED_FIELDS.values()
+        }
+        root = ElementTree.fromstring(xml.encode("utf-8"))
+        self._add_children(root, None)
+
+    def _add_children(self, element: ElementTree.Element, parent: Optional[Node]):
+        for child in element:
+            if child.tag != "node":
+                continue
+            node = Node(child.attrib, parent, len(self.nodes))
+            self.nodes.append(node)
+            if parent is not None:
+                parent.children.append(node)
+            for attribute, index in self._indexes.items():
+                value = node.attrib.get(attribute)
+                if value:
+                    index.setdefault(value, []).append(node)
+            self._add_children(child, node)
+
+    def select_nodes(self, **selector) -> List[Node]:
+        """Nodes matching `selector` in document order, `instance` aside"""
+        candidates: Optional[List[Node]] = None
+        for key, attribute in INDEXED_FIELDS.items():
+            if key in selector:
+                nodes = self._indexes[attribute].get(str(selector[key]), [])
+                if candidates is None or len(nodes) < len(candidates):
+                    candidates = nodes
+        if candidates is None:
+            candidates = self.nodes
+        return [node for node in candidates if node.matches(selector)]
+
+    def __call__(self, **selector) -> "SnapshotSelection":
+        instance = int(selector.pop("instance", 0))
+        nodes = self.select_nodes(**selector)
+        return SnapshotSelection(self, nodes[instance : instance + 1])
+
+    def select(self, selector: "Selector") -> "SnapshotSelection":
+        if callable(selector):
+            return selector(self)
+        return self(**selector)
+
+    def has_package(self, package_name: str) -> bool:
+        return bool(self._indexes["package"].get(package_name))
+
+
+class SnapshotSelection:
+    """The matched node of a snapshot query, the local twin of a UiObject"""
+
+    def __init__(self, snapshot: HierarchySnapshot, nodes: List[Node]):
+        self.snapshot = snapshot
+        self.nodes = nodes
+
+    @property
+    def node(self) -> Optional[Node]:
+        return self.nodes[0] if self.nodes else None
+
+    @property
+    def exists(self) -> bool:
+        return bool(self.nodes)
+
+    def __bool__(self) -> bool:
+        return self.exists
+
+    def get_text(self) -> Optional[str]:
+        return self.node.text if self.node else None
+
+    @property
+    def bounds(self) -> Optional[Bounds]:
+        return self.node.bounds if self.node else None
+
+    @property
+    def center(self) -> Optional[Tuple[int, int]]:
+        return self.node.center if self.node else None
+
+    def child(self, **selector) -> "SnapshotSelection":
+        """Descendants of the matched node, as `UiObject.child`"""
+        instance = int(selector.pop("instance", 0))
+        nodes = []
+        if self.node:
+            nodes = [node for node in self.node.descendants() if node.matches(selector)]
+        return SnapshotSelection(self.snapshot, nodes[instance : instance + 1])
+
+    def sibling(self, **selector) -> "SnapshotSelection":
+        """Other children of the matched node's parent, as `UiObject.sibling`"""
+        instance = int(selector.pop("instance", 0))
+        nodes = []
+        if self.node and self.node.parent:
+            nodes = [
+                node
+                for node in self.node.parent.children
+                if node is not self.node and node.matches(selector)
+            ]
+        return SnapshotSelection(self.snapshot, nodes[instance : instance + 1])
+
+    def click(self) -> bool:
+        center = self.center
+        if center is None or self.snapshot.device_ui is None:
+            return False
+        self.snapshot.device_ui.click(*center)
+        return True
+
+
+# selector keys as given to `device_ui(...)`, or a query on a snapshot for
+# chained selectors, e.g. `lambda snapshot: snapshot(...).sibling(...)`
+Selector = Union[Dict[str, object], Callable[[HierarchySnapshot], SnapshotSelection]]
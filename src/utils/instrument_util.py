@@ -0,0 +1,303 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from types import FrameType
+from typing import Deque, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from src.configs.common_config import INSTRUMENT_ENABLED, INSTRUMENT_HISTORY_SIZE
+from src.utils.log_util import logger
+
+SLEEP = "sleep"
+WAIT = "wait"
+VISION = "vision"
+IO = "io"
+CATEGORIES = (SLEEP, WAIT, VISION, IO)
+
+# results of these types are returned as they are, other uiautomator2
+# objects (UiObject, Exists, Scroll...) are wrapped to time them as well
+PLAIN_TYPES = (str, bytes, int, float, bool, dict, list, tuple, type(None))
+SERVICES_FOLDER = f"{os.sep}services{os.sep}"
+BASE_SERVICE_FILE = "tele_service.py"
+
+
+class CallStat:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+class RunStats:
+    """Time of one service run on a device, by calling method, category and
+    call. Seconds are exclusive: a wait that dumps the hierarchy counts the
+    dump as io and only the rest as wait, so the categories add up."""
+
+    def __init__(self, device_name: str, service_name: str):
+        self.device_name = device_name
+        self.service_name = service_name
+        self.started_at = time.time()
+        self.seconds = 0.0
+        # (method, category, call) -> stat
+        self.calls: Dict[Tuple[str, str, str], CallStat] = {}
+
+    def add(self, method: str, category: str, call: str, seconds: float):
+        stat = self.calls.get((method, category, call))
+        if stat is None:
+            stat = self.calls[(method, category, call)] = CallStat()
+        stat.count += 1
+        stat.seconds += seconds
+
+    def by_category(self) -> Dict[str, float]:
+        totals = {category: 0.0 for category in CATEGORIES}
+        for (_, category, _), stat in self.calls.items():
+            totals[category] += stat.seconds
+        # the rest is service code between calls
+        totals["other"] = max(0.0, self.seconds - sum(totals.values()))
+        return totals
+
+    def by_method(self) -> Dict[str, Dict[str, float]]:
+        methods: Dict[str, Dict[str, float]] = {}
+        for (method, category, _), stat in self.calls.items():
+            totals = methods.setdefault(method, {})
+            totals[category] = totals.get(category, 0.0) + stat.seconds
+        return methods
+
+    def to_record(self) -> dict:
+        return {
+            "device": self.device_name,
+            "service": self.service_name,
+            "started_at": int(self.started_at),
+            "seconds": round(self.seconds, 3),
+            "categories": {
+                category: round(seconds, 3)
+                for category, seconds in self.by_category().items()
+            },
+            "calls": [
+                {
+                    "method": method,
+                    "category": category,
+                    "call": call,
+                    "count": stat.count,
+                    "seconds": round(stat.seconds, 3),
+                }
+                for (method, category, call), stat in sorted(
+                    self.calls.items(), key=lambda item: -item[1].seconds
+                )
+            ],
+        }
+
+
+class _Span(NamedTuple):
+    category: str
+    call: str
+    method: str
+    # seconds of the spans nested in this one, [total] to update in place
+    children: List[float]
+
+
+class Instrumentation:
+    """Counts and times device calls, waits, sleeps and matching of the
+    service run open in the calling thread; does nothing outside a run.
+
+    Calls are tagged with the service method making them: the closest
+    method of a bot service on the stack, else the flow step being run,
+    else the `BaseTeleService` method called by `run_app`.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = INSTRUMENT_ENABLED,
+        history_size: int = INSTRUMENT_HISTORY_SIZE,
+    ):
+        self.enabled = enabled
+        self._local = threading.local()
+        self._history: Deque[RunStats] = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+
+    def _current(self) -> Optional[RunStats]:
+        return getattr(self._local, "run", None)
+
+    @contextmanager
+    def run(self, device_name: str, service_name: str) -> Iterator[RunStats]:
+        """Collect the calls of this thread into a new `RunStats`, logged
+        as one record when the run ends"""
+        stats = RunStats(device_name, service_name)
+        if not self.enabled:
+            yield stats
+            return
+        (self._local.run, self._local.spans) = (stats, [])
+        try:
+            yield stats
+        finally:
+            stats.seconds = time.time() - stats.started_at
+            (self._local.run, self._local.spans) = (None, [])
+            with self._lock:
+                self._history.append(stats)
+            record = stats.to_record()
+            logger.info(
+                f"[{device_name}] Run stats {service_name}: "
+                + json.dumps({key: record[key] for key in ("seconds", "categories")}),
+                extra={"run_stats": record},
+            )
+
+    @contextmanager
+    def scope(self, name: str) -> Iterator[None]:
+        """Tag calls made in this block with `name` (a flow step) when no
+        bot service method is on the stack"""
+        previous = getattr(self._local, "scope", None)
+        self._local.scope = name
+        try:
+            yield
+        finally:
+            self._local.scope = previous
+
+    def _caller_method(self) -> str:
+        frame: Optional[FrameType] = sys._getframe(1)
+        base_method = None
+        while frame is not None:
+            code = frame.f_code
+            if SERVICES_FOLDER in code.co_filename:
+                if not code.co_filename.endswith(BASE_SERVICE_FILE):
+                    return code.co_name
+                if code.co_name == "run_app":
+                    break
+                # the outermost one, e.g. `start_group` rather than `snapshot`
+                base_method = code.co_name
+            frame = frame.f_back
+        return getattr(self._local, "scope", None) or base_method or "other"
+
+    @contextmanager
+    def span(self, category: str, call: str) -> Iterator[None]:
+        run = self._current()
+        if run is None:
+            yield
+            return
+        spans: List[_Span] = self._local.spans
+        span = _Span(category, call, self._caller_method(), [0.0])
+        spans.append(span)
+        start_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start_at
+            spans.pop()
+            if spans:
+                spans[-1].children[0] += seconds
+            run.add(span.method, category, call, seconds - span.children[0])
+
+    def sleep(self, seconds: float):
+        with self.span(SLEEP, "sleep"):
+            time.sleep(seconds)
+
+    def get_runs(
+        self, device_name: Optional[str] = None, service_name: Optional[str] = None
+    ) -> List[RunStats]:
+        """Finished runs, oldest first"""
+        with self._lock:
+            runs = list(self._history)
+        return [
+            run
+            for run in runs
+            if (device_name is None or run.device_name == device_name)
+            and (service_name is None or run.service_name == service_name)
+        ]
+
+    def wrap(self, device):
+        if not self.enabled or isinstance(device, InstrumentedProxy):
+            return device
+        return InstrumentedProxy(device, type(device).__name__, self)
+
+
+def _wrap(value, call: str, instrumentation: Instrumentation):
+    if isinstance(value, PLAIN_TYPES):
+        return value
+    if type(value).__module__.startswith("uiautomator2"):
+        return InstrumentedProxy(value, call, instrumentation)
+    if callable(value) and not isinstance(value, type):
+        return _TimedMethod(value, call, instrumentation)
+    return value
+
+
+class InstrumentedProxy:
+    """Times every call made through a `uiautomator2.Device` as io.
+
+    Objects it returns (`device_ui(...)` selectors, `exists`, `scroll`...)
+    are wrapped too, so `device_ui(text=...).click_exists()` is timed as
+    `UiObject.click_exists`. Properties doing a request (`info`, `count`)
+    are timed when read.
+    """
+
+    __slots__ = ("_target", "_call", "_instrumentation")
+
+    def __init__(self, target, call: str, instrumentation: Instrumentation):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_call", call)
+        object.__setattr__(self, "_instrumentation", instrumentation)
+
+    def __getattr__(self, name: str):
+        call = f"{type(self._target).__name__}.{name}"
+        if isinstance(getattr(type(self._target), name, None), property):
+            with self._instrumentation.span(IO, call):
+                value = getattr(self._target, name)
+        else:
+            value = getattr(self._target, name)
+        return _wrap(value, call, self._instrumentation)
+
+    def __setattr__(self, name: str, value):
+        setattr(self._target, name, value)
+
+    def __call__(self, *args, **kwargs):
+        with self._instrumentation.span(IO, self._call):
+            value = self._target(*args, **kwargs)
+        return _wrap(value, self._call, self._instrumentation)
+
+    def __bool__(self) -> bool:
+        with self._instrumentation.span(IO, self._call):
+            return bool(self._target)
+
+    def __len__(self) -> int:
+        with self._instrumentation.span(IO, self._call):
+            return len(self._target)
+
+    def __getitem__(self, index):
+        return _wrap(self._target[index], self._call, self._instrumentation)
+
+    def __iter__(self):
+        return (_wrap(item, self._call, self._instrumentation) for item in self._target)
+
+
+class _TimedMethod:
+    __slots__ = ("method", "call", "instrumentation")
+
+    def __init__(self, method, call: str, instrumentation: Instrumentation):
+        self.method = method
+        self.call = call
+        self.instrumentation = instrumentation
+
+    def __call__(self, *args, **kwargs):
+        with self.instrumentation.span(IO, self.call):
+            value = self.method(*args, **kwargs)
+        return _wrap(value, self.call, self.instrumentation)
+
+
+instrumentation = Instrumentation()
+
+
+def timed(category: str):
+    """Time every call of the decorated method as `category`"""
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            with instrumentation.span(category, method.__name__):
+                return method(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -1,4 +1,5 @@
 import logging
+import os
 from logging.handlers import TimedRotatingFileHandler
 
 from src.configs.common_config import LOG_BACKUP_COUNT, LOG_FILE, LOG_LEVEL, LOGFORMAT
@@ -8,6 +9,7 @@ from src.configs.common_config import LOG_BACKUP_COUNT, LOG_FILE, LOG_LEVEL, LOG
 formatter = logging.Formatter(LOGFORMAT, "%Y-%m-%d %H:%M:%S")
 
 # Set up file handler with daily rotation
+os.makedirs(os.path.dirname(LOG_FILE) or ".", exist_ok=True)
 file_handler = TimedRotatingFileHandler(
     LOG_FILE, when="midnight", interval=1, backupCount=LOG_BACKUP_COUNT
 )
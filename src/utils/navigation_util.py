@@ -0,0 +1,90 @@
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from src.utils.hierarchy_util import HierarchySnapshot
+
+TELE_HOME = "tele_home"
+GROUP_CHAT = "group_chat"
+BOT_WEB_APP = "bot_web_app"
+# "Close anyway" confirmation shown when a bot web app is closed
+CLOSE_CONFIRM = "close_confirm"
+# any other Telegram screen: another chat, settings, a channel...
+TELE_OTHER = "tele_other"
+OTHER_APP = "other_app"
+SYSTEM_DIALOG = "system_dialog"
+
+SYSTEM_DIALOG_PACKAGES = (
+    "android",
+    "com.android.permissioncontroller",
+    "com.google.android.permissioncontroller",
+    "com.android.packageinstaller",
+)
+WEB_VIEW_CLASS_NAME = "android.webkit.WebView"
+NAVIGATION_MAX_STEPS = 10
+
+# screen -> {next screen: action leading there}, actions are implemented by
+# the services as `_nav_<action>`
+NAVIGATION_GRAPH: Dict[str, Dict[str, str]] = {
+    SYSTEM_DIALOG: {OTHER_APP: "back"},
+    OTHER_APP: {TELE_HOME: "open_tele_app"},
+    TELE_OTHER: {TELE_HOME: "back"},
+    TELE_HOME: {GROUP_CHAT: "open_group_chat"},
+    GROUP_CHAT: {TELE_HOME: "back", BOT_WEB_APP: "open_bot_menu"},
+    BOT_WEB_APP: {GROUP_CHAT: "close_bot_menu"},
+    CLOSE_CONFIRM: {GROUP_CHAT: "confirm_close"},
+}
+
+
+def classify_screen(
+    snapshot: HierarchySnapshot,
+    package_name: str,
+    group_name: Optional[str] = None,
+) -> str:
+    """Label the screen of one hierarchy snapshot.
+
+    Group chat and bot web app are only those of `group_name`, the ones of
+    other bots are `TELE_OTHER`.
+    """
+    for dialog_package in SYSTEM_DIALOG_PACKAGES:
+        if snapshot(packageName=dialog_package, className="android.widget.Button"):
+            return SYSTEM_DIALOG
+    if not snapshot.has_package(package_name):
+        return OTHER_APP
+    if snapshot(text="Close anyway", packageName=package_name):
+        return CLOSE_CONFIRM
+    if snapshot(
+        description="Open navigation menu", clickable=True, packageName=package_name
+    ):
+        return TELE_HOME
+    if group_name and snapshot(text=group_name, packageName=package_name):
+        if snapshot(className=WEB_VIEW_CLASS_NAME, packageName=package_name):
+            return BOT_WEB_APP
+        return GROUP_CHAT
+    return TELE_OTHER
+
+
+def find_route(
+    start: str,
+    target: str,
+    graph: Dict[str, Dict[str, str]] = NAVIGATION_GRAPH,
+) -> Optional[List[Tuple[str, str]]]:
+    """Shortest list of (action, next screen) from `start` to `target`,
+    None when `target` can't be reached"""
+    previous: Dict[str, Tuple[str, str]] = {}
+    queue = deque([start])
+    visited = {start}
+    while queue:
+        screen = queue.popleft()
+        if screen == target:
+            route: List[Tuple[str, str]] = []
+            while screen != start:
+                (prev_screen, action) = previous[screen]
+                route.insert(0, (action, screen))
+                screen = prev_screen
+            return route
+        for next_screen, action in graph.get(screen, {}).items():
+            if next_screen not in visited:
+                visited.add(next_screen)
+                previous[next_screen] = (screen, action)
+                queue.append(next_screen)
+    return None
@@ -0,0 +1,105 @@
+import time
+from typing import Callable, List, NamedTuple, Tuple
+
+from adbutils._device import AdbDevice
+from uiautomator2 import Device
+
+from src.configs.common_config import (
+    RAW_SCREENCAP_ENABLED,
+    READINESS_POLL_INTERVAL,
+    READINESS_TIMEOUT,
+)
+from src.utils.capture_util import RawScreencap
+from src.utils.log_util import logger
+
+BOOT_COMPLETED = "boot_completed"
+LAUNCHER = "launcher"
+UIAUTOMATOR = "uiautomator"
+SCREENSHOT = "screenshot"
+# packages focused while Android is still starting
+BOOTING_PACKAGES = ("android", "com.android.systemui")
+
+
+class StageTiming(NamedTuple):
+    stage: str
+    seconds: float
+    ok: bool
+
+
+class ReadinessProbe:
+    """Waits until a booted device can be automated, stage by stage:
+    Android booted, launcher in front, uiautomator answering and a
+    screenshot taken. Each stage is polled until it passes, all of them
+    within one `READINESS_TIMEOUT` deadline.
+    """
+
+    def __init__(
+        self,
+        device_name: str,
+        adb_device: AdbDevice,
+        device_ui: Device,
+        timeout: float = READINESS_TIMEOUT,
+        poll_interval: float = READINESS_POLL_INTERVAL,
+    ):
+        self.device_name = device_name
+        self.adb_device = adb_device
+        self.device_ui = device_ui
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.timings: List[StageTiming] = []
+
+    def get_stages(self) -> List[Tuple[str, Callable[[], bool]]]:
+        return [
+            (BOOT_COMPLETED, self._check_boot_completed),
+            (LAUNCHER, self._check_launcher),
+            (UIAUTOMATOR, self._check_uiautomator),
+            (SCREENSHOT, self._check_screenshot),
+        ]
+
+    def _check_boot_completed(self) -> bool:
+        return self.adb_device.getprop("sys.boot_completed").strip() == "1"
+
+    def _check_launcher(self) -> bool:
+        """The launcher, or the app resumed from a snapshot, is in front"""
+        current_package = self.adb_device.app_current().package
+        return bool(current_package) and current_package not in BOOTING_PACKAGES
+
+    def _check_uiautomator(self) -> bool:
+        return bool(self.device_ui.info)
+
+    def _check_screenshot(self) -> bool:
+        if RAW_SCREENCAP_ENABLED:
+            return RawScreencap(self.adb_device).capture(gray=True).size > 0
+        return self.device_ui.screenshot(format="opencv") is not None
+
+    def wait_ready(self) -> bool:
+        deadline = time.time() + self.timeout
+        self.timings = []
+        for stage, check in self.get_stages():
+            started_at = time.time()
+            ok = self._poll(check, deadline)
+            self.timings.append(StageTiming(stage, time.time() - started_at, ok))
+            if not ok:
+                break
+        summary = ", ".join(
+            f"{timing.stage} {timing.seconds:.1f}s" + ("" if timing.ok else " failed")
+            for timing in self.timings
+        )
+        ready = all(timing.ok for timing in self.timings)
+        if ready:
+            logger.info(f"[{self.device_name}] Device ready: {summary}")
+        else:
+            logger.error(f"[{self.device_name}] Device not ready: {summary}")
+        return ready
+
+    def _poll(self, check: Callable[[], bool], deadline: float) -> bool:
+        while True:
+            try:
+                if check():
+                    return True
+            except Exception:
+                # adb and uiautomator fail in various ways while booting
+                pass
+            if time.time() + self.poll_interval > deadline:
+                return False
+            time.sleep(self.poll_interval)
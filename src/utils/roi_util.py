@@ -0,0 +1,139 @@
+import atexit
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from src.configs import blum_config, hamster_config
+from src.configs.common_config import ROI_HISTORY_FILE
+from src.utils.log_util import logger
+from src.utils.template_util import get_template_id
+from src.utils.vision_util import MatchBox
+
+# (x1, y1, x2, y2) in pixels
+Roi = Tuple[int, int, int, int]
+
+ROI_HINTS: Dict[str, Tuple[float, float, float, float]] = {
+    get_template_id(item_path): roi
+    for item_path, roi in {
+        **blum_config.ITEM_ROI_HINTS,
+        **hamster_config.ITEM_ROI_HINTS,
+    }.items()
+}
+# learned regions are used only after this many frames with a match
+MIN_LEARNED_SAMPLES = 3
+# pixels added around the learned region on each side
+LEARNED_ROI_MARGIN = 40
+
+
+def get_resolution_key(frame_shape) -> str:
+    return f"{frame_shape[1]}x{frame_shape[0]}"
+
+
+class RoiStore:
+    """Search regions per template and device resolution.
+
+    A region comes from `ROI_HINTS` when configured, otherwise it is learned
+    from past matches: the union of every matched box, once the template has
+    been seen `MIN_LEARNED_SAMPLES` times and never more than once per frame
+    (a template with several instances on screen can appear anywhere).
+    History is persisted to `ROI_HISTORY_FILE` by `save`, after each flow
+    and at exit, when a region grew since the last save.
+    """
+
+    def __init__(self, file_path: str = ROI_HISTORY_FILE, hints=None):
+        self.file_path = file_path
+        self.hints = ROI_HINTS if hints is None else hints
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._history: Dict[str, Dict[str, dict]] = self._load()
+        self._changed = False
+
+    def _load(self) -> Dict[str, Dict[str, dict]]:
+        if not os.path.exists(self.file_path):
+            return {}
+        try:
+            with open(self.file_path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            logger.error(f"Load roi history {self.file_path} failed", e)
+            return {}
+
+    def save(self):
+        # one save at a time, so an older snapshot never replaces a newer one
+        with self._save_lock:
+            with self._lock:
+                if not self._changed:
+                    return
+                data = json.dumps(self._history)
+                self._changed = False
+            temp_path = f"{self.file_path}.tmp"
+            try:
+                os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+                with open(temp_path, "w") as file:
+                    file.write(data)
+                os.replace(temp_path, self.file_path)
+            except OSError as e:
+                logger.error(f"Save roi history {self.file_path} failed", e)
+
+    def get_roi(self, template_id: str, frame_shape) -> Optional[Roi]:
+        (height, width) = frame_shape[:2]
+        hint = self.hints.get(template_id)
+        if hint:
+            return (
+                int(hint[0] * width),
+                int(hint[1] * height),
+                int(hint[2] * width),
+                int(hint[3] * height),
+            )
+        entry = self._history.get(template_id, {}).get(get_resolution_key(frame_shape))
+        if (
+            not entry
+            or entry["samples"] < MIN_LEARNED_SAMPLES
+            or entry["max_count"] > 1
+        ):
+            return None
+        (x1, y1, x2, y2) = entry["box"]
+        return (
+            max(0, x1 - LEARNED_ROI_MARGIN),
+            max(0, y1 - LEARNED_ROI_MARGIN),
+            min(width, x2 + LEARNED_ROI_MARGIN),
+            min(height, y2 + LEARNED_ROI_MARGIN),
+        )
+
+    def record(self, template_id: str, frame_shape, boxes: List[MatchBox]):
+        if not boxes:
+            return
+        (x1, y1, x2, y2) = (
+            min(box.x for box in boxes),
+            min(box.y for box in boxes),
+            max(box.x + box.width for box in boxes),
+            max(box.y + box.height for box in boxes),
+        )
+        with self._lock:
+            entries = self._history.setdefault(template_id, {})
+            key = get_resolution_key(frame_shape)
+            entry = entries.get(key)
+            if entry is None:
+                entry = {"box": [x1, y1, x2, y2], "samples": 0, "max_count": 0}
+                entries[key] = entry
+                changed = True
+            else:
+                old_box = entry["box"]
+                entry["box"] = [
+                    min(old_box[0], x1),
+                    min(old_box[1], y1),
+                    max(old_box[2], x2),
+                    max(old_box[3], y2),
+                ]
+                changed = entry["box"] != old_box
+            entry["samples"] += 1
+            changed = changed or entry["samples"] == MIN_LEARNED_SAMPLES
+            if len(boxes) > entry["max_count"]:
+                entry["max_count"] = len(boxes)
+                changed = True
+            self._changed = self._changed or changed
+
+
+roi_store = RoiStore()
+atexit.register(roi_store.save)
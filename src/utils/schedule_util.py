@@ -0,0 +1,183 @@
+import heapq
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from src.configs import (
+    blum_config,
+    bnb_moonbix_config,
+    hamster_config,
+    side_fans_config,
+)
+from src.configs.common_config import (
+    IGNORE_HOUR_RUN_LIST,
+    SCHEDULE_GROUP_WINDOW,
+    SCHEDULE_RETRY_INTERVAL,
+)
+from src.model.config_device import ConfigDevice
+
+
+class ServiceSchedule(NamedTuple):
+    service_name: str
+    # `group_name` of the service (`GROUP_NAME` of its config), the run time
+    # of a bot without a group id is kept by it, see `get_run_key`
+    group_name: str
+    enabled_field: str
+    group_id_field: str
+    interval_field: str
+
+
+SERVICE_SCHEDULES = (
+    ServiceSchedule(
+        "bnb_moonbix",
+        bnb_moonbix_config.GROUP_NAME,
+        "is_bnb_moonbix",
+        "bnb_moonbix_group_id",
+        "bnb_moonbix_delay_interval",
+    ),
+    ServiceSchedule(
+        "side_fans",
+        side_fans_config.GROUP_NAME,
+        "is_side_fans",
+        "side_fans_group_id",
+        "side_fans_delay_interval",
+    ),
+    ServiceSchedule(
+        "blum",
+        blum_config.GROUP_NAME,
+        "is_blum",
+        "blum_group_id",
+        "blum_delay_interval",
+    ),
+    ServiceSchedule(
+        "hamster_kombat",
+        hamster_config.GROUP_NAME,
+        "is_hamster_kombat",
+        "hamster_kombat_group_id",
+        "hamster_kombat_delay_interval",
+    ),
+)
+
+
+class DueTask(NamedTuple):
+    due_at: float
+    device_name: str
+    service_name: str
+
+
+def get_run_key(group_id: Optional[int], group_name: str) -> Union[int, str]:
+    if group_id is not None and group_id >= 0:
+        return group_id
+    return group_name
+
+
+def skip_ignored_hours(timestamp: float, ignore_hours: List[int]) -> float:
+    """The first time from `timestamp` out of the `IGNORE_HOUR_RUN_LIST`
+    hours"""
+    moment = datetime.fromtimestamp(timestamp)
+    for _ in range(24):
+        if moment.hour not in ignore_hours:
+            break
+        moment = moment.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    return max(timestamp, moment.timestamp())
+
+
+class DeviceScheduler:
+    """When to boot each device: a heap of boot times, one per device.
+
+    A service is due once its `*_delay_interval` passed since its last run,
+    as checked by `_check_run_app`. A device boots when its first service
+    is due, delayed until the other services due within
+    `SCHEDULE_GROUP_WINDOW` are due as well, so they share the boot. A
+    service still due after a boot (its run failed) is retried after
+    `SCHEDULE_RETRY_INTERVAL`.
+    """
+
+    def __init__(
+        self,
+        config_devices: List[ConfigDevice],
+        group_window: float = SCHEDULE_GROUP_WINDOW,
+        retry_interval: float = SCHEDULE_RETRY_INTERVAL,
+        ignore_hours: Optional[List[int]] = None,
+    ):
+        self.config_devices = {device.device_name: device for device in config_devices}
+        self.group_window = group_window
+        self.retry_interval = retry_interval
+        self.ignore_hours = (
+            IGNORE_HOUR_RUN_LIST if ignore_hours is None else ignore_hours
+        )
+        # (device, service) -> start of its last boot
+        self._attempted_at: Dict[Tuple[str, str], float] = {}
+        self._boot_at: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        for device_name in self.config_devices:
+            self.refresh(device_name)
+
+    def get_tasks(self, device_name: str) -> List[DueTask]:
+        config_device = self.config_devices[device_name]
+        last_runs = config_device.last_running_ts_by_group_id or {}
+        tasks = []
+        for schedule in SERVICE_SCHEDULES:
+            if not getattr(config_device, schedule.enabled_field):
+                continue
+            run_key = get_run_key(
+                getattr(config_device, schedule.group_id_field), schedule.group_name
+            )
+            due_at = last_runs.get(run_key, 0) + (
+                getattr(config_device, schedule.interval_field) or 0
+            )
+            attempted_at = self._attempted_at.get((device_name, schedule.service_name))
+            if attempted_at is not None:
+                due_at = max(due_at, attempted_at + self.retry_interval)
+            tasks.append(DueTask(due_at, device_name, schedule.service_name))
+        return sorted(tasks)
+
+    def get_boot_at(self, tasks: List[DueTask]) -> Optional[float]:
+        if not tasks:
+            return None
+        grouped = [
+            task.due_at
+            for task in tasks
+            if task.due_at <= tasks[0].due_at + self.group_window
+        ]
+        return skip_ignored_hours(max(grouped), self.ignore_hours)
+
+    def refresh(self, device_name: str):
+        """Schedule the next boot of a device from its run times"""
+        boot_at = self.get_boot_at(self.get_tasks(device_name))
+        if boot_at is None:
+            self._boot_at.pop(device_name, None)
+            return
+        self._boot_at[device_name] = boot_at
+        heapq.heappush(self._heap, (boot_at, device_name))
+
+    def _drop_stale(self):
+        while self._heap:
+            (boot_at, device_name) = self._heap[0]
+            if self._boot_at.get(device_name) == boot_at:
+                return
+            heapq.heappop(self._heap)
+
+    def next_boot_at(self) -> Optional[float]:
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def get_device_boot_at(self, device_name: str) -> Optional[float]:
+        return self._boot_at.get(device_name)
+
+    def pop_due(self, now: Optional[float] = None) -> List[str]:
+        """Devices to boot now, the earliest due first"""
+        now = time.time() if now is None else now
+        device_names = []
+        while self.next_boot_at() is not None and self._heap[0][0] <= now:
+            (_, device_name) = heapq.heappop(self._heap)
+            del self._boot_at[device_name]
+            device_names.append(device_name)
+        return device_names
+
+    def finish_boot(self, device_name: str, started_at: float):
+        """Schedule the next boot after a boot started at `started_at`"""
+        for task in self.get_tasks(device_name):
+            if task.due_at <= started_at:
+                self._attempted_at[(device_name, task.service_name)] = started_at
+        self.refresh(device_name)
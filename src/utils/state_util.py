@@ -0,0 +1,174 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Union
+
+from src.configs.common_config import RUN_STATE_BUSY_TIMEOUT, RUN_STATE_FILE
+from src.utils.log_util import logger
+
+RUN_OK = "ok"
+RUN_FAILED = "failed"
+RUN_ERROR = "error"
+
+RunKey = Union[int, str]
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS run_state (
+        device TEXT NOT NULL,
+        run_key TEXT NOT NULL,
+        last_run_at INTEGER NOT NULL,
+        PRIMARY KEY (device, run_key)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS run_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        device TEXT NOT NULL,
+        service TEXT NOT NULL,
+        run_key TEXT NOT NULL,
+        started_at INTEGER NOT NULL,
+        seconds REAL NOT NULL,
+        outcome TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS run_history_device ON run_history (device, id)",
+)
+
+
+def _decode_run_key(value: str) -> RunKey:
+    """Run keys are group ids or group names, stored as text"""
+    return int(value) if value.lstrip("-").isdigit() else value
+
+
+class RunStateStore:
+    """Last run time of each service per device, and the outcome and
+    duration of every run, kept in SQLite so a restart doesn't run again
+    what ran already.
+
+    The database is in WAL mode: worker threads (one connection each) and
+    other processes read while one writes, and each update is a single
+    atomic statement. Errors are logged and the services fall back to the
+    run times kept in memory.
+    """
+
+    def __init__(self, file_path: str = RUN_STATE_FILE):
+        self.file_path = file_path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+            connection = sqlite3.connect(
+                self.file_path, timeout=RUN_STATE_BUSY_TIMEOUT, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+        return connection
+
+    def get_last_run_at(self, device_name: str, run_key: RunKey) -> Optional[int]:
+        try:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT last_run_at FROM run_state"
+                    " WHERE device = ? AND run_key = ?",
+                    (device_name, str(run_key)),
+                )
+                .fetchone()
+            )
+        except sqlite3.Error as e:
+            logger.error(f"[{device_name}] Read run state {run_key} failed", e)
+            return None
+        return None if row is None else row[0]
+
+    def get_last_runs(self, device_name: str) -> Dict[RunKey, int]:
+        try:
+            rows = (
+                self._connect()
+                .execute(
+                    "SELECT run_key, last_run_at FROM run_state WHERE device = ?",
+                    (device_name,),
+                )
+                .fetchall()
+            )
+        except sqlite3.Error as e:
+            logger.error(f"[{device_name}] Read run states failed", e)
+            return {}
+        return {_decode_run_key(run_key): last_run_at for run_key, last_run_at in rows}
+
+    def set_last_run_at(self, device_name: str, run_key: RunKey, last_run_at: int):
+        try:
+            # a concurrent writer never moves the time back
+            self._connect().execute(
+                "INSERT INTO run_state (device, run_key, last_run_at)"
+                " VALUES (?, ?, ?) ON CONFLICT (device, run_key) DO UPDATE"
+                " SET last_run_at = MAX(last_run_at, excluded.last_run_at)",
+                (device_name, str(run_key), last_run_at),
+            )
+        except sqlite3.Error as e:
+            logger.error(f"[{device_name}] Save run state {run_key} failed", e)
+
+    def record_run(
+        self,
+        device_name: str,
+        service_name: str,
+        run_key: RunKey,
+        started_at: float,
+        outcome: str,
+    ):
+        try:
+            self._connect().execute(
+                "INSERT INTO run_history"
+                " (device, service, run_key, started_at, seconds, outcome)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    device_name,
+                    service_name,
+                    str(run_key),
+                    int(started_at),
+                    round(time.time() - started_at, 3),
+                    outcome,
+                ),
+            )
+        except sqlite3.Error as e:
+            logger.error(f"[{device_name}] Save run of {service_name} failed", e)
+
+    def get_runs(
+        self, device_name: Optional[str] = None, limit: int = 100
+    ) -> List[dict]:
+        """Latest runs first"""
+        query = (
+            "SELECT device, service, run_key, started_at, seconds, outcome"
+            " FROM run_history"
+        )
+        params: tuple = ()
+        if device_name is not None:
+            query += " WHERE device = ?"
+            params = (device_name,)
+        try:
+            rows = (
+                self._connect()
+                .execute(query + " ORDER BY id DESC LIMIT ?", params + (limit,))
+                .fetchall()
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Read run history {self.file_path} failed", e)
+            return []
+        keys = ("device", "service", "run_key", "started_at", "seconds", "outcome")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def close(self):
+        """Close the connection of the calling thread"""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+run_state_store = RunStateStore()
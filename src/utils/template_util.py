@@ -0,0 +1,108 @@
+import glob
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from src.configs import blum_config, hamster_config, side_fans_config
+from src.configs.common_config import TEMPLATE_FOLDER_PATH
+from src.utils import vision_util
+from src.utils.log_util import logger
+
+CONFIG_ITEM_PATHS = [
+    blum_config.START_ITEM_PATH,
+    blum_config.START_WEEKLY_ITEM_PATH,
+    blum_config.CLAIM_ITEM_PATH,
+    blum_config.KEYWORD_ITEM_PATH,
+    blum_config.VERIFY_ITEM_PATH,
+    hamster_config.PROFIT_PER_HOUR_ITEM_PATH,
+    hamster_config.GO_AHEAD_ITEM_PATH,
+    side_fans_config.UNCHECK_ITEM_PATH,
+]
+
+
+def get_template_id(item_path: str) -> str:
+    """`resources/image/blum_claim.png` -> `blum_claim`"""
+    return os.path.splitext(os.path.basename(item_path))[0]
+
+
+class Template:
+    """A decoded template image and its derived forms, shared read-only."""
+
+    def __init__(self, template_id: str, path: str, image: np.ndarray):
+        self.template_id = template_id
+        self.path = path
+        self.image = image
+        self.gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        (self.height, self.width) = self.gray.shape
+        self._coarse_grays: Dict[int, List[Tuple[Tuple[int, int], np.ndarray]]] = {}
+        self.get_coarse_grays()
+
+    def get_coarse_grays(
+        self, factor: int = vision_util.PYRAMID_FACTOR
+    ) -> List[Tuple[Tuple[int, int], np.ndarray]]:
+        """Phase-shifted downscales used by the pyramid matching mode"""
+        coarse = self._coarse_grays.get(factor)
+        if coarse is None:
+            coarse = vision_util.build_coarse_templates(self.gray, factor)
+            self._coarse_grays[factor] = coarse
+        return coarse
+
+
+class TemplateRegistry:
+    """Process-wide cache of decoded templates, keyed by template id.
+
+    Templates are decoded once and handed out by id (or by their original
+    path, which maps to the same id). `reload` re-reads the files from disk,
+    so restyled templates can be swapped in without restarting.
+    """
+
+    def __init__(self, folder_path: str = TEMPLATE_FOLDER_PATH):
+        self.folder_path = folder_path
+        self._templates: Dict[str, Template] = {}
+        self._lock = threading.Lock()
+
+    def load_all(self) -> int:
+        item_paths = sorted(glob.glob(os.path.join(self.folder_path, "*.png")))
+        item_paths += [path for path in CONFIG_ITEM_PATHS if path not in item_paths]
+        for item_path in item_paths:
+            self.register(item_path)
+        logger.info(f"Loaded {len(self._templates)} templates into registry")
+        return len(self._templates)
+
+    def register(self, item_path: str, template_id: Optional[str] = None) -> Template:
+        template_id = template_id or get_template_id(item_path)
+        image = cv2.imread(item_path)
+        if image is None:
+            raise ValueError(f"Can't read template {template_id}: {item_path}")
+        template = Template(template_id, item_path, image)
+        with self._lock:
+            self._templates[template_id] = template
+        return template
+
+    def reload(self, template_id: Optional[str] = None) -> int:
+        with self._lock:
+            templates = list(self._templates.values())
+        if template_id:
+            templates = [item for item in templates if item.template_id == template_id]
+        for template in templates:
+            self.register(template.path, template.template_id)
+        return len(templates)
+
+    def get(self, template_id_or_path: str) -> Template:
+        template_id = get_template_id(template_id_or_path)
+        template = self._templates.get(template_id)
+        if template is None:
+            item_path = template_id_or_path
+            if template_id == item_path:
+                item_path = os.path.join(self.folder_path, f"{template_id}.png")
+            template = self.register(item_path, template_id)
+        return template
+
+    def ids(self) -> List[str]:
+        return sorted(self._templates)
+
+
+template_registry = TemplateRegistry()
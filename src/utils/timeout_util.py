@@ -0,0 +1,168 @@
+import atexit
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+import yaml
+
+from src.configs.common_config import (
+    ADAPTIVE_TIMEOUT_ENABLED,
+    TIMEOUT_HISTORY_FILE,
+    TIMEOUT_MARGIN,
+    TIMEOUT_MIN,
+    TIMEOUT_MISS_BACKOFF,
+    TIMEOUT_OVERRIDES_FILE,
+    TIMEOUT_PERCENTILE,
+)
+from src.utils.log_util import logger
+
+# latencies kept per wait, the oldest are dropped first
+TIMEOUT_HISTORY_SIZE = 50
+# waits keep their given timeout until they have appeared this many times
+MIN_LEARNED_SAMPLES = 5
+
+
+class TimeoutStore:
+    """How long UI elements take to appear, per service and wait.
+
+    A wait with enough history gets a timeout of the `TIMEOUT_PERCENTILE`
+    latency plus `TIMEOUT_MARGIN`, never more than the timeout it asked for,
+    so an element that is legitimately absent (a reward claimed already)
+    is given up on early. After `TIMEOUT_MISS_BACKOFF` misses in a row the
+    wait gets its full timeout again: an element that then appears adds a
+    slower latency, one missing with the full timeout is really absent and
+    the learned timeout is used again. Values of `TIMEOUT_OVERRIDES_FILE`
+    are used as they are. History is persisted to `TIMEOUT_HISTORY_FILE` by
+    `save`.
+    """
+
+    def __init__(
+        self,
+        file_path: str = TIMEOUT_HISTORY_FILE,
+        overrides_path: str = TIMEOUT_OVERRIDES_FILE,
+        enabled: bool = ADAPTIVE_TIMEOUT_ENABLED,
+    ):
+        self.file_path = file_path
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._history: Dict[str, dict] = self._load()
+        self._changed = False
+        self.overrides: Dict[str, float] = self._load_overrides(overrides_path)
+
+    @staticmethod
+    def get_key(service_name: str, wait_name: str) -> str:
+        return f"{service_name}|{wait_name}"
+
+    def _load(self) -> Dict[str, dict]:
+        if not os.path.exists(self.file_path):
+            return {}
+        try:
+            with open(self.file_path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            logger.error(f"Load timeout history {self.file_path} failed", e)
+            return {}
+
+    @staticmethod
+    def _load_overrides(overrides_path: str) -> Dict[str, float]:
+        if not overrides_path or not os.path.exists(overrides_path):
+            return {}
+        with open(overrides_path, "r") as file:
+            data = yaml.safe_load(file) or {}
+        return {key: float(value) for key, value in data.items()}
+
+    def save(self):
+        # one save at a time, so an older snapshot never replaces a newer one
+        with self._save_lock:
+            with self._lock:
+                if not self._changed:
+                    return
+                data = json.dumps(self._history, indent=1, sort_keys=True)
+                self._changed = False
+            temp_path = f"{self.file_path}.tmp"
+            try:
+                os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+                with open(temp_path, "w") as file:
+                    file.write(data)
+                os.replace(temp_path, self.file_path)
+            except OSError as e:
+                logger.error(f"Save timeout history {self.file_path} failed", e)
+
+    def learned_timeout(self, key: str) -> Optional[float]:
+        latencies = self._history.get(key, {}).get("latencies", [])
+        if len(latencies) < MIN_LEARNED_SAMPLES:
+            return None
+        latency = float(np.percentile(latencies, TIMEOUT_PERCENTILE))
+        return max(TIMEOUT_MIN, latency + TIMEOUT_MARGIN)
+
+    def _backing_off(self, key: str) -> bool:
+        return self._history.get(key, {}).get("miss_streak", 0) >= TIMEOUT_MISS_BACKOFF
+
+    def get_timeout(self, key: str, timeout: float) -> float:
+        override = self.overrides.get(key)
+        if override is not None:
+            return override
+        if not self.enabled or self._backing_off(key):
+            return timeout
+        learned = self.learned_timeout(key)
+        return timeout if learned is None else min(timeout, learned)
+
+    def record(self, key: str, latency: Optional[float]):
+        """Seconds the element took to appear, None when it did not"""
+        with self._lock:
+            backing_off = self._backing_off(key)
+            entry = self._history.setdefault(key, {"latencies": [], "misses": 0})
+            if latency is None:
+                entry["misses"] += 1
+                # missed with the full timeout: absent, not too slow
+                entry["miss_streak"] = (
+                    0 if backing_off else entry.get("miss_streak", 0) + 1
+                )
+            else:
+                entry["miss_streak"] = 0
+                entry["latencies"].append(round(latency, 3))
+                del entry["latencies"][:-TIMEOUT_HISTORY_SIZE]
+            self._changed = True
+
+    def report(self) -> List[dict]:
+        rows = []
+        for key in sorted(set(self._history) | set(self.overrides)):
+            entry = self._history.get(key, {"latencies": [], "misses": 0})
+            latencies = entry["latencies"]
+            rows.append(
+                {
+                    "key": key,
+                    "samples": len(latencies),
+                    "misses": entry["misses"],
+                    "p50": float(np.percentile(latencies, 50)) if latencies else None,
+                    "learned": self.learned_timeout(key),
+                    "override": self.overrides.get(key),
+                }
+            )
+        return rows
+
+
+def format_report(store: TimeoutStore) -> str:
+    def seconds(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.2f}"
+
+    lines = [f"{'wait':<60} {'samples':>7} {'misses':>6} {'p50':>6} {'timeout':>8}"]
+    for row in store.report():
+        timeout = row["override"] if row["override"] is not None else row["learned"]
+        lines.append(
+            f"{row['key']:<60} {row['samples']:>7} {row['misses']:>6} "
+            f"{seconds(row['p50']):>6} {seconds(timeout):>8}"
+            + (" (fixed)" if row["override"] is not None else "")
+        )
+    return "\n".join(lines)
+
+
+timeout_store = TimeoutStore()
+atexit.register(timeout_store.save)
+
+
+if __name__ == "__main__":
+    print(format_report(timeout_store))
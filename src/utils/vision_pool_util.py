@@ -0,0 +1,214 @@
+import atexit
+import itertools
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.configs.common_config import VISION_TIMEOUT, VISION_WORKERS
+from src.utils import vision_util
+from src.utils.log_util import logger
+from src.utils.template_util import Template, template_registry
+from src.utils.vision_util import FramePyramid, MatchBox
+
+# x1, y1, x2, y2 in frame pixels
+Roi = Tuple[int, int, int, int]
+# template path (or id), threshold, pyramid
+MatchItem = Tuple[str, float, bool]
+# template path (or id), threshold, pyramid, search region
+MatchRequest = Tuple[str, float, bool, Optional[Roi]]
+
+# shared memory blocks a worker keeps attached, one per device frame slot
+WORKER_ATTACHED_SLOTS = 16
+
+
+def match_template_item(
+    frame_pyramid: FramePyramid,
+    item_template: Template,
+    threshold: float,
+    pyramid: bool = False,
+) -> List[MatchBox]:
+    if pyramid:
+        return vision_util.match_template_pyramid(
+            frame_pyramid,
+            item_template.image,
+            item_template.get_coarse_grays(),
+            threshold,
+        )
+    return vision_util.match_template(
+        frame_pyramid.frame, item_template.image, threshold
+    )
+
+
+def match_item(
+    frame_pyramid: FramePyramid,
+    item_template: Template,
+    threshold: float,
+    pyramid: bool = False,
+    roi: Optional[Roi] = None,
+) -> List[MatchBox]:
+    """Match inside the search region first, fall back to the full frame on
+    a miss"""
+    boxes: List[MatchBox] = []
+    if roi:
+        (x1, y1, x2, y2) = roi
+        roi_pyramid = FramePyramid(frame_pyramid.frame[y1:y2, x1:x2])
+        boxes = [
+            box._replace(x=box.x + x1, y=box.y + y1)
+            for box in match_template_item(
+                roi_pyramid, item_template, threshold, pyramid
+            )
+        ]
+    if not boxes:
+        boxes = match_template_item(frame_pyramid, item_template, threshold, pyramid)
+    return boxes
+
+
+def match_items(
+    frame: np.ndarray, requests: List[MatchRequest]
+) -> List[List[MatchBox]]:
+    frame_pyramid = FramePyramid(frame)
+    return [
+        match_item(
+            frame_pyramid, template_registry.get(item_path), threshold, pyramid, roi
+        )
+        for (item_path, threshold, pyramid, roi) in requests
+    ]
+
+
+# --- worker process side ---
+
+_attached: "OrderedDict[str, SharedMemory]" = OrderedDict()
+
+
+def _init_worker():
+    template_registry.load_all()
+
+
+def _attach(slot_name: str) -> SharedMemory:
+    shm = _attached.pop(slot_name, None)
+    if shm is None:
+        shm = SharedMemory(name=slot_name)
+    _attached[slot_name] = shm
+    while len(_attached) > WORKER_ATTACHED_SLOTS:
+        (_, stale) = _attached.popitem(last=False)
+        stale.close()
+    return shm
+
+
+def _match_in_worker(
+    slot_name: str, shape: Tuple[int, ...], dtype: str, requests: List[MatchRequest]
+) -> List[List[MatchBox]]:
+    frame: np.ndarray = np.ndarray(shape, dtype=dtype, buffer=_attach(slot_name).buf)
+    try:
+        return match_items(frame, requests)
+    finally:
+        del frame
+
+
+# --- device thread side ---
+
+
+class VisionPool:
+    """Process pool that matches frames for every device thread.
+
+    Each device has one shared memory frame slot, the frame is copied into
+    it once and the workers read it in place, so only the slot name and the
+    match requests are pickled and only the boxes come back. The workers
+    load the template registry when they start; templates reloaded later in
+    this process are not seen by running workers until `restart`.
+    """
+
+    def __init__(self, workers: int = VISION_WORKERS, timeout: float = VISION_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Dict[str, SharedMemory] = {}
+        self._slot_ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def start(self) -> "VisionPool":
+        if not self.enabled or self._executor is not None:
+            return self
+        with self._lock:
+            if self._executor is None:
+                # workers must share this process' tracker, otherwise a
+                # worker exiting would unlink the frame slots it attached
+                resource_tracker.ensure_running()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+                logger.info(f"Started vision pool with {self.workers} workers")
+        return self
+
+    def _get_slot(self, device_name: str, size: int) -> SharedMemory:
+        slot = self._slots.get(device_name)
+        if slot is None or slot.size < size:
+            if slot is not None:
+                slot.close()
+                slot.unlink()
+            slot = SharedMemory(
+                name=f"vision_{os.getpid()}_{next(self._slot_ids)}",
+                create=True,
+                size=size,
+            )
+            self._slots[device_name] = slot
+        return slot
+
+    def match(
+        self, device_name: str, frame: np.ndarray, requests: List[MatchRequest]
+    ) -> List[List[MatchBox]]:
+        """Match on a worker, blocks the calling device thread until done.
+
+        A device matches one frame at a time, so its slot is never written
+        while a worker reads it.
+        """
+        executor = self.start()._executor
+        if executor is None:
+            return match_items(frame, requests)
+        slot = self._get_slot(device_name, frame.nbytes)
+        slot_frame: np.ndarray = np.ndarray(
+            frame.shape, dtype=frame.dtype, buffer=slot.buf
+        )
+        np.copyto(slot_frame, frame)
+        del slot_frame
+        try:
+            return executor.submit(
+                _match_in_worker, slot.name, frame.shape, frame.dtype.str, requests
+            ).result(timeout=self.timeout)
+        except BrokenProcessPool:
+            logger.error(f"[{device_name}] Vision pool broken, restarting it")
+            self.restart()
+            raise
+
+    def restart(self):
+        self.shutdown(release_slots=False)
+        self.start()
+
+    def shutdown(self, release_slots: bool = True):
+        with self._lock:
+            (executor, self._executor) = (self._executor, None)
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if release_slots:
+            for slot in self._slots.values():
+                slot.close()
+                slot.unlink()
+            self._slots.clear()
+
+
+vision_pool = VisionPool()
+atexit.register(vision_pool.shutdown)
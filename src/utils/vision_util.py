@@ -0,0 +1,284 @@
+import hashlib
+from typing import Dict, List, NamedTuple, Tuple
+
+import cv2
+import numpy as np
+
+NMS_IOU_THRESHOLD = 0.3
+MAX_PEAK_CANDIDATES = 2000
+
+PYRAMID_FACTOR = 2
+# coarse scores are computed on gray images, a bit looser than the final one
+PYRAMID_COARSE_MARGIN = 0.1
+PYRAMID_MAX_CANDIDATES = 50
+
+FINGERPRINT_HASH_SIZE = 16
+FINGERPRINT_THUMBNAIL_SIZE = (36, 64)
+# mean absolute difference of the thumbnails (0..1) below which two frames
+# are considered the same screen
+FRAME_UNCHANGED_DIFF = 0.01
+FINGERPRINT_MAX_DISTANCE = 8
+
+
+class MatchBox(NamedTuple):
+    x: int
+    y: int
+    width: int
+    height: int
+    score: float
+
+    def position(self, num_div: int = 3, add_x=0, add_y=0) -> Tuple[int, int]:
+        """Click position, `add_x`/`add_y` are in 1/num_div of the box size"""
+        return (
+            self.x + add_x * (self.width // num_div),
+            self.y + add_y * (self.height // num_div),
+        )
+
+
+def non_max_suppression(
+    boxes: np.ndarray, scores: np.ndarray, iou_threshold: float = NMS_IOU_THRESHOLD
+) -> np.ndarray:
+    """Greedy IoU suppression.
+
+    Args:
+        boxes: (N, 4) array of x1, y1, x2, y2
+        scores: (N,) array
+
+    Returns:
+        indexes of the kept boxes, best score first
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.intp)
+    boxes = boxes.astype(np.float32)
+    (x1, y1, x2, y2) = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+        inter_w = np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest])
+        inter_h = np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest])
+        inter = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+        iou = inter / (areas[best] + areas[rest] - inter)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.intp)
+
+
+def find_peaks(
+    result: np.ndarray,
+    threshold: float,
+    width: int,
+    height: int,
+    iou_threshold: float = NMS_IOU_THRESHOLD,
+    offset: Tuple[int, int] = (0, 0),
+) -> List[MatchBox]:
+    """Turn a `cv2.matchTemplate` score map into one box per matched element.
+
+    Only local maxima above `threshold` are kept as candidates, the
+    overlapping ones are then removed by IoU non-maximum suppression.
+    """
+    mask = result >= threshold
+    if not mask.any():
+        return []
+    local_max = cv2.dilate(result, np.ones((3, 3), np.uint8))
+    (ys, xs) = np.nonzero(mask & (result >= local_max))
+    scores = result[ys, xs]
+    if len(scores) > MAX_PEAK_CANDIDATES:
+        top = np.argpartition(-scores, MAX_PEAK_CANDIDATES)[:MAX_PEAK_CANDIDATES]
+        (ys, xs, scores) = (ys[top], xs[top], scores[top])
+    xs = xs + offset[0]
+    ys = ys + offset[1]
+    boxes = np.stack([xs, ys, xs + width, ys + height], axis=1)
+    keep = non_max_suppression(boxes, scores, iou_threshold)
+    return [
+        MatchBox(int(xs[i]), int(ys[i]), width, height, float(scores[i])) for i in keep
+    ]
+
+
+def match_template(
+    frame: np.ndarray,
+    template: np.ndarray,
+    threshold: float,
+    iou_threshold: float = NMS_IOU_THRESHOLD,
+) -> List[MatchBox]:
+    (height, width) = template.shape[:2]
+    if frame.shape[0] < height or frame.shape[1] < width:
+        return []
+    result = cv2.matchTemplate(frame, template, cv2.TM_CCOEFF_NORMED)
+    return find_peaks(result, threshold, width, height, iou_threshold)
+
+
+def build_coarse_templates(
+    gray_template: np.ndarray, factor: int = PYRAMID_FACTOR
+) -> List[Tuple[Tuple[int, int], np.ndarray]]:
+    """Downscale a gray template by `factor`, once per sub-pixel phase.
+
+    A template that sits at an odd position in the frame is averaged over
+    different pixel blocks than the template itself, which costs thin
+    outlines most of their score. Matching every phase `(dx, dy)` keeps the
+    coarse scores as high as the full resolution ones.
+    """
+    (height, width) = gray_template.shape[:2]
+    coarse_templates = []
+    for dy in range(factor):
+        for dx in range(factor):
+            coarse_height = (height - dy) // factor
+            coarse_width = (width - dx) // factor
+            if coarse_height < 1 or coarse_width < 1:
+                continue
+            crop = gray_template[
+                dy : dy + coarse_height * factor, dx : dx + coarse_width * factor
+            ]
+            coarse = cv2.resize(
+                crop, (coarse_width, coarse_height), interpolation=cv2.INTER_AREA
+            )
+            coarse_templates.append(((dx, dy), coarse))
+    return coarse_templates
+
+
+class FramePyramid:
+    """Gray and downscaled views of one frame, computed once and shared by
+    every template matched against it."""
+
+    def __init__(self, frame: np.ndarray):
+        self.frame = frame
+        self._grays: Dict[int, np.ndarray] = {}
+
+    def gray(self, factor: int = 1) -> np.ndarray:
+        gray = self._grays.get(factor)
+        if gray is None:
+            if factor == 1:
+                gray = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
+            else:
+                full = self.gray()
+                size = (full.shape[1] // factor, full.shape[0] // factor)
+                gray = cv2.resize(
+                    full[: size[1] * factor, : size[0] * factor],
+                    size,
+                    interpolation=cv2.INTER_AREA,
+                )
+            self._grays[factor] = gray
+        return gray
+
+
+def match_template_pyramid(
+    pyramid: FramePyramid,
+    template: np.ndarray,
+    coarse_templates: List[Tuple[Tuple[int, int], np.ndarray]],
+    threshold: float,
+    factor: int = PYRAMID_FACTOR,
+    coarse_margin: float = PYRAMID_COARSE_MARGIN,
+    iou_threshold: float = NMS_IOU_THRESHOLD,
+) -> List[MatchBox]:
+    """Coarse-to-fine matching.
+
+    The `coarse_templates` (see `build_coarse_templates`) are matched on the
+    gray frame downscaled by `factor` first, then `template` is matched at
+    full resolution only in a small window around every coarse candidate.
+    The returned boxes are scored the same way as `match_template`.
+    """
+    frame = pyramid.frame
+    coarse_frame = pyramid.gray(factor)
+    (height, width) = template.shape[:2]
+    (frame_height, frame_width) = frame.shape[:2]
+    candidates: List[MatchBox] = []
+    for (dx, dy), coarse_template in coarse_templates:
+        for candidate in match_template(
+            coarse_frame, coarse_template, threshold - coarse_margin, iou_threshold
+        )[:PYRAMID_MAX_CANDIDATES]:
+            candidates.append(
+                candidate._replace(
+                    x=candidate.x * factor - dx,
+                    y=candidate.y * factor - dy,
+                    width=width,
+                    height=height,
+                )
+            )
+    candidates = _suppress(candidates, iou_threshold)[:PYRAMID_MAX_CANDIDATES]
+
+    pad = factor + 1
+    boxes: List[MatchBox] = []
+    for candidate in candidates:
+        x1 = max(0, candidate.x - pad)
+        y1 = max(0, candidate.y - pad)
+        x2 = min(frame_width, candidate.x + width + pad)
+        y2 = min(frame_height, candidate.y + height + pad)
+        if x2 - x1 < width or y2 - y1 < height:
+            continue
+        result = cv2.matchTemplate(frame[y1:y2, x1:x2], template, cv2.TM_CCOEFF_NORMED)
+        boxes += find_peaks(
+            result, threshold, width, height, iou_threshold, offset=(x1, y1)
+        )
+    return _suppress(boxes, iou_threshold)
+
+
+def _suppress(boxes: List[MatchBox], iou_threshold: float) -> List[MatchBox]:
+    if len(boxes) < 2:
+        return boxes
+    keep = non_max_suppression(
+        np.array([[b.x, b.y, b.x + b.width, b.y + b.height] for b in boxes]),
+        np.array([b.score for b in boxes]),
+        iou_threshold,
+    )
+    return [boxes[i] for i in keep]
+
+
+class FrameFingerprint(NamedTuple):
+    # difference hash, FINGERPRINT_HASH_SIZE ** 2 bits
+    hash: int
+    # small gray frame used for the diff score
+    thumbnail: np.ndarray
+    # exact digest of the pixels, identical frames only
+    digest: bytes
+
+
+def frame_fingerprint(frame: np.ndarray) -> FrameFingerprint:
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    thumbnail = cv2.resize(
+        gray, FINGERPRINT_THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA
+    )
+    size = FINGERPRINT_HASH_SIZE
+    small = cv2.resize(thumbnail, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return FrameFingerprint(
+        int.from_bytes(np.packbits(bits).tobytes(), "big"),
+        thumbnail,
+        hashlib.blake2b(np.ascontiguousarray(frame).data, digest_size=16).digest(),
+    )
+
+
+def frame_diff(first: FrameFingerprint, second: FrameFingerprint) -> float:
+    """Mean absolute difference of the thumbnails, 0 (same) .. 1"""
+    if first.thumbnail.shape != second.thumbnail.shape:
+        return 1.0
+    return float(cv2.absdiff(first.thumbnail, second.thumbnail).mean()) / 255
+
+
+def hash_distance(first: FrameFingerprint, second: FrameFingerprint) -> int:
+    return bin(first.hash ^ second.hash).count("1")
+
+
+def is_same_frame(
+    first: FrameFingerprint,
+    second: FrameFingerprint,
+    max_diff: float = FRAME_UNCHANGED_DIFF,
+) -> bool:
+    """Perceptual hashes close enough and thumbnails nearly identical"""
+    return (
+        hash_distance(first, second) <= FINGERPRINT_MAX_DISTANCE
+        and frame_diff(first, second) <= max_diff
+    )
+
+
+def draw_boxes(frame: np.ndarray, boxes: List[MatchBox]) -> np.ndarray:
+    for box in boxes:
+        cv2.rectangle(
+            frame,
+            (box.x, box.y),
+            (box.x + box.width, box.y + box.height),
+            (255, 0, 0),
+            2,
+        )
+    return frame
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, Generic, List, Optional, TypeVar
+
+from src.configs.common_config import (
+    VM_POOL_HOST_RESERVE_MB,
+    VM_POOL_IDLE_TIMEOUT,
+    VM_POOL_SIZE,
+    VM_POOL_VM_MEMORY_MB,
+)
+from src.utils.log_util import logger
+
+# what `start_vm` gives for a booted VM, e.g. its connected device
+T = TypeVar("T")
+
+
+def get_host_memory_mb() -> Optional[int]:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // 2**20
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def get_pool_size() -> int:
+    """`VM_POOL_SIZE`, else as many VMs as the host memory holds"""
+    if VM_POOL_SIZE >= 0:
+        return VM_POOL_SIZE
+    memory_mb = get_host_memory_mb()
+    if memory_mb is None:
+        return 0
+    return max(0, (memory_mb - VM_POOL_HOST_RESERVE_MB) // VM_POOL_VM_MEMORY_MB)
+
+
+class PooledVm(Generic[T]):
+    def __init__(self, vm_name: str, vm_uid: str, device: T):
+        self.vm_name = vm_name
+        self.vm_uid = vm_uid
+        self.device = device
+        self.busy = True
+        self.last_used_at = time.time()
+
+
+class VmPool(Generic[T]):
+    """Booted VMs kept warm between jobs, so a job on a VM that ran a job
+    shortly before skips the boot and the teardown.
+
+    `acquire` hands out the warm VM, or boots it with `start_vm`; `release`
+    keeps it booted. Idle VMs are stopped with `stop_vm` after
+    `idle_timeout`, and the least recently used ones first when more than
+    `size` VMs are booted. A warm VM failing `is_alive` is booted again.
+    """
+
+    def __init__(
+        self,
+        start_vm: Callable[[str, str], Optional[T]],
+        stop_vm: Callable[[str, str, T], None],
+        is_alive: Callable[[T], bool] = lambda device: True,
+        size: Optional[int] = None,
+        idle_timeout: float = VM_POOL_IDLE_TIMEOUT,
+    ):
+        self.start_vm = start_vm
+        self.stop_vm = stop_vm
+        self.is_alive = is_alive
+        self.size = get_pool_size() if size is None else size
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._entries: Dict[str, PooledVm[T]] = {}
+
+    def acquire(self, vm_name: str, vm_uid: str) -> Optional[T]:
+        with self._lock:
+            entry = self._entries.get(vm_name)
+            if entry is not None and not entry.busy:
+                entry.busy = True
+            else:
+                entry = None
+        if entry is not None:
+            if self.is_alive(entry.device):
+                logger.info(f"[{vm_name}] Reuse warm VM")
+                return entry.device
+            logger.warning(f"[{vm_name}] Warm VM is gone, booting it again")
+            self._stop([self._pop(vm_name)])
+
+        with self._lock:
+            evicted = self._pop_idle(len(self._entries) + 1 - self.size)
+        self._stop(evicted)
+        device = self.start_vm(vm_name, vm_uid)
+        if device is not None:
+            with self._lock:
+                self._entries[vm_name] = PooledVm(vm_name, vm_uid, device)
+        return device
+
+    def release(self, vm_name: str, healthy: bool = True):
+        """Keep a VM booted after its job, stop it when it isn't `healthy`"""
+        with self._lock:
+            entry = self._entries.get(vm_name)
+            if entry is None:
+                return
+            entry.busy = False
+            entry.last_used_at = time.time()
+            if healthy:
+                evicted = self._pop_idle(len(self._entries) - self.size)
+            else:
+                evicted = [self._entries.pop(vm_name)]
+        self._stop(evicted)
+
+    def discard(self, vm_name: str):
+        """Stop an idle VM, e.g. when its next job is too far away"""
+        with self._lock:
+            entry = self._entries.get(vm_name)
+            if entry is None or entry.busy:
+                return
+            del self._entries[vm_name]
+        self._stop([entry])
+
+    def evict_idle(self, now: Optional[float] = None):
+        """Stop the VMs idle for longer than `idle_timeout`"""
+        now = time.time() if now is None else now
+        with self._lock:
+            evicted = [
+                entry
+                for entry in self._entries.values()
+                if not entry.busy and now - entry.last_used_at >= self.idle_timeout
+            ]
+            for entry in evicted:
+                del self._entries[entry.vm_name]
+        self._stop(evicted)
+
+    def next_expire_at(self) -> Optional[float]:
+        with self._lock:
+            idle_at = [
+                entry.last_used_at for entry in self._entries.values() if not entry.busy
+            ]
+        return min(idle_at) + self.idle_timeout if idle_at else None
+
+    def get_idle_names(self) -> List[str]:
+        with self._lock:
+            return [name for name, entry in self._entries.items() if not entry.busy]
+
+    def close(self):
+        """Stop all the idle VMs"""
+        with self._lock:
+            evicted = [entry for entry in self._entries.values() if not entry.busy]
+            for entry in evicted:
+                del self._entries[entry.vm_name]
+        self._stop(evicted)
+
+    def _pop(self, vm_name: str) -> PooledVm[T]:
+        with self._lock:
+            return self._entries.pop(vm_name)
+
+    def _pop_idle(self, count: int) -> List[PooledVm[T]]:
+        """Remove the `count` least recently used idle VMs, lock held"""
+        idle = sorted(
+            (entry for entry in self._entries.values() if not entry.busy),
+            key=lambda entry: entry.last_used_at,
+        )[: max(0, count)]
+        for entry in idle:
+            del self._entries[entry.vm_name]
+        return idle
+
+    def _stop(self, entries: List[PooledVm[T]]):
+        for entry in entries:
+            try:
+                self.stop_vm(entry.vm_name, entry.vm_uid, entry.device)
+            except Exception as e:
+                logger.error(f"[{entry.vm_name}] Stop VM failed", e)
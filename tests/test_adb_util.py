@@ -0,0 +1,27 @@
+import threading
+
+from src.utils.adb_util import DeviceWatcher
+
+
+def test_device_watcher_claims_each_vm_once():
+    watcher = DeviceWatcher()
+    watcher._on_event("emulator-5554", "device")
+
+    # the VM of the other worker comes online first
+    watcher._on_event("192.168.56.102:5555", "device")
+    watcher._on_event("192.168.56.101:5555", "offline")
+    threading.Timer(
+        0.05, watcher._on_event, args=("192.168.56.101:5555", "device")
+    ).start()
+    assert (
+        watcher.claim("vm1", lambda: "192.168.56.101:5555", timeout=2)
+        == "192.168.56.101:5555"
+    )
+
+    # never guessed from the new devices while the serial is unknown
+    assert watcher.claim("vm2", lambda: None, timeout=0.05) is None
+    assert watcher.claim("vm3", lambda: "192.168.56.101:5555", timeout=0.05) is None
+    watcher.release("192.168.56.101:5555")
+    assert watcher.claim("vm3", lambda: "192.168.56.101:5555", timeout=0.05)
+    watcher._on_event("192.168.56.102:5555", None)
+    assert watcher.get_serials() == {"emulator-5554", "192.168.56.101:5555"}
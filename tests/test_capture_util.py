@@ -0,0 +1,25 @@
+import struct
+
+import numpy as np
+import pytest
+
+from src.utils import capture_util
+
+
+@pytest.mark.parametrize("header_size", [12, 16])
+def test_parse_raw_screencap(header_size):
+    rgba = np.random.default_rng(0).integers(0, 256, (4, 3, 4), dtype=np.uint8)
+    header = struct.pack("<3I", 3, 4, 1).ljust(header_size, b"\0")
+    data = header + rgba.tobytes()
+
+    (pixels, pixel_format) = capture_util.parse_raw_screencap(data)
+    bgr = capture_util.convert_raw_frame(pixels, pixel_format)
+
+    assert np.shares_memory(pixels, np.frombuffer(data, dtype=np.uint8))
+    assert (bgr == rgba[:, :, 2::-1]).all()
+
+
+def test_parse_raw_screencap_invalid_size():
+    data = struct.pack("<3I", 3, 4, 1) + bytes(10)
+    with pytest.raises(ValueError):
+        capture_util.parse_raw_screencap(data)
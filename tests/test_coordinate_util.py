@@ -0,0 +1,40 @@
+import threading
+
+from src.utils.coordinate_util import CoordinateStore
+
+
+def test_coordinate_store_persists_and_invalidates(tmp_path):
+    file_path = str(tmp_path / "coordinates.json")
+    key = CoordinateStore.get_key("device", "1080x2400", "11.2.3", "bot_menu")
+    store = CoordinateStore(file_path)
+
+    store.put(key, (100, 2300))
+
+    assert CoordinateStore(file_path).get(key) == (100, 2300)
+    assert store.get(key.replace("11.2.3", "11.3.0")) is None
+    store.invalidate(key)
+    assert CoordinateStore(file_path).get(key) is None
+
+
+def test_coordinate_store_saves_whole_files_from_threads(tmp_path):
+    file_path = str(tmp_path / "coordinates.json")
+    store = CoordinateStore(file_path)
+
+    def put_points(device_name):
+        for index in range(20):
+            key = CoordinateStore.get_key(device_name, "1080x2400", "1", str(index))
+            store.put(key, (index, index))
+
+    threads = [
+        threading.Thread(target=put_points, args=(f"device{i}",)) for i in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    key = CoordinateStore.get_key("device3", "1080x2400", "1", "19")
+    loaded = CoordinateStore(file_path)
+    assert loaded.get(key) == (19, 19)
+    assert len(loaded._points) == 80
+    assert list(tmp_path.iterdir()) == [tmp_path / "coordinates.json"]
@@ -0,0 +1,60 @@
+import numpy as np
+
+from src.utils.debug_util import DebugArtifactWriter
+from src.utils.vision_util import MatchBox
+
+FRAME = np.zeros((40, 30, 3), np.uint8)
+MATCHED = {"blum_claim": [MatchBox(5, 5, 10, 10, 0.99)]}
+MISSED = {"blum_claim": [MatchBox(5, 5, 10, 10, 0.99)], "blum_start": []}
+
+
+def _queued(writer):
+    return [item[0] for item in list(writer._queue.queue)]
+
+
+def _writer(tmp_path, monkeypatch, **kwargs) -> DebugArtifactWriter:
+    """A writer whose queue is left for the test to read"""
+    writer = DebugArtifactWriter(folder_path=str(tmp_path), **kwargs)
+    monkeypatch.setattr(writer, "_start", lambda: None)
+    return writer
+
+
+def test_frames_sampled_by_mode(tmp_path, monkeypatch):
+    on_miss = _writer(tmp_path, monkeypatch, mode="on_miss")
+    on_miss.submit("a", "1", FRAME, MATCHED)
+    on_miss.submit("a", "2", FRAME, MISSED)
+    assert _queued(on_miss) == ["matched_a_2.png"]
+
+    every_n = _writer(tmp_path, monkeypatch, mode="every_n", every_n=2)
+    for index in range(4):
+        every_n.submit("a", str(index), FRAME, MATCHED)
+    assert _queued(every_n) == ["matched_a_1.png", "matched_a_3.png"]
+
+    off = _writer(tmp_path, monkeypatch, mode="off")
+    off.submit("a", "1", FRAME, MISSED)
+    assert _queued(off) == []
+
+
+def test_frames_dropped_when_queue_full(tmp_path, monkeypatch):
+    writer = _writer(tmp_path, monkeypatch, mode="always", queue_size=2)
+    for index in range(4):
+        writer.submit("a", str(index), FRAME, MATCHED)
+
+    assert _queued(writer) == ["matched_a_0.png", "matched_a_1.png"]
+
+
+def test_dump_ring_writes_last_frames_of_the_run(tmp_path):
+    writer = DebugArtifactWriter(mode="off", ring_size=2, folder_path=str(tmp_path))
+    writer.submit("a", "1", FRAME, MATCHED)
+    writer.reset("a")
+    assert writer.dump_ring("a") == 0
+
+    for index in range(3):
+        writer.submit("a", str(index), FRAME, MISSED)
+    writer.submit("b", "1", FRAME, MATCHED)
+    assert writer.dump_ring("a") == 2
+    writer.flush()
+
+    assert len(list(tmp_path.glob("failed_a_*.png"))) == 2
+    assert writer.dump_ring("a") == 0
+    assert writer.dump_ring("b", reason="error") == 1
@@ -0,0 +1,167 @@
+import glob
+import os
+
+from src.model.config_device import ConfigDevice
+from src.services.tele_service import BaseTeleGroupService
+from src.services import tele_service
+from src.utils import flow_util
+from src.utils.flow_util import FlowCompiler, FlowRegistry, FlowRunner
+from src.utils.timeout_util import TimeoutStore
+from tests.test_hierarchy_util import PACKAGE, XML
+from tests.test_tele_service import FakeDevice
+
+SERVICE_FOLDER_PATH = "src/services/"
+
+
+def _compile(steps):
+    return FlowCompiler("test", PACKAGE).compile({"steps": steps})
+
+
+def _call_names(steps):
+    for step in steps:
+        if step.action == "call":
+            yield step.args["method"]
+        for key in ("steps", "then", "else"):
+            yield from _call_names(step.args.get(key, []))
+
+
+def test_adjacent_checks_share_one_read():
+    plan = _compile(
+        [
+            {"check": {"verify": {"exists": {"text": "Verify"}}}},
+            {"check": {"claim": {"matched": "blum_claim"}}},
+            {"if": {"exists": {"text": "Home"}}, "then": [{"back": 1}]},
+            {"click": {"text": "Verify"}},
+            {"if": "not verify", "then": [{"back": 1}]},
+        ]
+    )
+
+    assert [step.action for step in plan.steps] == ["check", "if", "click", "if"]
+    assert len(plan.steps[0].args["conditions"]) == 3
+    assert plan.steps[3].args["negate"]
+
+
+def test_checks_waiting_or_reusing_a_name_keep_their_step():
+    plan = _compile(
+        [
+            {"check": {"verify": {"exists": {"text": "Verify"}}}},
+            {"check": {"claim": {"matched": "blum_claim"}}, "timeout": 5},
+            {"check": {"home": {"exists": {"text": "Home"}}}},
+            {"check": {"home": {"exists": {"description": "Home"}}}},
+        ]
+    )
+
+    assert [list(step.args["conditions"]) for step in plan.steps] == [
+        ["verify"],
+        ["claim"],
+        ["home"],
+        ["home"],
+    ]
+
+
+def test_each_runs_its_steps_per_position():
+    device = FakeDevice([XML])
+    service = BaseTeleGroupService(device, "device", ConfigDevice(device_name="a"))
+    plan = _compile(
+        [
+            {"check": {"verify": {"exists": {"text": "Verify"}}}},
+            {"if": "verify", "then": [{"tap": {"check": "verify"}}]},
+            {
+                "name": "cards",
+                "each": "cards",
+                "order": "asc",
+                "skip": 1,
+                "do": [{"tap": {"check": "item"}}],
+            },
+        ]
+    )
+    runner = FlowRunner(service, plan)
+    runner.results["cards"] = [(30, 40), (10, 20), (50, 60)]
+
+    assert runner.run()
+    assert device.commands == [
+        ("click", 900, 460),
+        ("click", 30, 40),
+        ("click", 50, 60),
+    ]
+
+
+def test_flow_files_compile_for_their_services():
+    registry = FlowRegistry()
+    for file_path in glob.glob(os.path.join(registry.folder_path, "*.yaml")):
+        flow_name = os.path.splitext(os.path.basename(file_path))[0]
+        plan = registry.get(flow_name, PACKAGE)
+        # the services import `model` from `src`, so their source is read
+        with open(f"{SERVICE_FOLDER_PATH}{flow_name}_service.py") as file:
+            service_source = file.read()
+        with open(f"{SERVICE_FOLDER_PATH}tele_service.py") as file:
+            service_source += file.read()
+        for method in _call_names(plan.steps):
+            assert f"def {method}(" in service_source, method
+
+
+def test_runner_clicks_and_times_steps(tmp_path, monkeypatch):
+    store = TimeoutStore(str(tmp_path / "timeouts.json"), "")
+    monkeypatch.setattr(tele_service, "timeout_store", store)
+    monkeypatch.setattr(flow_util, "timeout_store", store)
+    device = FakeDevice([XML])
+    service = BaseTeleGroupService(device, "device", ConfigDevice(device_name="a"))
+    plan = _compile(
+        [
+            {"check": {"follow": {"exists": {"text": "Follow Blum"}}}},
+            {
+                "name": "verify",
+                "if": "follow",
+                "then": [
+                    {
+                        "click": {"text": "Follow Blum", "sibling": {"text": "Verify"}},
+                        "timeout": 0,
+                    }
+                ],
+            },
+            {"name": "claim", "click": {"text": "Claim"}, "timeout": 0},
+        ]
+    )
+    runner = FlowRunner(service, plan)
+
+    assert not runner.run()
+    assert device.commands == [("click", 900, 460)]
+    assert [(timing.path, timing.ok) for timing in runner.timings] == [
+        ("0:check", True),
+        ("verify/0:click", True),
+        ("verify", True),
+        ("claim", False),
+    ]
+    assert [row["key"] for row in store.report()] == [
+        "BaseTeleGroupService|test/claim",
+        "BaseTeleGroupService|test/verify/0:click",
+    ]
+
+
+def test_repeated_step_learns_one_timeout(tmp_path, monkeypatch):
+    store = TimeoutStore(str(tmp_path / "timeouts.json"), "")
+    monkeypatch.setattr(tele_service, "timeout_store", store)
+    monkeypatch.setattr(flow_util, "timeout_store", store)
+    device = FakeDevice([XML])
+    service = BaseTeleGroupService(device, "device", ConfigDevice(device_name="a"))
+    plan = _compile(
+        [
+            {
+                "name": "verify",
+                "repeat": [{"name": "tap", "click": {"text": "Verify"}}],
+                "times": 3,
+            }
+        ]
+    )
+    runner = FlowRunner(service, plan)
+
+    assert runner.run()
+    assert [timing.path for timing in runner.timings] == [
+        "verify/#0/tap",
+        "verify/#1/tap",
+        "verify/#2/tap",
+        "verify",
+    ]
+    assert [(row["key"], row["samples"]) for row in store.report()] == [
+        ("BaseTeleGroupService|test/verify/tap", 3)
+    ]
@@ -0,0 +1,32 @@
+import time
+
+import cv2
+import numpy as np
+
+from src.utils.frame_source_util import PngSequenceSource
+
+
+def test_png_sequence_source_waits_for_newer_frame(tmp_path):
+    for index in range(3):
+        frame = np.full((20, 10, 3), index * 100, np.uint8)
+        cv2.imwrite(str(tmp_path / f"frame_{index}.png"), frame)
+    source = PngSequenceSource("fake", str(tmp_path / "*.png"), interval=0.05)
+    source.start()
+    try:
+        first = source.wait_frame(timeout=1)
+        action_at = time.time()
+        after_action = source.wait_frame(newer_than=action_at, timeout=1)
+    finally:
+        source.stop()
+
+    assert first is not None and after_action is not None
+    assert after_action.timestamp >= action_at
+    assert after_action.image.shape == (20, 10, 3)
+
+
+def test_png_sequence_source_stops_without_loop(tmp_path):
+    cv2.imwrite(str(tmp_path / "frame.png"), np.zeros((4, 4, 3), np.uint8))
+    source = PngSequenceSource("fake", str(tmp_path / "*.png"), loop=False)
+    source.start()
+    assert source.wait_frame(newer_than=time.time() + 10, timeout=1) is None
+    assert not source.running
@@ -0,0 +1,82 @@
+from src.utils.hierarchy_util import HierarchySnapshot, parse_bounds
+
+PACKAGE = "org.telegram.messenger"
+XML = f"""<?xml version='1.0' encoding='UTF-8' standalone='yes' ?>
+<hierarchy rotation="0">
+  <node index="0" text="" class="android.widget.FrameLayout" package="{PACKAGE}"
+      content-desc="" clickable="false" enabled="true" bounds="[0,0][1080,2400]">
+    <node index="0" text="" class="android.view.View" package="{PACKAGE}"
+        content-desc="" clickable="false" enabled="true" bounds="[0,400][1080,600]">
+      <node index="0" text="Follow Blum" class="android.widget.TextView"
+          package="{PACKAGE}" content-desc="" clickable="false" enabled="true"
+          bounds="[40,420][600,480]" />
+      <node index="1" text="Verify" class="android.widget.Button"
+          package="{PACKAGE}" content-desc="" clickable="true" enabled="true"
+          bounds="[800,420][1000,500]" />
+    </node>
+    <node index="1" text="" class="android.view.View" package="{PACKAGE}"
+        content-desc="" clickable="false" enabled="true" bounds="[0,600][1080,800]">
+      <node index="0" text="Join channel" class="android.widget.TextView"
+          package="{PACKAGE}" content-desc="" clickable="false" enabled="true"
+          bounds="[40,620][600,680]" />
+      <node index="1" text="Verify" class="android.widget.Button"
+          package="{PACKAGE}" content-desc="" clickable="true" enabled="true"
+          bounds="[800,620][1000,700]" />
+    </node>
+  </node>
+  <node index="0" text="" class="android.widget.FrameLayout"
+      package="com.android.systemui" content-desc="Home" clickable="true"
+      enabled="true" bounds="[0,2300][1080,2400]" />
+</hierarchy>"""
+
+
+class FakeDevice:
+    def __init__(self):
+        self.clicks = []
+
+    def click(self, x, y):
+        self.clicks.append((x, y))
+
+
+def test_parse_bounds():
+    assert parse_bounds("[0,72][1080,200]") == (0, 72, 1080, 200)
+    assert parse_bounds("") is None
+
+
+def test_selector_queries():
+    snapshot = HierarchySnapshot(XML)
+
+    btn_verify = snapshot(text="Verify", clickable=True, instance=1)
+
+    assert btn_verify.exists
+    assert btn_verify.bounds == (800, 620, 1000, 700)
+    assert btn_verify.sibling(className="android.widget.TextView").get_text() == (
+        "Join channel"
+    )
+    assert not snapshot(text="Verify", instance=2).exists
+    assert snapshot(textStartsWith="Follow").get_text() == "Follow Blum"
+    assert snapshot(description="Home", packageName=PACKAGE).exists is False
+    # patterns match the whole text, as in uiautomator
+    assert snapshot(textMatches="Join chan.*").get_text() == "Join channel"
+    assert not snapshot(textMatches="Join").exists
+
+
+def test_child_and_package():
+    snapshot = HierarchySnapshot(XML)
+
+    root = snapshot(className="android.widget.FrameLayout", packageName=PACKAGE)
+
+    assert root.child(text="Verify", instance=1).center == (900, 660)
+    second_row = root.child(className="android.view.View", index=1)
+    assert second_row.bounds == (0, 600, 1080, 800)
+    assert snapshot.has_package("com.android.systemui")
+    assert not snapshot.has_package("com.other.app")
+
+
+def test_click_by_cached_bounds():
+    device = FakeDevice()
+    snapshot = HierarchySnapshot(XML, device)
+
+    assert snapshot(text="Verify").click()
+    assert not snapshot(text="Claim").click()
+    assert device.clicks == [(900, 460)]
@@ -0,0 +1,22 @@
+from src.services.tele_service import BaseTeleService
+from src.utils.instrument_util import IO, SLEEP, instrumentation
+from tests.test_hierarchy_util import XML
+from tests.test_tele_service import FakeDevice
+
+
+def test_run_stats_split_waiting_sleeping_and_io():
+    device = FakeDevice([XML])
+    service = BaseTeleService(device, "instrumented")
+
+    with instrumentation.run("instrumented", "BaseTeleService") as stats:
+        assert service.wait_any([{"text": "Claim"}], timeout=0.3)[0] == -1
+        assert service.wait_any([{"text": "Verify"}], timeout=0)[1].click()
+
+    categories = stats.by_category()
+    assert categories[SLEEP] > 0.2
+    assert abs(sum(categories.values()) - stats.seconds) < 1e-6
+    assert stats.calls[("wait_any", IO, "FakeDevice.dump_hierarchy")].count >= 2
+    assert stats.calls[("other", IO, "FakeDevice.click")].count == 1
+    assert device.commands == [("click", 900, 460)]
+    assert instrumentation.get_runs("instrumented") == [stats]
+    assert stats.to_record()["calls"][0]["category"] == SLEEP
@@ -0,0 +1,61 @@
+from src.utils import navigation_util
+from src.utils.hierarchy_util import HierarchySnapshot
+
+PACKAGE = "org.telegram.messenger"
+
+
+def _snapshot(*nodes):
+    xml = "".join(
+        f'<node index="0" text="{text}" class="{class_name}" package="{package}" '
+        f'content-desc="{description}" clickable="true" bounds="[0,0][10,10]" />'
+        for (text, description, class_name, package) in nodes
+    )
+    return HierarchySnapshot(f'<hierarchy rotation="0">{xml}</hierarchy>')
+
+
+def _classify(*nodes):
+    return navigation_util.classify_screen(_snapshot(*nodes), PACKAGE, "Blum")
+
+
+def test_classify_screen():
+    view = "android.view.View"
+    web_view = navigation_util.WEB_VIEW_CLASS_NAME
+    assert (
+        _classify(
+            ("", "Open navigation menu", view, PACKAGE), ("Blum", "", view, PACKAGE)
+        )
+        == navigation_util.TELE_HOME
+    )
+    assert _classify(("Blum", "", view, PACKAGE)) == navigation_util.GROUP_CHAT
+    assert _classify(("Blum", "", view, PACKAGE), ("", "", web_view, PACKAGE)) == (
+        navigation_util.BOT_WEB_APP
+    )
+    assert _classify(("Other bot", "", view, PACKAGE)) == navigation_util.TELE_OTHER
+    assert _classify(("Tweet", "", view, "com.twitter.android")) == (
+        navigation_util.OTHER_APP
+    )
+    assert (
+        _classify(
+            ("OK", "", "android.widget.Button", "android"), ("Blum", "", view, PACKAGE)
+        )
+        == navigation_util.SYSTEM_DIALOG
+    )
+
+
+def test_find_route_takes_shortest_path():
+    route = navigation_util.find_route(
+        navigation_util.OTHER_APP, navigation_util.BOT_WEB_APP
+    )
+
+    assert [action for (action, _) in route] == [
+        "open_tele_app",
+        "open_group_chat",
+        "open_bot_menu",
+    ]
+    assert navigation_util.find_route(
+        navigation_util.BOT_WEB_APP, navigation_util.TELE_HOME
+    ) == [
+        ("close_bot_menu", navigation_util.GROUP_CHAT),
+        ("back", navigation_util.TELE_HOME),
+    ]
+    assert navigation_util.find_route(navigation_util.TELE_HOME, "unknown") is None
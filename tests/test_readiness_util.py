@@ -0,0 +1,31 @@
+from types import SimpleNamespace
+
+from src.utils import readiness_util
+from src.utils.readiness_util import BOOT_COMPLETED, LAUNCHER, ReadinessProbe
+
+
+class BootingDevice:
+    def __init__(self, boot_polls):
+        self.boot_polls = boot_polls
+
+    def getprop(self, name):
+        self.boot_polls -= 1
+        if self.boot_polls > 0:
+            raise ConnectionError("device offline")
+        return "1\n"
+
+    def app_current(self):
+        return SimpleNamespace(package="com.android.systemui")
+
+
+def test_probe_times_stages_until_deadline(monkeypatch):
+    monkeypatch.setattr(readiness_util.time, "sleep", lambda seconds: None)
+    probe = ReadinessProbe(
+        "vm1", BootingDevice(boot_polls=3), None, timeout=0.2, poll_interval=0.01
+    )
+
+    assert not probe.wait_ready()
+    assert [(timing.stage, timing.ok) for timing in probe.timings] == [
+        (BOOT_COMPLETED, True),
+        (LAUNCHER, False),
+    ]
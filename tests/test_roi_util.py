@@ -0,0 +1,66 @@
+import json
+
+from src.utils import roi_util
+from src.utils.roi_util import RoiStore
+from src.utils.vision_util import MatchBox
+
+SHAPE = (2400, 1080, 3)
+
+
+def _box(x, y):
+    return MatchBox(x, y, 100, 50, 0.99)
+
+
+def test_hint_then_learned_region_then_full_frame(tmp_path):
+    store = RoiStore(str(tmp_path / "roi.json"), hints={"blum_verify": (0, 0.5, 1, 1)})
+    assert store.get_roi("blum_verify", SHAPE) == (0, 1200, 1080, 2400)
+
+    assert store.get_roi("blum_claim", SHAPE) is None
+    for _ in range(roi_util.MIN_LEARNED_SAMPLES - 1):
+        store.record("blum_claim", SHAPE, [_box(500, 1000)])
+    store.record("blum_claim", SHAPE, [])
+    assert store.get_roi("blum_claim", SHAPE) is None
+    store.record("blum_claim", SHAPE, [_box(500, 1000)])
+    margin = roi_util.LEARNED_ROI_MARGIN
+    assert store.get_roi("blum_claim", SHAPE) == (
+        500 - margin,
+        1000 - margin,
+        600 + margin,
+        1050 + margin,
+    )
+    # learned per resolution
+    assert store.get_roi("blum_claim", (1920, 1080, 3)) is None
+
+    # several instances on one frame can be anywhere
+    store.record("blum_claim", SHAPE, [_box(500, 1000), _box(500, 1200)])
+    assert store.get_roi("blum_claim", SHAPE) is None
+
+
+def test_region_grows_and_is_saved_once_changed(tmp_path):
+    file_path = tmp_path / "roi.json"
+    store = RoiStore(str(file_path), hints={})
+    for _ in range(roi_util.MIN_LEARNED_SAMPLES):
+        store.record("hamster_profit", SHAPE, [_box(100, 300)])
+    store.record("hamster_profit", SHAPE, [_box(1000, 2380)])
+    assert not file_path.exists()
+
+    store.save()
+    margin = roi_util.LEARNED_ROI_MARGIN
+    assert store.get_roi("hamster_profit", SHAPE) == (
+        100 - margin,
+        300 - margin,
+        1080,
+        2400,
+    )
+    saved = json.loads(file_path.read_text())
+    assert saved["hamster_profit"]["1080x2400"]["box"] == [100, 300, 1100, 2430]
+    loaded = RoiStore(str(file_path), hints={})
+    assert loaded.get_roi("hamster_profit", SHAPE) == store.get_roi(
+        "hamster_profit", SHAPE
+    )
+
+    # nothing grew, nothing to write
+    file_path.unlink()
+    store.record("hamster_profit", SHAPE, [_box(100, 300)])
+    store.save()
+    assert not file_path.exists()
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from src.model.config_device import ConfigDevice
+from src.utils.schedule_util import DeviceScheduler, skip_ignored_hours
+
+HOUR = 60 * 60
+
+
+def test_scheduler_boots_due_devices_once_per_group():
+    now = 1_700_000_000
+    # blum due now, moonbix due in 20 minutes: one boot when both are due
+    grouped = ConfigDevice(
+        device_name="grouped",
+        is_blum=True,
+        blum_group_id=1,
+        is_bnb_moonbix=True,
+        last_running_ts_by_group_id={
+            1: now - 8 * HOUR,
+            "Binance Moonbix bot": now - 2 * HOUR + 20 * 60,
+        },
+    )
+    idle = ConfigDevice(
+        device_name="idle",
+        is_hamster_kombat=True,
+        last_running_ts_by_group_id={"Hamster Kombat": now},
+    )
+    disabled = ConfigDevice(device_name="disabled")
+    scheduler = DeviceScheduler(
+        [grouped, idle, disabled], group_window=30 * 60, ignore_hours=[]
+    )
+
+    assert scheduler.pop_due(now) == []
+    assert scheduler.next_boot_at() == now + 20 * 60
+    assert scheduler.pop_due(now + 20 * 60) == ["grouped"]
+    assert scheduler.next_boot_at() == now + 6 * HOUR
+
+    # moonbix failed: retried after the retry interval, not right away
+    grouped.last_running_ts_by_group_id[1] = now + 21 * 60
+    scheduler.finish_boot("grouped", now + 20 * 60)
+    assert scheduler.next_boot_at() == now + 20 * 60 + HOUR
+    assert scheduler.pop_due(now + 20 * 60 + HOUR) == ["grouped"]
+
+
+def test_skip_ignored_hours():
+    night = datetime(2024, 1, 1, 1, 30).timestamp()
+    assert skip_ignored_hours(night, [1, 2]) == datetime(2024, 1, 1, 3).timestamp()
+    assert skip_ignored_hours(night, [5]) == night
@@ -0,0 +1,30 @@
+import threading
+
+from src.utils.state_util import RUN_FAILED, RUN_OK, RunStateStore
+
+
+def test_run_state_kept_across_stores(tmp_path):
+    file_path = str(tmp_path / "run_state.db")
+    store = RunStateStore(file_path)
+    assert store.get_last_run_at("vm1", 3) is None
+
+    def run(run_key, last_run_at):
+        store.set_last_run_at("vm1", run_key, last_run_at)
+        store.record_run("vm1", "BlumService", run_key, last_run_at, RUN_OK)
+
+    threads = [
+        threading.Thread(target=run, args=(run_key, last_run_at))
+        for run_key in (3, "Blum")
+        for last_run_at in (100, 200, 150)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.record_run("vm2", "SideFansService", "SideFans", 300, RUN_FAILED)
+
+    restarted = RunStateStore(file_path)
+    assert restarted.get_last_runs("vm1") == {3: 200, "Blum": 200}
+    assert restarted.get_last_run_at("vm2", "SideFans") is None
+    assert len(restarted.get_runs("vm1")) == 6
+    assert restarted.get_runs(limit=1)[0]["outcome"] == RUN_FAILED
@@ -0,0 +1,174 @@
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from src.model.config_device import ConfigDevice
+from src.services import tele_service
+from src.services.tele_service import BaseTeleGroupService, BaseTeleService
+from src.utils import vision_pool_util
+from src.utils.coordinate_util import CoordinateStore
+from src.utils.debug_util import DebugArtifactWriter
+from src.utils.roi_util import RoiStore
+from src.utils.template_util import TemplateRegistry
+from tests.test_hierarchy_util import XML
+
+EMPTY_XML = '<hierarchy rotation="0" />'
+
+
+class FakeDevice:
+    def __init__(self, dumps):
+        self.dumps = list(dumps)
+
+        self.commands = []
+
+    def dump_hierarchy(self):
+        return self.dumps.pop(0) if len(self.dumps) > 1 else self.dumps[0]
+
+    def window_size(self):
+        return (1080, 2400)
+
+    def app_info(self, package_name):
+        return {"versionName": "11.2.3"}
+
+    def click(self, x, y):
+        self.commands.append(("click", x, y))
+
+    def shell(self, cmdargs):
+        self.commands.append(cmdargs)
+        return SimpleNamespace(exit_code=0, output="Starting: Intent")
+
+
+class FakeScreenService(BaseTeleService):
+    """Plays back a list of frames, the last one stays on screen"""
+
+    def __init__(self, frames):
+        super().__init__(FakeDevice([EMPTY_XML]), "device")
+        self.frames = list(frames)
+
+    def capture_frame(self, gray=False):
+        return self.frames.pop(0) if len(self.frames) > 1 else self.frames[0]
+
+
+def _screen(value):
+    frame = np.zeros((240, 108), np.uint8)
+    frame[value : value + 40] = 255
+    return frame
+
+
+def test_wait_any_returns_first_selector_matched():
+    service = BaseTeleService(FakeDevice([EMPTY_XML, XML]), "device")
+    selectors = [
+        lambda snapshot: snapshot(text="Follow Blum").sibling(text="Verify"),
+        {"text": "Verify"},
+    ]
+
+    (index, selection) = service.wait_any(selectors, timeout=5)
+
+    assert index == 0
+    assert selection.bounds == (800, 420, 1000, 500)
+    assert service.wait_any([{"text": "Claim"}], timeout=0)[0] == -1
+
+
+def test_wait_settled_when_frames_stop_changing():
+    service = FakeScreenService([_screen(0), _screen(100), _screen(200)])
+
+    assert service.wait_settled(5, stable_time=0.2)
+
+
+def test_wait_settled_needs_a_change_from_before():
+    service = FakeScreenService([_screen(0)])
+    before = service.screen_fingerprint()
+
+    assert not service.wait_settled(0.5, before=before, stable_time=0.1)
+    assert service.wait_settled(0.5, until=lambda: True)
+
+
+def test_open_bot_link_starts_view_intent():
+    chat = (
+        '<hierarchy rotation="0"><node index="0" text="" content-desc="Bot menu" '
+        'class="android.view.View" package="org.telegram.messenger" '
+        'bounds="[0,0][10,10]" /></hierarchy>'
+    )
+    device = FakeDevice([chat])
+    service = BaseTeleGroupService(device, "device", ConfigDevice(device_name="a"))
+    service.bot_link = "tg://resolve?domain=BlumCryptoBot"
+    service.group_name = "Blum"
+    service.group_index = None
+
+    assert service._open_bot_link()
+    assert device.commands[0][-3:] == [
+        service.bot_link,
+        "-p",
+        "org.telegram.messenger",
+    ]
+    assert service._get_run_key() == "Blum"
+
+
+def test_tap_control_drops_stale_position(tmp_path, monkeypatch):
+    store = CoordinateStore(str(tmp_path / "coordinates.json"))
+    monkeypatch.setattr(tele_service, "coordinate_store", store)
+    monkeypatch.setattr(tele_service, "COORDINATE_VERIFY_TIMEOUT", 0)
+    device = FakeDevice([XML])
+    service = BaseTeleService(device, "device")
+    store.put(service._get_control_key("verify"), (1, 1))
+
+    result = service.tap_control(
+        "verify",
+        {"text": "Verify"},
+        verify=lambda: ("click", 900, 460) in device.commands,
+        timeout=0,
+    )
+
+    assert result
+    assert device.commands == [("click", 1, 1), ("click", 900, 460)]
+    assert store.get(service._get_control_key("verify")) == (900, 460)
+
+
+class FakeScreenshotDevice(FakeDevice):
+    """Counts the screenshots taken of one fixed frame"""
+
+    def __init__(self, frame):
+        super().__init__([EMPTY_XML])
+        self.frame = frame
+        self.screenshots = 0
+
+    def screenshot(self, format="opencv"):
+        self.screenshots += 1
+        return self.frame.copy()
+
+
+def test_find_multi_boxes_matches_templates_on_one_frame(tmp_path, monkeypatch):
+    registry = TemplateRegistry(str(tmp_path))
+    monkeypatch.setattr(tele_service, "template_registry", registry)
+    monkeypatch.setattr(vision_pool_util, "template_registry", registry)
+    monkeypatch.setattr(tele_service.vision_pool, "workers", 0)
+    monkeypatch.setattr(tele_service, "roi_store", RoiStore(str(tmp_path / "roi.json")))
+    writer = DebugArtifactWriter(mode="off", folder_path="")
+    monkeypatch.setattr(tele_service, "debug_writer", writer)
+    frame = np.random.default_rng(7).integers(0, 256, (300, 200, 3), np.uint8)
+    claim = frame[20:50, 30:70].copy()
+    frame[220:250, 120:160] = claim
+    cv2.imwrite(str(tmp_path / "claim.png"), claim)
+    cv2.imwrite(str(tmp_path / "start.png"), frame[150:180, 100:140])
+    missing = np.random.default_rng(8).integers(0, 256, (30, 40, 3), np.uint8)
+    cv2.imwrite(str(tmp_path / "verify.png"), missing)
+    device = FakeScreenshotDevice(frame)
+    service = BaseTeleGroupService(device, "device", ConfigDevice(device_name="a"))
+    service.raw_screencap_enabled = False
+
+    matched = service.find_multi_boxes({"claim": 0.95, "start": 0.95, "verify": 0.95})
+
+    assert device.screenshots == 1
+    assert sorted((box.x, box.y) for box in matched["claim"]) == [(30, 20), (120, 220)]
+    assert [(box.x, box.y) for box in matched["start"]] == [(100, 150)]
+    assert matched["verify"] == []
+
+    # mixed pyramid modes still read and record one frame
+    (claim_boxes, start_boxes) = service.match_items(
+        [("claim", 0.9, False), ("start", 0.9, True)]
+    )
+    assert device.screenshots == 2
+    assert len(writer._rings[service.device_name]) == 2
+    assert len(claim_boxes) == 2
+    assert [(box.x, box.y) for box in start_boxes] == [(100, 150)]
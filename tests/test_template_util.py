@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+
+from src.utils import template_util
+from src.utils.template_util import TemplateRegistry, get_template_id
+
+
+def _write(path, value):
+    image = np.full((20, 30, 3), value, np.uint8)
+    image[5:15, 10:20] = 255 - value
+    cv2.imwrite(str(path), image)
+
+
+def test_get_template_id():
+    assert get_template_id("resources/image/blum_claim.png") == "blum_claim"
+    assert get_template_id("blum_claim") == "blum_claim"
+
+
+def test_registry_loads_and_hands_out_by_id_or_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(template_util, "CONFIG_ITEM_PATHS", [])
+    _write(tmp_path / "blum_claim.png", 10)
+    _write(tmp_path / "blum_start.png", 60)
+    registry = TemplateRegistry(str(tmp_path))
+
+    assert registry.load_all() == 2
+    assert registry.ids() == ["blum_claim", "blum_start"]
+    template = registry.get("blum_claim")
+    assert registry.get(str(tmp_path / "blum_claim.png")) is template
+    assert template.gray.shape == (20, 30)
+    assert template.gray[0, 0] == 10
+
+
+def test_registry_loads_unknown_ids_from_its_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(template_util, "CONFIG_ITEM_PATHS", [])
+    _write(tmp_path / "hamster_profit.png", 30)
+    registry = TemplateRegistry(str(tmp_path))
+
+    assert registry.get("hamster_profit").path == str(tmp_path / "hamster_profit.png")
+    assert registry.ids() == ["hamster_profit"]
+
+
+def test_reload_reads_changed_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(template_util, "CONFIG_ITEM_PATHS", [])
+    _write(tmp_path / "blum_claim.png", 10)
+    _write(tmp_path / "blum_start.png", 60)
+    registry = TemplateRegistry(str(tmp_path))
+    registry.load_all()
+    start = registry.get("blum_start")
+
+    _write(tmp_path / "blum_claim.png", 90)
+    _write(tmp_path / "blum_start.png", 120)
+    assert registry.reload("blum_claim") == 1
+    assert registry.get("blum_claim").gray[0, 0] == 90
+    assert registry.get("blum_start") is start
+
+    assert registry.reload() == 2
+    assert registry.get("blum_start").gray[0, 0] == 120
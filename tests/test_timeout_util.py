@@ -0,0 +1,38 @@
+from src.utils import timeout_util
+from src.utils.timeout_util import TimeoutStore
+
+
+def test_timeout_learned_from_latencies(tmp_path):
+    file_path = str(tmp_path / "timeouts.json")
+    overrides_path = tmp_path / "timeouts.yaml"
+    overrides_path.write_text('"BlumService|blum/start farming": 3\n')
+    store = TimeoutStore(file_path, str(overrides_path))
+    key = TimeoutStore.get_key("BlumService", "blum/claim farming")
+
+    for _ in range(timeout_util.MIN_LEARNED_SAMPLES - 1):
+        store.record(key, 0.3)
+    store.record(key, None)
+    assert store.get_timeout(key, 10) == 10
+    store.record(key, 0.5)
+    store.save()
+
+    learned = TimeoutStore(file_path, str(overrides_path))
+    assert 1.3 <= learned.get_timeout(key, 10) <= 1.5
+    assert learned.get_timeout(key, 1) == 1
+    assert learned.get_timeout("BlumService|blum/start farming", 10) == 3
+    assert learned.report()[0]["misses"] == 1
+
+
+def test_timeout_backs_off_after_repeated_misses(tmp_path):
+    store = TimeoutStore(str(tmp_path / "timeouts.json"), "")
+    key = TimeoutStore.get_key("HamsterKombatService", "new_card")
+    for _ in range(timeout_util.MIN_LEARNED_SAMPLES):
+        store.record(key, 0.5)
+    assert store.get_timeout(key, 10) == 1.5
+
+    for _ in range(timeout_util.TIMEOUT_MISS_BACKOFF):
+        store.record(key, None)
+    assert store.get_timeout(key, 10) == 10
+    # missing with the full timeout too: absent, learned again
+    store.record(key, None)
+    assert store.get_timeout(key, 10) == 1.5
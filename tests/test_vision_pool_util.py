@@ -0,0 +1,50 @@
+import cv2
+import numpy as np
+import pytest
+
+from src.utils.vision_pool_util import VisionPool, match_items
+
+CLAIM_ITEM_PATH = "resources/image/blum_claim.png"
+PROFIT_ITEM_PATH = "resources/image/hamster_profit.png"
+
+
+@pytest.fixture(scope="module")
+def pool():
+    vision_pool = VisionPool(workers=1, timeout=60).start()
+    yield vision_pool
+    vision_pool.shutdown()
+
+
+def _frame(positions):
+    template = cv2.imread(PROFIT_ITEM_PATH)
+    (height, width) = template.shape[:2]
+    frame = np.full((1600, 1080, 3), 40, np.uint8)
+    for (x, y) in positions:
+        frame[y : y + height, x : x + width] = template
+    return frame
+
+
+def test_pool_matches_same_as_inline(pool):
+    frame = _frame([(40, 300), (560, 900)])
+    requests = [
+        (PROFIT_ITEM_PATH, 0.9, False, None),
+        (PROFIT_ITEM_PATH, 0.9, True, (0, 800, 1080, 1600)),
+        (CLAIM_ITEM_PATH, 0.9, False, None),
+    ]
+
+    results = pool.match("device", frame, requests)
+
+    assert results == match_items(frame, requests)
+    assert sorted((box.x, box.y) for box in results[0]) == [(40, 300), (560, 900)]
+    assert [(box.x, box.y) for box in results[1]] == [(560, 900)]
+    assert results[2] == []
+
+
+def test_pool_reuses_and_grows_device_slot(pool):
+    small = _frame([(40, 300)])[:1200]
+    pool.match("device", small, [(PROFIT_ITEM_PATH, 0.9, False, None)])
+    frame = _frame([(560, 900)])
+
+    results = pool.match("device", frame, [(PROFIT_ITEM_PATH, 0.9, False, None)])
+
+    assert [(box.x, box.y) for box in results[0]] == [(560, 900)]
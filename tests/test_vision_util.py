@@ -0,0 +1,84 @@
+import glob
+
+import cv2
+import numpy as np
+import pytest
+
+from src.utils import vision_util
+
+CLAIM_ITEM_PATH = "resources/image/blum_claim.png"
+PROFIT_ITEM_PATH = "resources/image/hamster_profit.png"
+
+
+def _paste(frame, template, positions):
+    (height, width) = template.shape[:2]
+    for (x, y) in positions:
+        frame[y : y + height, x : x + width] = template
+    return frame
+
+
+def test_non_max_suppression():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [20, 20, 30, 30]])
+    scores = np.array([0.9, 0.95, 0.8])
+    keep = vision_util.non_max_suppression(boxes, scores)
+    assert list(keep) == [1, 2]
+
+
+def test_match_template_one_box_per_element():
+    template = cv2.imread(PROFIT_ITEM_PATH)
+    positions = [(40, 300), (560, 300), (40, 900)]
+    frame = _paste(np.full((1600, 1080, 3), 40, np.uint8), template, positions)
+
+    boxes = vision_util.match_template(frame, template, threshold=0.8)
+
+    assert sorted((box.x, box.y) for box in boxes) == sorted(positions)
+    assert all(box.score >= 0.8 for box in boxes)
+
+
+def test_match_template_no_match():
+    template = cv2.imread(CLAIM_ITEM_PATH)
+    frame = np.full((800, 600, 3), 40, np.uint8)
+    assert vision_util.match_template(frame, template, threshold=0.95) == []
+
+
+def _synthetic_frame(seed=0, size=(1920, 1080)):
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, (size[0] // 8, size[1] // 8, 3), dtype=np.uint8)
+    return cv2.resize(noise, (size[1], size[0]), interpolation=cv2.INTER_LINEAR)
+
+
+@pytest.mark.parametrize("item_path", sorted(glob.glob("resources/image/*.png")))
+@pytest.mark.parametrize("threshold", [0.8, 0.95])
+def test_pyramid_parity_with_full_resolution(item_path, threshold):
+    template = cv2.imread(item_path)
+    (height, width) = template.shape[:2]
+    frame = _synthetic_frame()
+    positions = [(7, 101), (8, 400), (1080 - width - 13, 1920 - height - 29)]
+    _paste(frame, template, positions)
+    coarse_templates = vision_util.build_coarse_templates(
+        cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+    )
+
+    full = vision_util.match_template(frame, template, threshold)
+    pyramid = vision_util.match_template_pyramid(
+        vision_util.FramePyramid(frame), template, coarse_templates, threshold
+    )
+
+    assert sorted((box.x, box.y) for box in full) == sorted(positions)
+    assert sorted((box.x, box.y) for box in pyramid) == sorted(positions)
+    for full_box, pyramid_box in zip(sorted(full), sorted(pyramid)):
+        assert pyramid_box.score == pytest.approx(full_box.score, abs=1e-4)
+
+
+def test_frame_fingerprint_detects_scroll():
+    frame = _synthetic_frame()
+    same = frame.copy()
+    scrolled = np.roll(frame, -200, axis=0)
+
+    fingerprint = vision_util.frame_fingerprint(frame)
+
+    assert vision_util.is_same_frame(fingerprint, vision_util.frame_fingerprint(same))
+    assert fingerprint.digest == vision_util.frame_fingerprint(same).digest
+    assert not vision_util.is_same_frame(
+        fingerprint, vision_util.frame_fingerprint(scrolled)
+    )
@@ -0,0 +1,38 @@
+from src.utils.vm_pool_util import VmPool
+
+
+def test_vm_pool_reuses_warm_vms_and_evicts_lru():
+    commands = []
+    alive = {"vm1", "vm2", "vm3"}
+
+    def start_vm(vm_name, vm_uid):
+        commands.append(("start", vm_name))
+        return vm_name
+
+    def stop_vm(vm_name, vm_uid, device):
+        commands.append(("stop", vm_name))
+
+    pool = VmPool(start_vm, stop_vm, is_alive=lambda device: device in alive, size=2)
+    for name in ("vm1", "vm2"):
+        assert pool.acquire(name, f"{name}-uid") == name
+        pool.release(name)
+    assert pool.acquire("vm1", "vm1-uid") == "vm1"
+    pool.release("vm1")
+    # full: vm2, the least recently used idle VM, stops before vm3 boots
+    pool.acquire("vm3", "vm3-uid")
+    pool.release("vm3", healthy=False)
+    assert commands == [
+        ("start", "vm1"),
+        ("start", "vm2"),
+        ("stop", "vm2"),
+        ("start", "vm3"),
+        ("stop", "vm3"),
+    ]
+
+    alive.discard("vm1")
+    pool.acquire("vm1", "vm1-uid")
+    pool.release("vm1")
+    assert commands[-2:] == [("stop", "vm1"), ("start", "vm1")]
+    pool.evict_idle(now=pool.next_expire_at())
+    assert pool.get_idle_names() == []
+    assert commands[-1] == ("stop", "vm1")